@@ -1,16 +1,21 @@
-from toxicpred.pipeline.train_pipeline import TrainPipeline
+import os
 from fastapi import FastAPI, File, UploadFile,Body
 from starlette.responses import RedirectResponse
 from starlette import status
-from starlette.middleware.sessions import SessionMiddleware
 import uvicorn
 from uvicorn import run as app_run
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
 from pydantic import BaseModel
-from toxicpred.pipeline.prediction_pipeline import PredictionPipeline
-from toxicpred.constant.application import APP_HOST, APP_PORT
+from toxicpred.exception import InferenceQueueFullException
+from toxicpred.logger import dropped_log_records
+from toxicpred.pipeline.training_job import TrainingJobRunner
+from toxicpred.serving.executor import InferenceExecutor
+from toxicpred.serving.inference_tasks import get_prediction_pipeline, predict_single_rows, predict_upload
+from toxicpred.serving.metrics import REGISTRY as METRICS_REGISTRY, REQUEST_SECONDS, render_cache_stats
+from toxicpred.serving.micro_batcher import MicroBatcher
+from toxicpred.serving.streaming import ChunkedPredictionStream
+from toxicpred.constant.application import APP_HOST, APP_PORT, MICRO_BATCH_ENABLED
 app = FastAPI()
 
 origins = ["*"]
@@ -42,55 +47,119 @@ class Toxic_Item(BaseModel):
 async def train_routed():
     try:
 
-        train_pipeline = TrainPipeline()
-        if train_pipeline.is_pipeline_running:
-            return Response("Training pipeline is already running.")
-        train_pipeline.run_pipeline()
-        return Response("Training successful !!")
+        #training runs in its own process, only one run at a time across all workers
+        job_status = training_job_runner.start_job()
+        if job_status is None:
+            return Response("Training pipeline is already running.", status_code=status.HTTP_409_CONFLICT)
+        return JSONResponse(job_status, status_code=status.HTTP_202_ACCEPTED)
     except Exception as e:
         return Response(f"Error Occurred! {e}")
 
 
+@app.get("/train/{job_id}")
+async def train_status_route(job_id: str):
+    job_status = training_job_runner.get_job_status(job_id)
+    if job_status is None:
+        return Response(f"Training job {job_id} not found", status_code=status.HTTP_404_NOT_FOUND)
+    return job_status
+
+
+@app.get("/train/{job_id}/progress")
+async def train_progress_route(job_id: str):
+    job_status = training_job_runner.get_job_status(job_id)
+    if job_status is None:
+        return Response(f"Training job {job_id} not found", status_code=status.HTTP_404_NOT_FOUND)
+    return {
+        key: job_status[key]
+        for key in ("job_id", "status", "stage", "stage_index", "total_stages", "progress")
+    }
+
+
+training_job_runner = TrainingJobRunner()
+inference_executor = InferenceExecutor(initializer=get_prediction_pipeline)
+micro_batcher = MicroBatcher(predict_single_rows, executor=inference_executor)
+
+
+@app.on_event("shutdown")
+def shutdown_inference_executor():
+    inference_executor.shutdown()
+
+
+@app.get("/health")
+async def health():
+    health_status = {
+        "status": "ok",
+        "executor": inference_executor.kind,
+        "pending_tasks": inference_executor.pending,
+        "max_pending_tasks": inference_executor.max_pending,
+        "dropped_log_records": dropped_log_records(),
+    }
+    #with the process pool the cache and the model live in the worker processes
+    if inference_executor.kind == "thread":
+        prediction_pipeline = get_prediction_pipeline()
+        health_status["worker_pid"] = os.getpid()
+        health_status["model_version"] = prediction_pipeline.model_version
+        health_status["prediction_cache"] = prediction_pipeline.prediction_cache_stats()
+    return health_status
+
+
+#with the process pool the cache lives in the worker processes
+if inference_executor.kind == "thread":
+    METRICS_REGISTRY.add_collector(lambda: render_cache_stats(get_prediction_pipeline().prediction_cache_stats()))
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(METRICS_REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/predict_single")
 async def predict_route(item: Toxic_Item):
-    try:
+    with REQUEST_SECONDS.time(route="predict_single"):
+        try:
        
-        item_dict = dict(item)
-        prediction_pipeline = PredictionPipeline()
-        df = pd.DataFrame(item_dict, index=[0])
+            item_dict = dict(item)
+            if MICRO_BATCH_ENABLED:
+                result = await micro_batcher.submit(item_dict)
+            else:
+                result = (await inference_executor.run(predict_single_rows, [item_dict]))[0]
+            return result if isinstance(result, dict) else Response(result)
         
-        #validate the data
-        valid_status = prediction_pipeline.validate(df)
-        if not valid_status:
-            return Response("Invalid input")
-        
-        predictions = prediction_pipeline.predict(df)
-        if not predictions:
-            return Response("Model is not available")
-        return { "prediction": predictions}
-        
-    except Exception as e:
-        raise Response(f"Error Occured! {e}")
+        except InferenceQueueFullException as e:
+            return Response(str(e), status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except Exception as e:
+            return Response(f"Error Occured! {e}")
 
 
 
 @app.post("/predict_many")
-async def predict_route_many(csv_file: UploadFile = File(...)):
-    try:
+async def predict_route_many(csv_file: UploadFile = File(...), stream: bool = False, output_format: str = "ndjson"):
+    #for a streamed response this is the time until the first chunk is ready
+    with REQUEST_SECONDS.time(route="predict_many_stream" if stream else "predict_many"):
+        try:
        
-        df = pd.read_csv(csv_file.file)
-        prediction_pipeline = PredictionPipeline()
-        #validate the data
-        valid_status = prediction_pipeline.validate(df)
-        if not valid_status:
-            return Response("Invalid input")
-        predictions = prediction_pipeline.predict(df)
-        if not predictions:
-            return Response("Model is not available")
-        return { "prediction": predictions}
+            if stream:
+                #scored chunk by chunk and streamed back as ndjson or csv lines
+                prediction_stream = ChunkedPredictionStream(csv_file.file, output_format, inference_executor,
+                                                            content_type=csv_file.content_type)
+                error = await prediction_stream.start()
+                if error:
+                    return Response(error)
+                return StreamingResponse(prediction_stream, media_type=prediction_stream.media_type)
+
+            #parsing, validation and scoring all run on the inference executor,
+            #invalid rows are reported instead of rejecting the whole file.
+            #csv, parquet, arrow and npy uploads are told apart by their first bytes
+            contents = await csv_file.read()
+            result = await inference_executor.run(predict_upload, contents, csv_file.content_type)
+            if isinstance(result, bytes):
+                return Response(result, media_type="application/json")
+            return Response(result)
         
-    except Exception as e:
-        raise Response(f"Error Occured! {e}")
+        except InferenceQueueFullException as e:
+            return Response(str(e), status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except Exception as e:
+            return Response(f"Error Occured! {e}")
     
 
 #if __name__ == "__main__":
@@ -0,0 +1,101 @@
+"""
+I/O time of the dataframes the training pipeline passes between its stages,
+csv against the typed parquet and feather artifact formats.
+
+For every format the file reads and writes of one pipeline run are replayed on
+--rows synthetic rows with write_dataframe and read_dataframe: ingestion writes
+the feature store, reads it back and writes the train and test split,
+validation reads them and writes the validated copies, transformation and
+evaluation each read the validated files. The split itself is computed once
+up front, so only I/O is timed.
+
+Run from the repository root:
+    python -m benchmarks.bench_artifact_format --rows 10000000 --formats csv parquet feather
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import environment
+from toxicpred.constant.training_pipeline import (ARTIFACT_FILE_EXTENSIONS, DATA_INGESTION_RANDOM_STATE,
+                                                  DATA_INGESTION_TRAIN_TEST_SPLIT_RATION)
+from toxicpred.utils.main_utils import read_dataframe, write_dataframe
+from toxicpred.utils.synthetic_data import SyntheticDescriptorGenerator
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+
+def split(df: pd.DataFrame) -> tuple:
+    order = np.random.default_rng(DATA_INGESTION_RANDOM_STATE).permutation(len(df))
+    n_test = int(len(df) * DATA_INGESTION_TRAIN_TEST_SPLIT_RATION)
+    return df.iloc[order[n_test:]], df.iloc[order[:n_test]]
+
+
+def replay_pipeline_io(df: pd.DataFrame, train_df: pd.DataFrame, test_df: pd.DataFrame, scratch_dir: str,
+                       artifact_format: str) -> dict:
+    extension = ARTIFACT_FILE_EXTENSIONS[artifact_format]
+    path = lambda stage, name: os.path.join(scratch_dir, artifact_format, stage, f"{name}{extension}")
+    timings = {}
+
+    def timed(step, fn):
+        start = time.perf_counter()
+        result = fn()
+        timings[step] = timings.get(step, 0.0) + time.perf_counter() - start
+        return result
+
+    timed("ingestion_write_feature_store", lambda: write_dataframe(path("feature_store", "toxicitypred"), df))
+    timed("ingestion_read_feature_store", lambda: read_dataframe(path("feature_store", "toxicitypred")))
+    timed("ingestion_write_split", lambda: (write_dataframe(path("ingested", "train"), train_df),
+                                            write_dataframe(path("ingested", "test"), test_df)))
+    ingested = timed("validation_read", lambda: (read_dataframe(path("ingested", "train")),
+                                                 read_dataframe(path("ingested", "test"))))
+    timed("validation_write", lambda: (write_dataframe(path("validated", "train"), ingested[0]),
+                                       write_dataframe(path("validated", "test"), ingested[1])))
+    del ingested
+    for stage in ("transformation", "evaluation"):
+        timed(f"{stage}_read", lambda: (read_dataframe(path("validated", "train")),
+                                        read_dataframe(path("validated", "test"))))
+
+    file_bytes = {
+        stage: sum(os.path.getsize(os.path.join(scratch_dir, artifact_format, stage, name))
+                   for name in os.listdir(os.path.join(scratch_dir, artifact_format, stage)))
+        for stage in ("feature_store", "ingested", "validated")
+    }
+    return {"format": artifact_format, "rows": len(df), "total_seconds": sum(timings.values()),
+            "timings": timings, "file_bytes": file_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--formats", nargs="+", choices=list(ARTIFACT_FILE_EXTENSIONS),
+                        default=list(ARTIFACT_FILE_EXTENSIONS))
+    parser.add_argument("--output", default=None, help="result file, by default under benchmarks/results")
+    args = parser.parse_args()
+
+    env = environment()
+    df = SyntheticDescriptorGenerator(seed=0).training_frame(args.rows)
+    train_df, test_df = split(df)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="toxicpred_artifact_format_") as scratch_dir:
+        for artifact_format in args.formats:
+            print(f"{artifact_format} rows={args.rows}", flush=True)
+            results.append(replay_pipeline_io(df, train_df, test_df, scratch_dir, artifact_format))
+
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"artifact_format_{env['measured_at'].replace(':', '')}_{(env['git_commit'] or 'nogit')[:10]}.json"
+    )
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump({"environment": env, "config": vars(args), "results": results}, output_file, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
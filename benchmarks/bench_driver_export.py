@@ -0,0 +1,93 @@
+"""
+Export time of the table into the feature store, REST paging against the
+token range scan of the native driver at a given number of workers.
+
+Both paths run against local stand-ins holding the same synthetic rows, with
+--page-latency seconds added to every page for the round trip to the database.
+The REST export fetches one page at a time ahead of the writer; the driver
+export scans workers * CASSANDRA_SCAN_SPLITS_PER_WORKER token ranges
+concurrently, so its time should fall with the workers until writing the csv
+becomes the bottleneck.
+
+Run from the repository root:
+    python -m benchmarks.bench_driver_export --rows 100000 --workers 1 4 8 16 --page-latency 0.02
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.common import environment
+from toxicpred.constant.database import CASSANDRA_FETCH_SIZE
+from toxicpred.constant.env_variable import ASTRA_REST_BASE_URL
+from toxicpred.data_access.toxicity_data import ToxicityData
+from toxicpred.test.astra_rest_stand_in import AstraRestStandIn
+from toxicpred.test.cassandra_stand_in import CassandraSessionStandIn
+from toxicpred.utils.synthetic_data import SyntheticDescriptorGenerator
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+
+def check_export(file_path: str, df: pd.DataFrame) -> bool:
+    exported = pd.read_csv(file_path)
+    return len(exported) == len(df) and set(exported["Index"]) == set(df["Index"])
+
+
+def measure_rest(df: pd.DataFrame, args, file_path: str) -> dict:
+    with AstraRestStandIn(df, max_page_size=args.page_size, page_latency_seconds=args.page_latency) as stand_in:
+        os.environ[ASTRA_REST_BASE_URL] = stand_in.base_url
+        start = time.perf_counter()
+        n_rows = ToxicityData().export_from_astra_database_to_feature_store_using_restapi(file_path, args.page_size)
+        seconds = time.perf_counter() - start
+        pages = stand_in.requests
+    return {"method": "restapi", "workers": 1, "rows": n_rows, "pages": pages, "seconds": seconds,
+            "rows_per_second": n_rows / seconds, "complete": check_export(file_path, df)}
+
+
+def measure_driver(df: pd.DataFrame, args, n_workers: int, file_path: str) -> dict:
+    session = CassandraSessionStandIn(df, page_latency_seconds=args.page_latency)
+    start = time.perf_counter()
+    n_rows = ToxicityData().export_from_astra_database_to_feature_store_using_driver(
+        file_path, session=session, workers=n_workers, fetch_size=args.page_size
+    )
+    seconds = time.perf_counter() - start
+    return {"method": "driver", "workers": n_workers, "rows": n_rows, "pages": session.pages,
+            "token_ranges": session.queries, "max_concurrent_pages": session.max_concurrent_pages,
+            "seconds": seconds, "rows_per_second": n_rows / seconds, "complete": check_export(file_path, df)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--page-size", type=int, default=CASSANDRA_FETCH_SIZE)
+    parser.add_argument("--page-latency", type=float, default=0.02, help="seconds added to every page")
+    parser.add_argument("--output", default=None, help="result file, by default under benchmarks/results")
+    args = parser.parse_args()
+
+    env = environment()
+    df = SyntheticDescriptorGenerator(seed=0).training_frame(args.rows)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="toxicpred_driver_export_") as scratch_dir:
+        file_path = os.path.join(scratch_dir, "toxicity.csv")
+        print("restapi", flush=True)
+        results.append(measure_rest(df, args, file_path))
+        for n_workers in args.workers:
+            print(f"driver workers={n_workers}", flush=True)
+            results.append(measure_driver(df, args, n_workers, file_path))
+
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"driver_export_{env['measured_at'].replace(':', '')}_{(env['git_commit'] or 'nogit')[:10]}.json"
+    )
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump({"environment": env, "config": vars(args), "results": results}, output_file, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Cold start of a worker, measured as the import time of its entry module.
+
+Every run starts a fresh interpreter with `python -X importtime -c "import <module>"`
+and parses the per-module timings it prints. Reported per module: the median
+process wall time, the median total import time, the packages with the largest
+self time, and which modules of the training and drift stacks were loaded.
+Those modules should never be loaded by the serving entry points, and --check
+exits with an error when they are.
+
+Run from the repository root:
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --modules app --runs 10 --check
+    python -m benchmarks.bench_import_time --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from benchmarks.common import environment
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+SERVING_MODULES = ["app", "toxicpred.serving.inference_tasks"]
+#modules that only training needs, a serving worker that loads them pays for nothing
+TRAINING_ONLY_MODULES = [
+    "evidently",
+    "astrapy",
+    "cassandra",
+    "boto3",
+    "sklearn.ensemble",
+    "toxicpred.pipeline.train_pipeline",
+    "toxicpred.components.data_ingestion",
+    "toxicpred.components.data_validation",
+    "toxicpred.components.model_trainer",
+    "toxicpred.data_access",
+]
+
+
+def parse_importtime(stderr: str) -> list:
+    '''
+    returns (module, self_us, cumulative_us, depth) for every line of -X importtime output
+    '''
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        #one space after the separator, then two more per level of nesting
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def import_once(module: str) -> dict:
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    wall_seconds = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr.splitlines()[-1]}")
+    entries = parse_importtime(completed.stderr)
+    return {"wall_seconds": wall_seconds, "entries": entries}
+
+
+def measure_module(module: str, runs: int, top: int) -> dict:
+    wall_seconds = []
+    total_import_us = []
+    self_us_by_package = defaultdict(list)
+    loaded = set()
+    for _ in range(runs):
+        run = import_once(module)
+        wall_seconds.append(run["wall_seconds"])
+        #top level entries hold the cumulative time of everything imported below them
+        total_import_us.append(sum(cumulative for _, _, cumulative, depth in run["entries"] if depth == 0))
+        per_package = defaultdict(int)
+        for name, self_us, _, _ in run["entries"]:
+            per_package[name.split(".")[0]] += self_us
+            loaded.add(name)
+        for package, self_us in per_package.items():
+            self_us_by_package[package].append(self_us)
+
+    heaviest = sorted(
+        ((package, float(np.median(values))) for package, values in self_us_by_package.items()),
+        key=lambda item: item[1], reverse=True,
+    )[:top]
+    return {
+        "module": module,
+        "runs": runs,
+        "median_wall_seconds": float(np.median(wall_seconds)),
+        "best_wall_seconds": float(np.min(wall_seconds)),
+        "median_import_seconds": float(np.median(total_import_us)) / 1e6,
+        "modules_loaded": len(loaded),
+        "heaviest_packages_seconds": {package: self_us / 1e6 for package, self_us in heaviest},
+        "training_only_modules_loaded": sorted(
+            name for name in loaded
+            if any(name == prefix or name.startswith(prefix + ".") for prefix in TRAINING_ONLY_MODULES)
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=SERVING_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="packages listed by self import time")
+    parser.add_argument("--check", action="store_true", help="fail when a serving module loads the training stack")
+    parser.add_argument("--output", default=None, help="result file, by default under benchmarks/results")
+    parser.add_argument("--compare", default=None, help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    env = environment()
+    #one untimed import so that every timed run reads the files from the page cache
+    for module in args.modules:
+        import_once(module)
+    results = [measure_module(module, args.runs, args.top) for module in args.modules]
+
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"import_time_{env['measured_at'].replace(':', '')}_{(env['git_commit'] or 'nogit')[:10]}.json"
+    )
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump({"environment": env, "config": vars(args), "results": results}, output_file, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"results written to {output_path}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = {result["module"]: result for result in json.load(baseline_file)["results"]}
+        for result in results:
+            before = baseline.get(result["module"])
+            if before:
+                print(f"{result['module']}: cold start {before['median_wall_seconds']:.3f}s -> "
+                      f"{result['median_wall_seconds']:.3f}s, import {before['median_import_seconds']:.3f}s -> "
+                      f"{result['median_import_seconds']:.3f}s")
+
+    if args.check:
+        offenders = {result["module"]: result["training_only_modules_loaded"]
+                     for result in results if result["training_only_modules_loaded"]}
+        if offenders:
+            sys.exit(f"training only modules loaded at import: {offenders}")
+
+
+if __name__ == "__main__":
+    main()
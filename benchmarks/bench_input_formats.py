@@ -0,0 +1,68 @@
+"""
+Parse time of a batch prediction upload for every accepted input format.
+
+Run from the repository root:
+    python -m benchmarks.bench_input_formats --rows 1000000
+"""
+import argparse
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.common import best_of, sample_rows
+from toxicpred.serving.input_formats import InputFrameReader
+
+
+def encode_uploads(df: pd.DataFrame, feature_columns: list) -> dict:
+    uploads = {}
+    uploads["csv"] = df.to_csv(index=False).encode()
+
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    uploads["parquet"] = buffer.getvalue()
+
+    buffer = io.BytesIO()
+    df.to_feather(buffer)
+    uploads["arrow_file"] = buffer.getvalue()
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    uploads["arrow_stream"] = sink.getvalue().to_pybytes()
+
+    buffer = io.BytesIO()
+    np.save(buffer, df[feature_columns].to_numpy(dtype=np.float64))
+    uploads["npy"] = buffer.getvalue()
+    return uploads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    reader = InputFrameReader()
+    uploads = encode_uploads(sample_rows(args.rows), reader.feature_columns)
+
+    results = {"config": vars(args), "formats": {}}
+    csv_upload = uploads["csv"]
+    results["formats"]["csv_inferred"] = {
+        "bytes": len(csv_upload),
+        "parse_seconds": best_of(lambda: pd.read_csv(io.BytesIO(csv_upload)), args.repeat),
+    }
+    for input_format, contents in uploads.items():
+        assert reader.detect_format(contents) == input_format
+        results["formats"][input_format] = {
+            "bytes": len(contents),
+            "parse_seconds": best_of(lambda: reader.read(contents), args.repeat),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Latency that a log call adds to the calling thread, with the file handler
+written by the caller and with the background queue writer.
+
+Run from the repository root:
+    python -m benchmarks.bench_logging --threads 8 --records 20000
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.common import environment
+from toxicpred.logger import configure_logging, get_logger, stop_queue_listener
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+logger = get_logger("benchmarks.bench_logging")
+
+
+def drive(n_threads: int, n_records: int) -> dict:
+    latencies = np.empty((n_threads, n_records))
+
+    def worker(thread_index: int):
+        for i in range(n_records):
+            start = time.perf_counter()
+            logger.info(f"Entered the predict_output method of Model Prediction class {thread_index} {i}")
+            latencies[thread_index, i] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = latencies.ravel() * 1e6
+    return {
+        "records_per_second": latencies.size / elapsed,
+        "mean_us": float(latencies.mean()),
+        "p50_us": float(np.percentile(latencies, 50)),
+        "p99_us": float(np.percentile(latencies, 99)),
+        "p999_us": float(np.percentile(latencies, 99.9)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--records", type=int, default=20_000, help="records per thread")
+    parser.add_argument("--output", default=None, help="result file, by default under benchmarks/results")
+    args = parser.parse_args()
+
+    env = environment()
+    results = {}
+    for mode, queue_enabled in (("file_handler", False), ("queue", True)):
+        configure_logging(queue_enabled=queue_enabled, rate_limits={}, sample_rates={})
+        results[mode] = drive(args.threads, args.records)
+        #the records still queued are written before the next mode is measured
+        stop_queue_listener()
+
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"logging_{env['measured_at'].replace(':', '')}_{(env['git_commit'] or 'nogit')[:10]}.json"
+    )
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump({"environment": env, "config": vars(args), "results": results}, output_file, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Throughput and latency of /predict_single style traffic with and without micro batching.
+
+Run from the repository root:
+    python -m benchmarks.bench_micro_batching --concurrency 64 --requests 4000
+"""
+import argparse
+import asyncio
+import json
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import build_model, sample_rows
+from toxicpred.serving.micro_batcher import MicroBatcher
+
+warnings.filterwarnings("ignore")
+
+
+async def drive(score, rows: list, concurrency: int) -> dict:
+    latencies = np.empty(len(rows))
+    next_row = iter(range(len(rows)))
+
+    async def client():
+        for i in next_row:
+            start = time.perf_counter()
+            await score(rows[i])
+            latencies[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(rows),
+        "throughput_rps": len(rows) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--reference-rows", type=int, default=50_000)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-us", type=int, default=2000)
+    args = parser.parse_args()
+
+    model = build_model(args.reference_rows)
+    rows = sample_rows(args.requests, seed=2).to_dict(orient="records")
+
+    def batch_fn(items: list) -> list:
+        return model.predict(pd.DataFrame(items)).tolist()
+
+    async def unbatched(row: dict):
+        #let the other clients run first, as concurrent requests would
+        await asyncio.sleep(0)
+        return batch_fn([row])[0]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=args.max_batch_size, max_wait_us=args.max_wait_us)
+
+    results = {
+        "config": vars(args),
+        "batching_off": asyncio.run(drive(unbatched, rows, args.concurrency)),
+        "batching_on": asyncio.run(drive(batcher.submit, rows, args.concurrency)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Load time and per process memory of a saved model, dill pickle against the
+memory mapped manifest format.
+
+For every format, --processes fresh interpreters load the same saved model and
+answer one batch, then report their load time and /proc/self/smaps_rollup while
+all of them are still alive. Pss splits shared pages between the processes
+mapping them, so with the manifest format the Pss of the model arrays shrinks as
+processes are added while with the pickle every process pays for a private copy.
+
+Run from the repository root:
+    python -m benchmarks.bench_model_format --rows 100000 1000000 --processes 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+
+from benchmarks.common import build_model, environment
+from toxicpred.constant.training_pipeline import MODEL_FILE_NAME, MODEL_MANIFEST_FILE_NAME
+from toxicpred.utils.main_utils import save_model
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+FORMATS = {"pickle": MODEL_FILE_NAME, "mmap": MODEL_MANIFEST_FILE_NAME}
+
+#run in a fresh interpreter, prints one json line after loading and one when a line arrives on stdin
+WORKER = textwrap.dedent("""
+    import json, sys, time
+    from benchmarks.common import sample_rows
+    from toxicpred.utils.main_utils import load_model
+
+    def smaps_rollup_kb():
+        values = {}
+        with open("/proc/self/smaps_rollup") as smaps_file:
+            for line in smaps_file:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    values[parts[0].rstrip(":")] = int(parts[1])
+        return values
+
+    rows = sample_rows(1_000, seed=5)
+    before = smaps_rollup_kb()
+    start = time.perf_counter()
+    model = load_model(sys.argv[1])
+    load_seconds = time.perf_counter() - start
+    model.predict(rows)
+    print(json.dumps({"load_seconds": load_seconds, "before_kb": before}), flush=True)
+    sys.stdin.readline()
+    print(json.dumps(smaps_rollup_kb()), flush=True)
+""")
+
+
+def measure_format(model_path: str, n_processes: int) -> dict:
+    workers = [
+        subprocess.Popen([sys.executable, "-c", WORKER, model_path], stdin=subprocess.PIPE,
+                         stdout=subprocess.PIPE, text=True)
+        for _ in range(n_processes)
+    ]
+    #every worker has loaded the model before any of them reads its memory,
+    #and all of them are still alive when the last one reads it
+    loaded = [json.loads(worker.stdout.readline()) for worker in workers]
+    for worker in workers:
+        worker.stdin.write("\n")
+        worker.stdin.flush()
+    memory = [json.loads(worker.stdout.readline()) for worker in workers]
+    for worker in workers:
+        worker.communicate()
+    return {
+        "load_seconds": [result["load_seconds"] for result in loaded],
+        "model_pss_mb": [(after["Pss"] - result["before_kb"]["Pss"]) / 1024 for result, after in zip(loaded, memory)],
+        "model_private_mb": [
+            (after["Private_Clean"] + after["Private_Dirty"]
+             - result["before_kb"]["Private_Clean"] - result["before_kb"]["Private_Dirty"]) / 1024
+            for result, after in zip(loaded, memory)
+        ],
+        "total_pss_mb": sum(after["Pss"] for after in memory) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000], help="rows the model is fitted on")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--output", default=None, help="result file, by default under benchmarks/results")
+    args = parser.parse_args()
+
+    env = environment()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="toxicpred_model_format_") as scratch_dir:
+        for n_rows in args.rows:
+            model = build_model(n_rows)
+            for format_name, file_name in FORMATS.items():
+                model_path = os.path.join(scratch_dir, str(n_rows), file_name)
+                save_model(model_path, model)
+                print(f"{format_name} rows={n_rows}", flush=True)
+                results.append({"format": format_name, "rows": n_rows, **measure_format(model_path, args.processes)})
+
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"model_format_{env['measured_at'].replace(':', '')}_{(env['git_commit'] or 'nogit')[:10]}.json"
+    )
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump({"environment": env, "config": vars(args), "results": results}, output_file, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
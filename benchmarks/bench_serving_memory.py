@@ -0,0 +1,155 @@
+"""
+Memory of the serving processes at a given number of workers, uvicorn --workers
+against the preload and fork launcher.
+
+Each server runs in a scratch directory with a model fitted on --model-rows
+synthetic rows. Requests are sent on fresh connections until every worker has
+answered a prediction and reports a loaded model on /health, then the memory of
+the server process tree is read from /proc/<pid>/smaps_rollup. Pss splits shared
+pages between the processes mapping them, so the Pss total is what the server
+really costs; the private total is what the workers do not share.
+
+Run from the repository root:
+    python -m benchmarks.bench_serving_memory --workers 1 4 16
+    python -m benchmarks.bench_serving_memory --model-rows 1000000 --model-file model.pkl
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import environment, sample_rows
+from benchmarks.load_test import prepare_server_dir, wait_until_healthy
+from toxicpred.constant.training_pipeline import MODEL_SAVE_FILE_NAME
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+MODES = ("uvicorn", "prefork")
+
+
+def server_command(mode: str, args, n_workers: int) -> list:
+    if mode == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", "app:app", "--app-dir", os.getcwd(), "--host", args.host,
+                "--port", str(args.port), "--workers", str(n_workers), "--log-level", "warning"]
+    return [sys.executable, "-m", "toxicpred.serving.launcher", "--host", args.host, "--port", str(args.port),
+            "--workers", str(n_workers)]
+
+
+def process_tree(root_pid: int) -> list:
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat_file:
+                #the command name may contain spaces, the fields after it do not
+                parent_pid = int(stat_file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent_pid, []).append(int(entry))
+    pids, pending = [], [root_pid]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(children.get(pid, []))
+    return pids
+
+
+def smaps_rollup_kb(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as smaps_file:
+        for line in smaps_file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return values
+
+
+def warm_workers(base_url: str, n_workers: int, timeout: float) -> int:
+    '''
+    sends a prediction and a health check on one fresh connection at a time until
+    n_workers distinct workers report a loaded model, returns how many did
+    '''
+    row = sample_rows(1, seed=3).iloc[0].to_dict()
+    loaded = set()
+    deadline = time.monotonic() + timeout
+    while len(loaded) < n_workers and time.monotonic() < deadline:
+        with httpx.Client(base_url=base_url, timeout=30.0) as client:
+            client.post("/predict_single", json=row)
+            health = client.get("/health").json()
+        if health.get("model_version") is not None:
+            loaded.add(health["worker_pid"])
+    return len(loaded)
+
+
+def measure(mode: str, args, n_workers: int, server_dir: str) -> dict:
+    base_url = f"http://{args.host}:{args.port}"
+    #the server runs in the scratch directory and imports the code of this checkout
+    python_path = os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))
+    server = subprocess.Popen(server_command(mode, args, n_workers), cwd=server_dir,
+                              env={**os.environ, "PYTHONPATH": python_path})
+    try:
+        start = time.perf_counter()
+        wait_until_healthy(base_url, server, args.startup_timeout)
+        workers_loaded = warm_workers(base_url, n_workers, args.startup_timeout)
+        ready_seconds = time.perf_counter() - start
+        memory = []
+        for pid in process_tree(server.pid):
+            try:
+                memory.append(smaps_rollup_kb(pid))
+            except OSError:
+                pass
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    return {
+        "mode": mode,
+        "workers": n_workers,
+        "workers_with_model": workers_loaded,
+        "processes": len(memory),
+        "ready_seconds": ready_seconds,
+        "rss_mb": sum(values["Rss"] for values in memory) / 1024,
+        "pss_mb": sum(values["Pss"] for values in memory) / 1024,
+        "private_mb": sum(values["Private_Clean"] + values["Private_Dirty"] for values in memory) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--model-rows", type=int, default=1_000_000, help="rows the synthetic model is fitted on")
+    parser.add_argument("--model-file", default=MODEL_SAVE_FILE_NAME, help="model.json (memory mapped) or model.pkl")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--output", default=None, help="result file, by default under benchmarks/results")
+    args = parser.parse_args()
+
+    env = environment()
+    server_dir = prepare_server_dir(args, model_file_name=args.model_file)
+    results = []
+    try:
+        for n_workers in args.workers:
+            for mode in args.modes:
+                print(f"{mode} workers={n_workers}", flush=True)
+                results.append(measure(mode, args, n_workers, server_dir))
+    finally:
+        shutil.rmtree(server_dir, ignore_errors=True)
+
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"serving_memory_{env['measured_at'].replace(':', '')}_{(env['git_commit'] or 'nogit')[:10]}.json"
+    )
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump({"environment": env, "config": vars(args), "results": results}, output_file, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Helpers shared by the benchmarks: synthetic rows, a model trained on them,
+timing and the environment a result was measured in.
+"""
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KNeighborsRegressor
+
+from toxicpred.components.data_transformation import DataTransformation
+from toxicpred.constant.training_pipeline import (MODEL_TRAINER_METRIC, MODEL_TRAINER_N_NEIGHBORS, SCHEMA_FILE_PATH,
+                                                  TARGET_COLUMN)
+from toxicpred.ml.model.estimator import ToxicityModel
+from toxicpred.utils.main_utils import read_yaml_file
+from toxicpred.utils.synthetic_data import SyntheticDescriptorGenerator
+
+
+def sample_rows(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    return SyntheticDescriptorGenerator(seed=seed).descriptors(n_rows)
+
+
+def build_model(n_rows: int, seed: int = 1) -> ToxicityModel:
+    '''
+    fits the production preprocessor and regressor on n_rows synthetic rows
+    '''
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    numerical_columns = schema_config["numerical_columns"]
+    categorical_columns = schema_config["categorical_columns"]
+    df = SyntheticDescriptorGenerator(seed=seed).training_frame(n_rows)
+    preprocessor = DataTransformation.get_data_transformer_object()
+    preprocessor.fit(df[numerical_columns])
+    x = np.c_[preprocessor.transform(df[numerical_columns]), df[categorical_columns].to_numpy()]
+    model = KNeighborsRegressor(n_neighbors=MODEL_TRAINER_N_NEIGHBORS, metric=MODEL_TRAINER_METRIC).fit(x, df[TARGET_COLUMN].to_numpy())
+    return ToxicityModel(preprocessor=preprocessor, model=model)
+
+
+def measure(fn, repeat: int) -> dict:
+    '''
+    calls fn repeat times and returns the best and median wall time in seconds
+    '''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"best_seconds": min(timings), "median_seconds": float(np.median(timings)), "repeat": repeat}
+
+
+def best_of(fn, repeat: int) -> float:
+    return measure(fn, repeat)["best_seconds"]
+
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    '''
+    identifies the commit and the box a result was measured on
+    '''
+    return {
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "measured_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
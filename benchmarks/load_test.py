@@ -0,0 +1,283 @@
+"""
+HTTP load test of the FastAPI app.
+
+Starts app:app with uvicorn on localhost and drives /predict_single and
+/predict_many with rows from the synthetic descriptor generator. By default the
+server runs in a scratch directory with the repository config and a model
+fitted on synthetic rows, so saved_models is never touched; --use-saved-models
+serves the models under the current directory instead and --url drives a server
+that is already running.
+
+closed loop: --concurrency clients each send their next request as soon as the
+previous one is answered.
+open loop: requests are started at --rps whether or not earlier ones have been
+answered, and latency is measured from the time a request was due, so queueing
+in the client is counted instead of hidden (no coordinated omission).
+
+Throughput, p50/p90/p99/p999 latency and error rates per route are written with
+the run configuration and the commit to benchmarks/results/load_*.json.
+
+Run from the repository root:
+    python -m benchmarks.load_test --mode closed --concurrency 64 --duration 30
+    python -m benchmarks.load_test --mode open --rps 500 --mix predict_single=0.95,predict_many=0.05 --batch-sizes 100 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+import numpy as np
+
+from benchmarks.common import build_model, environment, sample_rows
+from toxicpred.constant.training_pipeline import MODEL_SAVE_FILE_NAME, SAVED_MODEL_DIR
+from toxicpred.utils.main_utils import save_model
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+ROUTES = ("predict_single", "predict_many")
+PERCENTILES = {"p50": 50, "p90": 90, "p99": 99, "p999": 99.9}
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        route, _, weight = part.partition("=")
+        route = route.strip()
+        if route not in ROUTES:
+            raise ValueError(f"Unknown route [{route}] in --mix, expected one of {ROUTES}")
+        weights[route] = float(weight or 1)
+    return weights
+
+
+class RequestPool:
+    '''
+    pregenerated request payloads so that building them is not part of the measurement
+    '''
+    def __init__(self, batch_sizes: list, n_single_rows: int = 10_000, seed: int = 11):
+        self.single_rows = sample_rows(n_single_rows, seed=seed).to_dict(orient="records")
+        self.uploads = [
+            (batch_size, sample_rows(batch_size, seed=seed + i + 1).to_csv(index=False).encode())
+            for i, batch_size in enumerate(batch_sizes)
+        ]
+        self._rng = random.Random(seed)
+
+    def request(self, route: str):
+        '''
+        returns (rows, httpx request kwargs)
+        '''
+        if route == "predict_single":
+            return 1, {"json": self.single_rows[self._rng.randrange(len(self.single_rows))]}
+        batch_size, contents = self.uploads[self._rng.randrange(len(self.uploads))]
+        return batch_size, {"files": {"csv_file": ("batch.csv", contents, "text/csv")}}
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies = []
+        self.rows = 0
+        self.errors = Counter()
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = np.asarray(self.latencies) * 1000
+        completed = len(latencies)
+        n_errors = sum(self.errors.values())
+        summary = {
+            "requests": completed + n_errors,
+            "completed": completed,
+            "errors": n_errors,
+            "error_rate": n_errors / (completed + n_errors) if completed + n_errors else 0.0,
+            "error_kinds": dict(self.errors),
+            "throughput_rps": completed / elapsed,
+            "rows_per_second": self.rows / elapsed,
+        }
+        if completed:
+            summary["mean_ms"] = float(latencies.mean())
+            summary["max_ms"] = float(latencies.max())
+            for name, percentile in PERCENTILES.items():
+                summary[f"{name}_ms"] = float(np.percentile(latencies, percentile))
+        return summary
+
+
+class LoadGenerator:
+    def __init__(self, base_url: str, pool: RequestPool, mix: dict, timeout: float, max_connections: int):
+        self.base_url = base_url
+        self.pool = pool
+        self.routes = list(mix)
+        self.weights = [mix[route] for route in self.routes]
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.stats = {route: RouteStats() for route in self.routes}
+        self.measure_from = None
+        self._rng = random.Random(13)
+
+    async def send(self, client: httpx.AsyncClient, due: float = None) -> None:
+        route = self._rng.choices(self.routes, self.weights)[0]
+        rows, request_kwargs = self.pool.request(route)
+        start = time.perf_counter() if due is None else due
+        try:
+            response = await client.post(f"/{route}", **request_kwargs)
+            error = None
+            if response.status_code != 200:
+                error = f"http_{response.status_code}"
+            elif not response.headers.get("content-type", "").startswith("application/json"):
+                #the app answers some failures with 200 and a plain text message
+                error = "non_json_response"
+        except httpx.TimeoutException:
+            error = "timeout"
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        end = time.perf_counter()
+
+        if start < self.measure_from:
+            return
+        stats = self.stats[route]
+        if error is None:
+            stats.latencies.append(end - start)
+            stats.rows += rows
+        else:
+            stats.errors[error] += 1
+
+    def client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        return httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits)
+
+    async def closed_loop(self, concurrency: int, warmup: float, duration: float) -> float:
+        self.measure_from = time.perf_counter() + warmup
+        deadline = self.measure_from + duration
+        async with self.client() as client:
+            async def worker():
+                while time.perf_counter() < deadline:
+                    await self.send(client)
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - self.measure_from
+
+    async def open_loop(self, rps: float, arrival: str, warmup: float, duration: float) -> float:
+        start = time.perf_counter()
+        self.measure_from = start + warmup
+        deadline = self.measure_from + duration
+        rng = np.random.default_rng(17)
+        tasks = set()
+        async with self.client() as client:
+            due = start
+            while due < deadline:
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                task = asyncio.create_task(self.send(client, due=due))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                due += rng.exponential(1 / rps) if arrival == "poisson" else 1 / rps
+            if tasks:
+                await asyncio.wait(tasks)
+        return deadline - self.measure_from
+
+
+def prepare_server_dir(args, model_file_name: str = MODEL_SAVE_FILE_NAME) -> str:
+    '''
+    scratch working directory with the config and a model fitted on synthetic rows
+    '''
+    server_dir = tempfile.mkdtemp(prefix="toxicpred_load_")
+    shutil.copytree("config", os.path.join(server_dir, "config"))
+    model = build_model(args.model_rows)
+    save_model(os.path.join(server_dir, SAVED_MODEL_DIR, str(round(time.time())), model_file_name), model)
+    return server_dir
+
+
+def start_server(args, server_dir: str) -> subprocess.Popen:
+    repository_dir = os.getcwd()
+    command = [
+        sys.executable, "-m", "uvicorn", args.app, "--app-dir", repository_dir,
+        "--host", args.host, "--port", str(args.port), "--workers", str(args.workers),
+        "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=server_dir)
+
+
+def wait_until_healthy(base_url: str, server: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode} before becoming healthy")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"Server at {base_url} was not healthy after {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=32, help="clients in closed loop, connections in open loop")
+    parser.add_argument("--rps", type=float, default=200.0, help="request rate in open loop")
+    parser.add_argument("--arrival", choices=["uniform", "poisson"], default="uniform")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds before measuring starts")
+    parser.add_argument("--mix", default="predict_single=1", help="route weights, e.g. predict_single=0.9,predict_many=0.1")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100], help="rows per /predict_many upload")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--url", default=None, help="drive a running server instead of starting one")
+    parser.add_argument("--app", default="app:app")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--model-rows", type=int, default=10_000, help="rows the synthetic model is fitted on")
+    parser.add_argument("--use-saved-models", action="store_true", help="serve saved_models of the current directory")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--output", default=None, help="result file, by default under benchmarks/results")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    env = environment()
+    pool = RequestPool(args.batch_sizes)
+
+    server, server_dir = None, None
+    base_url = args.url or f"http://{args.host}:{args.port}"
+    try:
+        if args.url is None:
+            server_dir = os.getcwd() if args.use_saved_models else prepare_server_dir(args)
+            server = start_server(args, server_dir)
+        wait_until_healthy(base_url, server, args.startup_timeout)
+
+        load_generator = LoadGenerator(base_url, pool, mix, args.timeout, args.concurrency)
+        if args.mode == "closed":
+            elapsed = asyncio.run(load_generator.closed_loop(args.concurrency, args.warmup, args.duration))
+        else:
+            elapsed = asyncio.run(load_generator.open_loop(args.rps, args.arrival, args.warmup, args.duration))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if server_dir is not None and not args.use_saved_models:
+            shutil.rmtree(server_dir, ignore_errors=True)
+
+    results = {route: stats.summary(elapsed) for route, stats in load_generator.stats.items()}
+    total = RouteStats()
+    for stats in load_generator.stats.values():
+        total.latencies.extend(stats.latencies)
+        total.rows += stats.rows
+        total.errors.update(stats.errors)
+    results["all"] = total.summary(elapsed)
+
+    report = {"environment": env, "config": vars(args), "measured_seconds": elapsed, "results": results}
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"load_{args.mode}_{env['measured_at'].replace(':', '')}_{(env['git_commit'] or 'nogit')[:10]}.json"
+    )
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
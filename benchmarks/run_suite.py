@@ -0,0 +1,188 @@
+"""
+Benchmark suite over synthetic descriptor datasets.
+
+Measures ModelPrediction.check_data_validity, ToxicityModel.predict for a single
+row and for a whole batch, get_regression_score, and every TrainPipeline stage.
+The stages run in a scratch directory, with the database export replaced by a
+synthetic training frame. Results and the commit they were measured at are
+written as json, and --compare prints the change against an earlier result file
+from the same box.
+
+Run from the repository root:
+    python -m benchmarks.run_suite --rows 1000 100000 1000000
+    python -m benchmarks.run_suite --rows 10000000 --skip-training
+    python -m benchmarks.run_suite --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import traceback
+import warnings
+from unittest import mock
+
+import numpy as np
+
+from benchmarks.common import build_model, environment, measure, sample_rows
+from toxicpred.constant.training_pipeline import TRAINING_PROFILE_FILE_NAME
+from toxicpred.utils.main_utils import write_dataframe
+from toxicpred.utils.synthetic_data import SyntheticDescriptorGenerator
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+warnings.filterwarnings("ignore")
+
+
+def bench_check_data_validity(n_rows: int, repeat: int) -> dict:
+    from toxicpred.components.model_prediction import ModelPrediction
+    model_prediction = ModelPrediction()
+    df = SyntheticDescriptorGenerator(seed=3).descriptors(n_rows, invalid_fraction=0.01)
+    return measure(lambda: model_prediction.check_data_validity(df), repeat)
+
+
+def bench_predict_batch(model, n_rows: int, repeat: int) -> dict:
+    df = sample_rows(n_rows, seed=4)
+    return measure(lambda: model.predict(df), repeat)
+
+
+def bench_predict_single(model, n_calls: int) -> dict:
+    rows = [row.to_frame().T for _, row in sample_rows(n_calls, seed=5).iterrows()]
+    latencies = np.array([measure(lambda: model.predict(row), 1)["best_seconds"] for row in rows])
+    return {
+        "best_seconds": float(latencies.min()),
+        "median_seconds": float(np.median(latencies)),
+        "p99_seconds": float(np.percentile(latencies, 99)),
+        "repeat": n_calls,
+    }
+
+
+def bench_regression_score(n_rows: int, repeat: int) -> dict:
+    from toxicpred.ml.metric.regression_metric import get_regression_score
+    rng = np.random.default_rng(6)
+    y_true = rng.normal(4.0, 1.5, n_rows)
+    y_pred = y_true + rng.normal(0.0, 0.3, n_rows)
+    return measure(lambda: get_regression_score(y_true, y_pred), repeat)
+
+
+def bench_training_stages(n_rows: int) -> list:
+    '''
+    runs TrainPipeline in a scratch directory and returns the stage profiles it wrote
+    '''
+    from toxicpred.components.data_ingestion import DataIngestion
+    from toxicpred.pipeline.train_pipeline import TrainPipeline
+
+    training_frame = SyntheticDescriptorGenerator(seed=7).training_frame(n_rows)
+
+    def export_synthetic_frame(data_ingestion):
+        feature_store_file_path = data_ingestion.data_ingestion_config.feature_store_file_path
+        os.makedirs(os.path.dirname(feature_store_file_path), exist_ok=True)
+        write_dataframe(feature_store_file_path, training_frame)
+        return training_frame
+
+    repository_dir = os.getcwd()
+    scratch_dir = tempfile.mkdtemp(prefix="toxicpred_bench_")
+    try:
+        shutil.copytree("config", os.path.join(scratch_dir, "config"))
+        os.chdir(scratch_dir)
+        train_pipeline = TrainPipeline()
+        with mock.patch.object(DataIngestion, "export_data_into_feature_store", export_synthetic_frame):
+            try:
+                train_pipeline.run_pipeline()
+            except Exception:
+                #the profile of the stages that did run is still written
+                traceback.print_exc()
+        profile_path = os.path.join(train_pipeline.training_pipeline_config.artifact_dir, TRAINING_PROFILE_FILE_NAME)
+        with open(profile_path) as profile_file:
+            return json.load(profile_file)["stages"]
+    finally:
+        os.chdir(repository_dir)
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def run_benchmark(results: list, name: str, n_rows: int, fn) -> None:
+    print(f"{name} rows={n_rows}", flush=True)
+    try:
+        result = {"name": name, "rows": n_rows, **fn()}
+        if result.get("best_seconds"):
+            result["rows_per_second"] = n_rows / result["best_seconds"]
+    except Exception as e:
+        traceback.print_exc()
+        result = {"name": name, "rows": n_rows, "error": f"{type(e).__name__}: {e}"}
+    results.append(result)
+
+
+def compare(results: list, baseline_path: str) -> None:
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    baseline_seconds = {
+        (result["name"], result["rows"]): result.get("best_seconds")
+        for result in baseline["results"]
+    }
+    print(f"\ncompared to {baseline_path} at {baseline['environment']['git_commit']}")
+    print(f"{'benchmark':<40}{'rows':>12}{'baseline s':>14}{'current s':>14}{'ratio':>8}")
+    for result in results:
+        before = baseline_seconds.get((result["name"], result["rows"]))
+        after = result.get("best_seconds")
+        ratio = f"{after / before:.2f}" if before and after else "-"
+        before = f"{before:.6f}" if before else "-"
+        after = f"{after:.6f}" if after else "-"
+        print(f"{result['name']:<40}{result['rows']:>12}{before:>14}{after:>14}{ratio:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000],
+                        help="dataset sizes for validation, batch prediction and scoring, from 1k to 10M")
+    parser.add_argument("--model-rows", type=int, default=10_000, help="rows the benchmarked model is fitted on")
+    parser.add_argument("--single-row-calls", type=int, default=1_000)
+    parser.add_argument("--train-rows", type=int, default=100_000)
+    parser.add_argument("--skip-training", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help="result file, by default under benchmarks/results")
+    parser.add_argument("--compare", default=None, help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    env = environment()
+    model = build_model(args.model_rows)
+    results = []
+
+    run_benchmark(results, "toxicity_model.predict[single_row]", 1,
+                  lambda: bench_predict_single(model, args.single_row_calls))
+    for n_rows in args.rows:
+        run_benchmark(results, "model_prediction.check_data_validity", n_rows,
+                      lambda: bench_check_data_validity(n_rows, args.repeat))
+        run_benchmark(results, "toxicity_model.predict[batch]", n_rows,
+                      lambda: bench_predict_batch(model, n_rows, args.repeat))
+        run_benchmark(results, "get_regression_score", n_rows,
+                      lambda: bench_regression_score(n_rows, args.repeat))
+
+    if not args.skip_training:
+        print(f"train_pipeline rows={args.train_rows}", flush=True)
+        try:
+            for stage in bench_training_stages(args.train_rows):
+                results.append({
+                    "name": f"train_pipeline.{stage['stage']}",
+                    "rows": args.train_rows,
+                    "best_seconds": stage["wall_seconds"],
+                    "repeat": 1,
+                    **{key: value for key, value in stage.items()
+                       if key not in ("stage", "wall_seconds", "files_read", "files_written")},
+                })
+        except Exception as e:
+            traceback.print_exc()
+            results.append({"name": "train_pipeline", "rows": args.train_rows, "error": f"{type(e).__name__}: {e}"})
+
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"suite_{env['measured_at'].replace(':', '')}_{(env['git_commit'] or 'nogit')[:10]}.json"
+    )
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump({"environment": env, "config": vars(args), "results": results}, output_file, indent=2)
+    print(f"results written to {output_path}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,98 +1,215 @@
 import os
+import shutil
 import sys
+import time
 
 import pandas as pd
 import numpy as np
 from pandas import DataFrame
 from sklearn.model_selection import train_test_split
 
-from toxicpred.data_access.toxicity_data import ToxicityData
 from toxicpred.entity.artifact_entity import DataIngestionArtifact
 from toxicpred.entity.config_entity import DataIngestionConfig
 from toxicpred.exception import ToxicityException
-from toxicpred.logger import logging
-from toxicpred.utils.main_utils import read_yaml_file
+from toxicpred.logger import get_logger
+from toxicpred.utils.main_utils import (read_dataframe, read_json_file, read_yaml_file, write_dataframe,
+                                        write_json_file)
+from toxicpred.constant.database import CASSANDRA_PARTITION_KEY
 from toxicpred.constant.training_pipeline import SCHEMA_FILE_PATH
+from toxicpred.utils.artifact_persister import ArtifactPersister
 import warnings
 warnings.filterwarnings("ignore")
 
+logger = get_logger(__name__)
+
 class DataIngestion:
-    def __init__(self, data_ingestion_config:DataIngestionConfig):
+    def __init__(self, data_ingestion_config:DataIngestionConfig, artifact_persister: ArtifactPersister = None):
         try:
             self.data_ingestion_config = data_ingestion_config
+            self.artifact_persister = artifact_persister or ArtifactPersister(asynchronous=False)
             self._schema_config = read_yaml_file(SCHEMA_FILE_PATH)
         except Exception as e:
             raise ToxicityException(e,sys)
 
+    def _export_table(self, toxic_data, file_path: str, where: dict = None) -> int:
+        #the driver scans the whole table by token ranges, filtered exports go through the REST endpoint
+        if self.data_ingestion_config.export_method == "driver" and where is None:
+            return toxic_data.export_from_astra_database_to_feature_store_using_driver(file_path)
+        return toxic_data.export_from_astra_database_to_feature_store_using_restapi(file_path, where=where)
+
+    def is_incremental(self) -> bool:
+        '''
+        whether the feature store is refreshed incrementally, which needs a change marker
+        column that grows whenever a row is written
+        '''
+        config = self.data_ingestion_config
+        if not config.incremental_enabled:
+            return False
+        if config.change_marker_column is None:
+            logger.info("No change marker column is configured, exporting the whole table")
+            return False
+        if config.change_marker_column in (config.row_key, CASSANDRA_PARTITION_KEY):
+            logger.warning(
+                f"Change marker column [{config.change_marker_column}] is the row key or the partition key, "
+                "it misses updated rows and its range filter scans the whole table, exporting the whole table"
+            )
+            return False
+        return True
+
+    def _read_cache_state(self) -> dict:
+        config = self.data_ingestion_config
+        if not (os.path.exists(config.cache_file_path) and os.path.exists(config.cache_state_file_path)):
+            return None
+        state = read_json_file(config.cache_state_file_path)
+        if state.get("row_key") != config.row_key or state.get("change_marker_column") != config.change_marker_column:
+            logger.info("Row key or change marker of the feature store cache changed, exporting the whole table")
+            return None
+        if time.time() - state.get("last_full_refresh", 0) >= config.full_refresh_seconds:
+            logger.info("Feature store cache is due for a full refresh")
+            return None
+        return state
+
+    def refresh_feature_store_cache(self, toxic_data) -> dict:
+        '''
+        brings the local feature store cache up to date with the database, the whole table
+        is exported when there is no usable cache, otherwise only the rows whose change
+        marker is at or after the stored watermark are fetched and merged by row key
+        '''
+        try:
+            logger.info("Entered refresh_feature_store_cache method of Data_Ingestion class")
+            config = self.data_ingestion_config
+            state = self._read_cache_state()
+            now = time.time()
+            #the temporary file keeps the extension that selects the artifact format
+            tmp_file_path = "{}.tmp{}".format(*os.path.splitext(config.cache_file_path))
+            if state is None:
+                rows_fetched = self._export_table(toxic_data, tmp_file_path)
+                #driver exports arrive in token order
+                cache = read_dataframe(tmp_file_path).sort_values(config.row_key, ignore_index=True)
+                write_dataframe(tmp_file_path, cache)
+                os.replace(tmp_file_path, config.cache_file_path)
+                state = {"last_full_refresh": now, "last_mode": "full"}
+            else:
+                where = {config.change_marker_column: {"$gte": state["watermark"]}}
+                rows_fetched = self._export_table(toxic_data, tmp_file_path, where=where)
+                cache = read_dataframe(config.cache_file_path)
+                if rows_fetched:
+                    #fetched rows replace the cached rows with the same key
+                    cache = pd.concat([cache, read_dataframe(tmp_file_path)], ignore_index=True)
+                    cache = cache.drop_duplicates(subset=config.row_key, keep="last")
+                    cache = cache.sort_values(config.row_key, ignore_index=True)
+                    write_dataframe(tmp_file_path, cache)
+                    os.replace(tmp_file_path, config.cache_file_path)
+                elif os.path.exists(tmp_file_path):
+                    os.remove(tmp_file_path)
+                state["last_mode"] = "incremental"
+
+            watermark = cache[config.change_marker_column].max() if len(cache) else state.get("watermark")
+            state.update({
+                "row_key": config.row_key,
+                "change_marker_column": config.change_marker_column,
+                "watermark": watermark.item() if hasattr(watermark, "item") else watermark,
+                "rows": len(cache),
+                "last_refresh": now,
+                "last_rows_fetched": rows_fetched,
+            })
+            #the state only moves forward once the cache it describes is in place
+            write_json_file(f"{config.cache_state_file_path}.tmp", state)
+            os.replace(f"{config.cache_state_file_path}.tmp", config.cache_state_file_path)
+            logger.info(
+                f"Feature store cache refreshed ({state['last_mode']}): fetched {rows_fetched} rows, "
+                f"{len(cache)} rows cached up to {config.change_marker_column} {state['watermark']}"
+            )
+            return state
+
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
     def export_data_into_feature_store(self) -> DataFrame:
         try:
-            logging.info("Exporting data from astra cassandra database")
+            logger.info("Exporting data from astra cassandra database")
+            #the database client is only needed by training, not by the serving workers
+            from toxicpred.data_access.toxicity_data import ToxicityData
             toxic_data = ToxicityData()
-            #dataframe = toxic_data.export_from_astra_database_to_dataframe_using_driver()
-            dataframe = toxic_data.export_from_astra_database_to_dataframe_using_restapi()
-            logging.info(f"Shape of dataframe: {dataframe.shape}")
             feature_store_file_path = self.data_ingestion_config.feature_store_file_path
-            dir_path = os.path.dirname(feature_store_file_path)
-            os.makedirs(dir_path, exist_ok=True)
-            logging.info(
+            logger.info(
                 f"Saving exported data into feature store file path: {feature_store_file_path}"
             )
-            dataframe.to_csv(feature_store_file_path, index=False, header=True)
+            if self.is_incremental():
+                self.refresh_feature_store_cache(toxic_data)
+                os.makedirs(os.path.dirname(feature_store_file_path), exist_ok=True)
+                shutil.copy(self.data_ingestion_config.cache_file_path, feature_store_file_path)
+            else:
+                #pages are appended to the feature store as they arrive instead of being collected in memory
+                self._export_table(toxic_data, feature_store_file_path)
+            dataframe = read_dataframe(feature_store_file_path)
+            logger.info(f"Shape of dataframe: {dataframe.shape}")
             return dataframe
 
         except Exception as e:
             raise ToxicityException(e, sys)
-    
-    def split_data_as_train_test(self, dataframe: DataFrame) -> None:
+
+    def split_data_as_train_test(self, dataframe: DataFrame) -> tuple:
         
         try:
-            logging.info("Entered split_data_as_train_test method of Data_Ingestion class")
+            logger.info("Entered split_data_as_train_test method of Data_Ingestion class")
 
             train_set, test_set = train_test_split(
                 dataframe, 
                 test_size=self.data_ingestion_config.train_test_split_ratio, 
                 random_state=self.data_ingestion_config.random_state
             )
-            logging.info("Performed train test split on the dataframe")
-            logging.info(
+            #the same index as the files have when read back, later stages align columns on it
+            train_set = train_set.reset_index(drop=True)
+            test_set = test_set.reset_index(drop=True)
+            logger.info("Performed train test split on the dataframe")
+            logger.info(
                 "Exited split_data_as_train_test method of Data_Ingestion class"
             )
             dir_path = os.path.dirname(self.data_ingestion_config.training_file_path)
             os.makedirs(dir_path, exist_ok=True)
 
-            logging.info(f"Exporting train and test file path.")
-            train_set.to_csv(
-                self.data_ingestion_config.training_file_path, index=False, header=True
+            logger.info(f"Exporting train and test file path.")
+            self.artifact_persister.save(
+                self.data_ingestion_config.training_file_path, write_dataframe,
+                self.data_ingestion_config.training_file_path, train_set
             )
-            test_set.to_csv(
-                self.data_ingestion_config.testing_file_path, index=False, header=True
+            self.artifact_persister.save(
+                self.data_ingestion_config.testing_file_path, write_dataframe,
+                self.data_ingestion_config.testing_file_path, test_set
             )
 
-            logging.info(f"Exported train and test file path.")
+            logger.info(f"Exported train and test file path.")
+            return train_set, test_set
         
         except Exception as e:
             raise ToxicityException(e, sys) from e
 
-    def initiate_data_ingestion(self) -> DataIngestionArtifact:
-
+    def initiate_data_ingestion(self, dataframe: DataFrame = None) -> DataIngestionArtifact:
+        '''
+        dataframe: the feature store when it was already exported, otherwise it is exported here
+        '''
         try:
-            logging.info("Entered initiate_data_ingestion method of Data_Ingestion class")
+            logger.info("Entered initiate_data_ingestion method of Data_Ingestion class")
 
-            dataframe = self.export_data_into_feature_store()
+            if dataframe is None:
+                dataframe = self.export_data_into_feature_store()
             dataframe = dataframe.drop(self._schema_config["drop_columns"], axis=1)
             dataframe.replace({"na": np.nan}, inplace=True)
-            logging.info("Got the data from mongodb")
-            self.split_data_as_train_test(dataframe)
-            logging.info("Performed train test split on the dataset")
-            logging.info(
+            logger.info("Got the data from mongodb")
+            train_set, test_set = self.split_data_as_train_test(dataframe)
+            logger.info("Performed train test split on the dataset")
+            logger.info(
                 "Exited initiate_data_ingestion method of Data_Ingestion class"
             )
 
             data_ingestion_artifact = DataIngestionArtifact(
                 trained_file_path=self.data_ingestion_config.training_file_path,
                 test_file_path=self.data_ingestion_config.testing_file_path,
+                train_df=train_set,
+                test_df=test_set,
             )
-            logging.info(f"Data ingestion artifact: {data_ingestion_artifact}")
+            logger.info(f"Data ingestion artifact: {data_ingestion_artifact}")
             return data_ingestion_artifact
         
         except Exception as e:
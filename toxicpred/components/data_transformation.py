@@ -5,25 +5,30 @@ from toxicpred.entity.config_entity import DataTransformationConfig
 import os,sys
 from toxicpred.constant.training_pipeline import TARGET_COLUMN
 from toxicpred.exception import ToxicityException
-from toxicpred.logger import logging
+from toxicpred.logger import get_logger
 import pandas as pd
 import numpy as np
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 from sklearn.impute import SimpleImputer
 #from toxicpred.ml.model.estimator import TargetValueMapping
-from toxicpred.utils.main_utils import read_yaml_file,save_numpy_array_data, save_object
+from toxicpred.utils.main_utils import read_yaml_file,save_numpy_array_data, save_object, read_dataframe
 from toxicpred.constant.training_pipeline import SCHEMA_FILE_PATH
+from toxicpred.utils.artifact_persister import ArtifactPersister
 import warnings
 warnings.filterwarnings("ignore")
 
+logger = get_logger(__name__)
+
 class DataTransformation:
     def __init__(self,
                  data_validation_artifact: DataValidationArtifact,
-                 data_transformation_config: DataTransformationConfig):
+                 data_transformation_config: DataTransformationConfig,
+                 artifact_persister: ArtifactPersister = None):
         try:      
             self.data_validation_artifact = data_validation_artifact
             self.data_transformation_config = data_transformation_config
+            self.artifact_persister = artifact_persister or ArtifactPersister(asynchronous=False)
             self._schema_config = read_yaml_file(SCHEMA_FILE_PATH)
         except Exception as e:
             raise ToxicityException(e, sys) from e
@@ -31,7 +36,7 @@ class DataTransformation:
     @staticmethod
     def read_data(file_path) -> pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_dataframe(file_path)
         except Exception as e:
             raise ToxicityException(e,sys) from e
 
@@ -40,11 +45,11 @@ class DataTransformation:
         '''
         pipeline object to transform the dataset
         '''
-        logging.info(
+        logger.info(
              "Entered get_data_transformer_object method of DataTransformation class"
         )
         try:
-            logging.info("Got numerical cols from schema config")
+            logger.info("Got numerical cols from schema config")
             
             simple_imputer = SimpleImputer(strategy="constant", fill_value=0)
             #standard_scaler = StandardScaler()
@@ -53,9 +58,9 @@ class DataTransformation:
                         )]
             )
 
-            logging.info("Created preprocessor object from ColumnTransformer")
+            logger.info("Created preprocessor object from ColumnTransformer")
 
-            logging.info(
+            logger.info(
                 "Exited get_data_transformer_object method of DataTransformation class"
             )
             return preprocessor
@@ -65,35 +70,39 @@ class DataTransformation:
 
     def initiate_data_transformation(self,) -> DataTransformationArtifact:
         try:
-            logging.info("Starting data transformation")
+            logger.info("Starting data transformation")
             preprocessor = self.get_data_transformer_object()
-            logging.info("Got the preprocessor object")
-
-            train_df = DataTransformation.read_data(
-                file_path=self.data_validation_artifact.valid_train_file_path
-            )
-            test_df = DataTransformation.read_data(
-                file_path=self.data_validation_artifact.valid_test_file_path
-            )
-
-            input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN], axis=1)
+            logger.info("Got the preprocessor object")
+
+            train_df = self.data_validation_artifact.valid_train_df
+            if train_df is None:
+                train_df = DataTransformation.read_data(
+                    file_path=self.data_validation_artifact.valid_train_file_path
+                )
+            test_df = self.data_validation_artifact.valid_test_df
+            if test_df is None:
+                test_df = DataTransformation.read_data(
+                    file_path=self.data_validation_artifact.valid_test_file_path
+                )
+
+            input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN])
             target_feature_train_df = train_df[TARGET_COLUMN]
             #Train Target Encoding
             #target_feature_train_df = target_feature_train_df.replace(
             #    TargetValueMapping().to_dict())
 
-            logging.info("Got train features and test features of Training dataset")
+            logger.info("Got train features and test features of Training dataset")
 
             
-            input_feature_test_df = test_df.drop(columns=[TARGET_COLUMN], axis=1)
+            input_feature_test_df = test_df.drop(columns=[TARGET_COLUMN])
             target_feature_test_df = test_df[TARGET_COLUMN]
             #Test Target Encoding
             #target_feature_test_df = target_feature_test_df.replace(
             #    TargetValueMapping().to_dict())
 
-            logging.info("Got train features and test features of Testing dataset")
+            logger.info("Got train features and test features of Testing dataset")
 
-            logging.info(
+            logger.info(
                 "Applying preprocessing object on training dataframe and testing dataframe"
             )
 
@@ -101,14 +110,14 @@ class DataTransformation:
             preprocessor_object = preprocessor.fit(input_feature_train_df[numerical_columns])
 
             transformed_input_train_feature = preprocessor_object.transform(input_feature_train_df[numerical_columns])
-            logging.info(
+            logger.info(
                 "Used the preprocessor object to fit transform the train features"
             )
             train_df_transformed_scaled = pd.DataFrame(transformed_input_train_feature, columns = numerical_columns)
             #train_df_transformed_scaled.index = input_feature_train_df
 
             transformed_input_test_feature = preprocessor_object.transform(input_feature_test_df[numerical_columns])
-            logging.info(
+            logger.info(
                 "Used the preprocessor object to transform the test features"
             )
             test_df_transformed_scaled = pd.DataFrame(transformed_input_test_feature, columns = numerical_columns)
@@ -117,7 +126,7 @@ class DataTransformation:
             input_feature_train_df_final = pd.concat([train_df_transformed_scaled,input_feature_train_df[categorical_columns]],axis=1)
             input_feature_test_df_final = pd.concat([test_df_transformed_scaled,input_feature_test_df[categorical_columns]],axis=1)
 
-            logging.info("Creating train array and test array")
+            logger.info("Creating train array and test array")
 
             train_arr = np.c_[
                 np.array(input_feature_train_df_final), np.array(target_feature_train_df)
@@ -127,30 +136,36 @@ class DataTransformation:
                 np.array(input_feature_test_df_final), np.array(target_feature_test_df)
             ]
 
-            save_object(
+            self.artifact_persister.save(
+                self.data_transformation_config.transformed_object_file_path, save_object,
                 self.data_transformation_config.transformed_object_file_path,
                 preprocessor_object,
             )
-            save_numpy_array_data(
+            self.artifact_persister.save(
+                self.data_transformation_config.transformed_train_file_path, save_numpy_array_data,
                 self.data_transformation_config.transformed_train_file_path,
                 array=train_arr,
             )
-            save_numpy_array_data(
+            self.artifact_persister.save(
+                self.data_transformation_config.transformed_test_file_path, save_numpy_array_data,
                 self.data_transformation_config.transformed_test_file_path,
                 array=test_arr,
             )
             
-            logging.info("Created train array and test array")
+            logger.info("Created train array and test array")
 
             data_transformation_artifact = DataTransformationArtifact(
                 transformed_object_file_path=self.data_transformation_config.transformed_object_file_path,
                 transformed_train_file_path=self.data_transformation_config.transformed_train_file_path,
                 transformed_test_file_path=self.data_transformation_config.transformed_test_file_path,
+                transformed_object=preprocessor_object,
+                transformed_train_arr=train_arr,
+                transformed_test_arr=test_arr,
             )
 
-            logging.info(f"Data transformation artifact: {data_transformation_artifact}")
+            logger.info(f"Data transformation artifact: {data_transformation_artifact}")
             
-            logging.info(
+            logger.info(
                 "Exited initiate_data_transformation method of Data_Transformation class"
             )
             
@@ -1,30 +1,30 @@
 import os, sys
 import json
 import pandas as pd
-from evidently.model_profile import Profile
-from evidently.model_profile.sections import DataDriftProfileSection
-from evidently.dashboard import Dashboard
-from evidently.pipeline.column_mapping import ColumnMapping
-from evidently.dashboard.tabs import DataDriftTab
 from pandas import DataFrame
 from toxicpred.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
 from toxicpred.entity.config_entity import DataValidationConfig
 from toxicpred.constant.training_pipeline import SCHEMA_FILE_PATH, VALID_SCHEMA_FILE_PATH
 from toxicpred.exception import ToxicityException
-from toxicpred.logger import logging
-from toxicpred.utils.main_utils import read_yaml_file, write_yaml_file, read_json_file
+from toxicpred.logger import get_logger
+from toxicpred.utils.main_utils import read_yaml_file, write_yaml_file, read_json_file, read_dataframe, write_dataframe
+from toxicpred.utils.artifact_persister import ArtifactPersister
 import warnings
 warnings.filterwarnings("ignore")
 
+logger = get_logger(__name__)
+
 class DataValidation:
     def __init__(
         self,
         data_ingestion_artifact: DataIngestionArtifact,
-        data_validation_config: DataValidationConfig
+        data_validation_config: DataValidationConfig,
+        artifact_persister: ArtifactPersister = None
     ):
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_validation_config = data_validation_config
+            self.artifact_persister = artifact_persister or ArtifactPersister(asynchronous=False)
             self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
             self._valid_schema = read_json_file(file_path=VALID_SCHEMA_FILE_PATH)
         except Exception as e:
@@ -33,7 +33,7 @@ class DataValidation:
     @staticmethod
     def read_data(file_path) -> DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_dataframe(file_path)
         except Exception as e:
             raise ToxicityException(e, sys) from e
 
@@ -44,7 +44,7 @@ class DataValidation:
         '''
         try:
             status = len(dataframe.columns) == len(self._schema_config["columns"]) - 1
-            logging.info(f"Is required column present: [{status}]")
+            logger.info(f"Is required column present: [{status}]")
             return status
         except Exception as e:
             raise ToxicityException(e, sys) from e
@@ -63,7 +63,7 @@ class DataValidation:
                     status = False
                     missing_numerical_columns.append(column)
             
-            logging.info(f"Missing numerical column: {missing_numerical_columns}")
+            logger.info(f"Missing numerical column: {missing_numerical_columns}")
             return status
 
         except Exception as e:
@@ -83,7 +83,7 @@ class DataValidation:
                     status = False
                     missing_categorical_columns.append(column)
             
-            logging.info(f"Missing categorical column: {missing_categorical_columns}")
+            logger.info(f"Missing categorical column: {missing_categorical_columns}")
             return status
 
         except Exception as e:
@@ -134,6 +134,11 @@ class DataValidation:
         if there is dataset drift found
         '''
         try:
+            #evidently takes seconds to import, load it only when drift is computed
+            from evidently.model_profile import Profile
+            from evidently.model_profile.sections import DataDriftProfileSection
+            from evidently.dashboard import Dashboard
+            from evidently.dashboard.tabs import DataDriftTab
 
             data_drift_profile = Profile(sections=[DataDriftProfileSection()])
 
@@ -156,7 +161,7 @@ class DataValidation:
             #data_drift_dashboard.show()
             data_drift_dashboard.save(self.data_validation_config.drift_report_dashboard_path)
 
-            logging.info(f"Drift detected in {n_drifted_features} out of {n_features}")
+            logger.info(f"Drift detected in {n_drifted_features} out of {n_features}")
             drift_status = json_report["data_drift"]["data"]["metrics"]["dataset_drift"]
             return drift_status
 
@@ -168,16 +173,18 @@ class DataValidation:
         initiates the complete data validation component
         '''
         try:
-            logging.info("Starting data validation")
-
-            train_df, test_df = (
-                DataValidation.read_data(
-                    file_path = self.data_ingestion_artifact.trained_file_path
-                ),
-                DataValidation.read_data(
-                    file_path = self.data_ingestion_artifact.test_file_path
+            logger.info("Starting data validation")
+
+            train_df, test_df = self.data_ingestion_artifact.train_df, self.data_ingestion_artifact.test_df
+            if train_df is None or test_df is None:
+                train_df, test_df = (
+                    DataValidation.read_data(
+                        file_path = self.data_ingestion_artifact.trained_file_path
+                    ),
+                    DataValidation.read_data(
+                        file_path = self.data_ingestion_artifact.test_file_path
+                    )
                 )
-            )
 
             #Validating number of columns
             validation_error_msg = ""
@@ -199,7 +206,7 @@ class DataValidation:
             else:
                 validation_error_msg += f"No columns are missing in testing dataframe "
 
-            logging.info(f"All Columns Validation Message: {validation_error_msg}")
+            logger.info(f"All Columns Validation Message: {validation_error_msg}")
             if not validation_status:
                 raise Exception(validation_error_msg)
             
@@ -223,7 +230,7 @@ class DataValidation:
                 validation_error_msg += f"No numerical columns are missing in testing dataframe "
                 
             
-            logging.info(f"Numerical Columns Validation Message: {validation_error_msg}")
+            logger.info(f"Numerical Columns Validation Message: {validation_error_msg}")
             if not validation_status:
                 raise Exception(validation_error_msg)
 
@@ -246,7 +253,7 @@ class DataValidation:
             else:
                 validation_error_msg += f"No categorical columns are missing in testing dataframe "
 
-            logging.info(f"Categorical Columns Validation Message: {validation_error_msg}")
+            logger.info(f"Categorical Columns Validation Message: {validation_error_msg}")
             if not validation_status:
                 raise Exception(validation_error_msg)
 
@@ -263,11 +270,13 @@ class DataValidation:
             valid_train_df = train_df
             valid_test_df = test_df
 
-            valid_train_df.to_csv(
-                self.data_validation_config.valid_train_file_path, index=False, header=True
+            self.artifact_persister.save(
+                self.data_validation_config.valid_train_file_path, write_dataframe,
+                self.data_validation_config.valid_train_file_path, valid_train_df
             )
-            valid_test_df.to_csv(
-               self.data_validation_config.valid_test_file_path, index=False, header=True
+            self.artifact_persister.save(
+                self.data_validation_config.valid_test_file_path, write_dataframe,
+                self.data_validation_config.valid_test_file_path, valid_test_df
             )
 
             #Check Data Drift
@@ -279,7 +288,7 @@ class DataValidation:
                 #validation_status = False
             else:
                 validation_error_msg += f"No Data Drift Detected "
-            logging.info(f"Data Drift Message: {validation_error_msg}")
+            logger.info(f"Data Drift Message: {validation_error_msg}")
             
             #STOP AND RAISE EXCEPTON FOR DATADRIFT IF REQUIRED HERE
 
@@ -290,10 +299,12 @@ class DataValidation:
                 invalid_train_file_path=self.data_validation_config.invalid_train_file_path,
                 invalid_test_file_path=self.data_validation_config.invalid_test_file_path,
                 drift_report_file_path=self.data_validation_config.drift_report_file_path,
-                drift_report_dashboard_path= self.data_validation_config.drift_report_dashboard_path
+                drift_report_dashboard_path= self.data_validation_config.drift_report_dashboard_path,
+                valid_train_df=valid_train_df,
+                valid_test_df=valid_test_df
             )
 
-            logging.info(f"Data validation artifact: {data_validation_artifact}")
+            logger.info(f"Data validation artifact: {data_validation_artifact}")
   
             return data_validation_artifact
             
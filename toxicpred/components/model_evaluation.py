@@ -1,17 +1,20 @@
 from toxicpred.exception import ToxicityException
-from toxicpred.logger import logging
+from toxicpred.logger import get_logger
 from toxicpred.entity.artifact_entity import DataValidationArtifact,DataTransformationArtifact,ModelTrainerArtifact,ModelEvaluationArtifact
 from toxicpred.entity.config_entity import ModelEvaluationConfig
 import os,sys
 from toxicpred.ml.metric.regression_metric import get_regression_score
 from toxicpred.ml.model.estimator import ToxicityModel
-from toxicpred.utils.main_utils import save_object,load_object,write_yaml_file,write_json_file,read_yaml_file
+from toxicpred.utils.main_utils import save_object,load_object,load_model,write_yaml_file,write_json_file,read_yaml_file,read_dataframe
 from toxicpred.constant.training_pipeline import SCHEMA_FILE_PATH
 from toxicpred.ml.model.estimator import ModelResolver
 from toxicpred.constant.training_pipeline import TARGET_COLUMN
 import pandas  as  pd
 import warnings
 warnings.filterwarnings("ignore")
+
+logger = get_logger(__name__)
+
 class ModelEvaluation:
     def __init__(self, model_eval_config: ModelEvaluationConfig,
                        data_validation_artifact: DataValidationArtifact,
@@ -28,20 +31,39 @@ class ModelEvaluation:
             raise ToxicityException(e,sys) from e
 
 
+    def evaluation_report(self, trained_metric) -> dict:
+        model_eval_report = {"r2_score" : trained_metric.r2_score, "mae_value": trained_metric.mae_value, "rmse_value": trained_metric.rmse_value}
+        approximate_neighbor_artifact = self.model_trainer_artifact.approximate_neighbor_artifact
+        if approximate_neighbor_artifact is not None:
+            model_eval_report["approximate_neighbor"] = {
+                "recall_at_k": approximate_neighbor_artifact.recall_at_k,
+                "exact_r2_score": approximate_neighbor_artifact.exact_r2_score,
+                "approximate_r2_score": approximate_neighbor_artifact.approximate_r2_score,
+                "r2_score_drop": approximate_neighbor_artifact.r2_score_drop,
+                "is_within_threshold": approximate_neighbor_artifact.is_within_threshold,
+            }
+        return model_eval_report
+
     def initiate_model_evaluation(self) -> ModelEvaluationArtifact:
         try:
             valid_train_file_path = self.data_validation_artifact.valid_train_file_path
             valid_test_file_path = self.data_validation_artifact.valid_test_file_path
             
-            train_df = pd.read_csv(valid_train_file_path)
-            test_df = pd.read_csv(valid_test_file_path)
+            train_df = self.data_validation_artifact.valid_train_df
+            if train_df is None:
+                train_df = read_dataframe(valid_train_file_path)
+            test_df = self.data_validation_artifact.valid_test_df
+            if test_df is None:
+                test_df = read_dataframe(valid_test_file_path)
 
             df = pd.concat([train_df,test_df])
             y_true = df[TARGET_COLUMN]
             df.drop(TARGET_COLUMN, axis=1, inplace=True)
 
             numerical_columns = self._schema_config["numerical_columns"]
-            data_transform_obj = load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
+            data_transform_obj = self.data_transformation_artifact.transformed_object
+            if data_transform_obj is None:
+                data_transform_obj = load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
     
             transformed_npy_array = data_transform_obj.transform(df[numerical_columns])
             transformed_df = pd.DataFrame(transformed_npy_array, columns=numerical_columns)
@@ -53,7 +75,9 @@ class ModelEvaluation:
      
 
             train_model_file_path = self.model_trainer_artifact.trained_model_file_path
-            train_model = load_object(file_path=train_model_file_path)
+            train_model = self.model_trainer_artifact.trained_model
+            if train_model is None:
+                train_model = load_model(file_path=train_model_file_path)
             y_trained_pred = train_model.predict(df_final)
             trained_metric = get_regression_score(y_true, y_trained_pred)
 
@@ -65,6 +89,16 @@ class ModelEvaluation:
 
             model_resolver = ModelResolver()
             is_model_accepted = True
+            rejection_reason = None
+
+            approximate_neighbor_artifact = self.model_trainer_artifact.approximate_neighbor_artifact
+            if approximate_neighbor_artifact is not None and not approximate_neighbor_artifact.is_within_threshold:
+                is_model_accepted = False
+                rejection_reason = (
+                    f"the approximate neighbor index recall@k {approximate_neighbor_artifact.recall_at_k:.4f} or "
+                    f"R2 drop {approximate_neighbor_artifact.r2_score_drop:.4f} against the exact index is outside the thresholds"
+                )
+                logger.info(rejection_reason)
 
             if not model_resolver.is_model_exists():
                 model_evaluation_artifact = ModelEvaluationArtifact(
@@ -73,26 +107,26 @@ class ModelEvaluation:
                     best_model_path=train_model_file_path,
                     trained_model_path=train_model_file_path,
                     train_model_metric_artifact=self.model_trainer_artifact.train_metric_artifact,
-                    best_model_metric_artifact=self.model_trainer_artifact.test_metric_artifact
+                    best_model_metric_artifact=self.model_trainer_artifact.test_metric_artifact,
+                    rejection_reason=rejection_reason
                 )
 
-                model_eval_report = {"r2_score" : trained_metric.r2_score, "mae_value": trained_metric.mae_value, "rmse_value": trained_metric.rmse_value}
+                model_eval_report = self.evaluation_report(trained_metric)
                 write_json_file(self.model_eval_config.report_file_path, model_eval_report)
                 
-                logging.info(f"Model evaluation artifact: {model_evaluation_artifact}")
+                logger.info(f"Model evaluation artifact: {model_evaluation_artifact}")
                 return model_evaluation_artifact
 
             latest_model_path = model_resolver.get_best_model_path()
-            latest_model = load_object(file_path=latest_model_path)
+            latest_model = load_model(file_path=latest_model_path)
             y_latest_pred = latest_model.predict(df_final)
             latest_metric = get_regression_score(y_true, y_latest_pred)
             
 
             improved_accuracy = trained_metric.r2_score-latest_metric.r2_score
-            if self.model_eval_config.change_threshold < improved_accuracy:
-                is_model_accepted=True
-            else:
+            if self.model_eval_config.change_threshold >= improved_accuracy:
                 is_model_accepted=False
+                rejection_reason = rejection_reason or "the trained model is not better than the best model"
 
             model_evaluation_artifact = ModelEvaluationArtifact(
                     is_model_accepted=is_model_accepted, 
@@ -100,13 +134,14 @@ class ModelEvaluation:
                     best_model_path=latest_model_path, 
                     trained_model_path=train_model_file_path, 
                     train_model_metric_artifact=trained_metric, 
-                    best_model_metric_artifact=latest_metric)
+                    best_model_metric_artifact=latest_metric,
+                    rejection_reason=rejection_reason)
               
-            model_eval_report = {"r2_score" : trained_metric.r2_score, "mae_value": trained_metric.mae_value, "rmse_value": trained_metric.rmse_value}
+            model_eval_report = self.evaluation_report(trained_metric)
             write_json_file(self.model_eval_config.report_file_path, model_eval_report)
 
 
-            logging.info(f"Model evaluation artifact: {model_evaluation_artifact}")
+            logger.info(f"Model evaluation artifact: {model_evaluation_artifact}")
             return model_evaluation_artifact
 
         except Exception as e:
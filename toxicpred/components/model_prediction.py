@@ -3,112 +3,103 @@ from toxicpred.exception import ToxicityException
 import sys
 from toxicpred.cloud_storage.s3_syncer import S3Sync
 from toxicpred.ml.model.estimator import ModelResolver, ToxicityModel
+from toxicpred.ml.model.registry import ModelRegistry
+from toxicpred.ml.model.prediction_cache import PredictionCache
+from toxicpred.ml.validation.data_validity import DataValidityChecker
+from toxicpred.entity.artifact_entity import DataValidityArtifact
 from toxicpred.constant.training_pipeline import SAVED_MODEL_DIR
 from toxicpred.utils.main_utils import read_yaml_file, read_json_file
 from toxicpred.constant.training_pipeline import SCHEMA_FILE_PATH, VALID_SCHEMA_FILE_PATH
-from toxicpred.logger import logging
-from toxicpred.utils.main_utils import load_object
+from toxicpred.constant.application import PREDICTION_CACHE_ENABLED, PREDICTION_CACHE_MAX_BATCH_ROWS
+from toxicpred.serving.metrics import (BATCH_SIZE, MODEL_PREDICT_SECONDS, MODEL_RESOLUTION_SECONDS,
+                                       PREPROCESSING_SECONDS, ROWS_SCORED, ROWS_VALIDATED, VALIDATION_SECONDS)
+from toxicpred.logger import get_logger
 import warnings
 warnings.filterwarnings("ignore")
+logger = get_logger(__name__)
 
 
 class ModelPrediction:
     def __init__(self):
         try:
             
-            self.model_resolver_local = ModelResolver(model_dir=SAVED_MODEL_DIR)
+            self.model_registry = ModelRegistry.get_registry(model_dir=SAVED_MODEL_DIR)
+            self.model_resolver_local = self.model_registry.model_resolver
             self.s3_sync = S3Sync()
             self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
             self._valid_schema = read_json_file(file_path=VALID_SCHEMA_FILE_PATH)
+            self.data_validity_checker = DataValidityChecker(self._valid_schema)
+            self.prediction_cache = PredictionCache() if PREDICTION_CACHE_ENABLED else None
         except Exception as e:
             raise ToxicityException(e,sys)
 
 
     def check_data_validity(self, df: DataFrame) -> bool:
         try:
-            logging.info("Entered the check_data_validity method of Model Prediction class")
-            status = True
+            logger.info("Entered the check_data_validity method of Model Prediction class")
+            status = bool(self.check_row_validity(df).valid_mask.all())
+            if not status:
+                logger.info("Invalid data found!! Exiting the check_data_validity method of Model Prediction class")
+                return status
 
-            #numerical columns
-            cico_min = self._valid_schema["CIC0"]["min"]
-            cico_max = self._valid_schema["CIC0"]["max"]
-            cico_val_list = list(df["CIC0"].values)
-
-            for val in cico_val_list:
-                if val < cico_min or val > cico_max:
-                    status = False
-                    logging.info("Invalid data found!! Exiting the check_data_validity method of Model Prediction class")
-                    return status
-
-            gats_min = self._valid_schema["GATS1i"]["min"]
-            gats_max = self._valid_schema["GATS1i"]["max"]
-            gats_val_list = list(df["GATS1i"].values)
-
-            for val in gats_val_list:
-                if val < gats_min or val > gats_max:
-                    status = False
-                    logging.info("Invalid data found!! Exiting the check_data_validity method of Model Prediction class")
-                    return status
-
-            mlogp_min = self._valid_schema["MLOGP"]["min"]
-            mlogp_max = self._valid_schema["MLOGP"]["max"]
-            mlogp_val_list = list(df["MLOGP"].values)
-
-            for val in mlogp_val_list:
-                if val < mlogp_min or val > mlogp_max:
-                    status = False
-                    logging.info("Invalid data found!! Exiting the check_data_validity method of Model Prediction class")
-                    return status
-
-            smdz_min = self._valid_schema["SM1_DzZ"]["min"]
-            smdz_max = self._valid_schema["SM1_DzZ"]["max"]
-            smdz_val_list = list(df["SM1_DzZ"].values)
-            
-            for val in smdz_val_list:
-                if val < smdz_min or val > smdz_max:
-                    status = False
-                    logging.info("Invalid data found!! Exiting the check_data_validity method of Model Prediction class")
-                    return status
-
-            #categorical columns
-            valid_ndsch_list = self._valid_schema["NdsCH"]
-            ndsch_values_list = list(df['NdsCH'].values)
+            logger.info("All data valid, Exiting the check_data_validity method of Model Prediction class")            
+            return status
+   
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
 
-            valid_ndssc_list = self._valid_schema["NdssC"]
-            ndssc_values_list = list(df['NdsCH'].values)
+    def check_row_validity(self, df: DataFrame) -> DataValidityArtifact:
+        try:
+            with VALIDATION_SECONDS.time():
+                data_validity_artifact = self.data_validity_checker.check(df)
+            n_valid = int(data_validity_artifact.valid_mask.sum())
+            ROWS_VALIDATED.inc(n_valid, result="valid")
+            ROWS_VALIDATED.inc(len(df) - n_valid, result="invalid")
+            return data_validity_artifact
 
-            for val in ndsch_values_list:
-                if val not in valid_ndsch_list:
-                    status = False
-                    logging.info("Invalid data found!! Exiting the check_data_validity method of Model Prediction class")
-                    return status
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
 
-            for val in ndssc_values_list:
-                if val not in valid_ndssc_list:
-                    status = False
-                    logging.info("Invalid data found!! Exiting the check_data_validity method of Model Prediction class")
-                    return status
+    def describe_invalid_rows(self, data_validity_artifact: DataValidityArtifact) -> list:
+        try:
+            return self.data_validity_checker.describe_invalid_rows(data_validity_artifact)
 
-            logging.info("All data valid, Exiting the check_data_validity method of Model Prediction class")            
-            return status
-   
         except Exception as e:
             raise ToxicityException(e, sys) from e
 
     
     def predict_output(self, df:DataFrame):
         try:
-            logging.info("Entered the predict_output method of Model Prediction class")
-            model_resolver = self.model_resolver_local
-            if not model_resolver.is_model_exists():
+            logger.info("Entered the predict_output method of Model Prediction class")
+            with MODEL_RESOLUTION_SECONDS.time():
+                model_version, model = self.model_registry.get_model()
+            if model is None:
                 return []
-            best_model_path = model_resolver.get_best_model_path()
-            model = load_object(file_path=best_model_path)
-            y_pred = model.predict(df)
+
+            def score(x):
+                #same as model.predict_array, timed stage by stage
+                with PREPROCESSING_SECONDS.time():
+                    model_input = model.transform_array(x)
+                with MODEL_PREDICT_SECONDS.time():
+                    return model.model.predict(model_input)
+
+            BATCH_SIZE.observe(len(df))
+            if self.prediction_cache is None or len(df) > PREDICTION_CACHE_MAX_BATCH_ROWS:
+                y_pred = score(df)
+            else:
+                with PREPROCESSING_SECONDS.time():
+                    features = model.to_feature_array(df)
+                y_pred = self.prediction_cache.predict(model_version, features, score)
+            ROWS_SCORED.inc(len(y_pred))
             #df['predicted_column'] = y_pred
             #prediction_result = df['predicted_column'].tolist()
-            logging.info("Exiting the predict_output method of Model Prediction class")
+            logger.info("Exiting the predict_output method of Model Prediction class")
             return y_pred.tolist()
 
         except Exception as e:
-            raise ToxicityException(e,sys) from e
\ No newline at end of file
+            raise ToxicityException(e,sys) from e
+
+    def prediction_cache_stats(self) -> dict:
+        if self.prediction_cache is None:
+            return {}
+        return self.prediction_cache.stats()
@@ -1,54 +1,166 @@
 import os,sys
+import time
+
+import numpy as np
 
 from toxicpred.exception import ToxicityException
-from toxicpred.logger import logging
+from toxicpred.logger import get_logger
 from toxicpred.utils.main_utils import (load_numpy_array_data, load_object,
-                                     save_object)
-from toxicpred.entity.artifact_entity import (DataTransformationArtifact,
-                                           ModelTrainerArtifact)
+                                     save_model)
+from toxicpred.entity.artifact_entity import (ApproximateNeighborArtifact, DataTransformationArtifact,
+                                           ModelTrainerArtifact, NeighborIndexArtifact)
 from toxicpred.entity.config_entity import ModelTrainerConfig
 from toxicpred.ml.metric.regression_metric import get_regression_score
+from toxicpred.ml.model.ann import IVFNeighborsRegressor
 from toxicpred.ml.model.estimator import ToxicityModel
+from toxicpred.utils.artifact_persister import ArtifactPersister
 from sklearn.neighbors import KNeighborsRegressor
-from sklearn.svm import SVR
-from sklearn.ensemble import StackingRegressor
 import warnings
 warnings.filterwarnings("ignore")
 
+logger = get_logger(__name__)
+
 class ModelTrainer:
     def __init__(self,
         model_trainer_config: ModelTrainerConfig,
-        data_transformation_artifact: DataTransformationArtifact):
+        data_transformation_artifact: DataTransformationArtifact,
+        artifact_persister: ArtifactPersister = None):
         try:
             self.model_trainer_config = model_trainer_config
             self.data_transformation_artifact = data_transformation_artifact
+            self.artifact_persister = artifact_persister or ArtifactPersister(asynchronous=False)
         except Exception as e:
             raise ToxicityException(e,sys)
 
-    def train_model(self, x_train, y_train):
+    def build_model(self, algorithm: str, leaf_size: int = None):
+        if algorithm == "ivf":
+            if self.model_trainer_config.metric != "euclidean":
+                raise ValueError(f"The ivf neighbor index only supports the euclidean metric, got {self.model_trainer_config.metric}")
+            return IVFNeighborsRegressor(
+                n_neighbors=self.model_trainer_config.n_neighbors,
+                n_lists=self.model_trainer_config.ivf_n_lists,
+                n_probe=self.model_trainer_config.ivf_n_probe,
+            )
+        return KNeighborsRegressor(
+            n_neighbors=self.model_trainer_config.n_neighbors,
+            metric=self.model_trainer_config.metric,
+            algorithm=algorithm,
+            leaf_size=leaf_size or self.model_trainer_config.leaf_size,
+        )
+
+    def time_queries(self, model: KNeighborsRegressor, x_query) -> float:
+        '''
+        best of benchmark_repeat wall times to predict x_query in serving sized batches
+        '''
+        batch_size = self.model_trainer_config.benchmark_query_batch_size
+        timings = []
+        for _ in range(self.model_trainer_config.benchmark_repeat):
+            start = time.perf_counter()
+            for batch_start in range(0, len(x_query), batch_size):
+                model.predict(x_query[batch_start:batch_start + batch_size])
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def benchmark_neighbor_indexes(self, x_train, y_train, x_query):
+        '''
+        fits every candidate index and returns the fitted model that answers x_query
+        fastest together with the timings of all candidates
+        '''
+        logger.info("Entered benchmark_neighbor_indexes method of ModelTrainer class")
+        timings = {}
+        best = None
+        for algorithm, leaf_size in self.model_trainer_config.benchmark_candidates:
+            name = algorithm if leaf_size is None else f"{algorithm}[leaf_size={leaf_size}]"
+            model = self.build_model(algorithm, leaf_size)
+            start = time.perf_counter()
+            model.fit(x_train, y_train)
+            fit_seconds = time.perf_counter() - start
+            query_seconds = self.time_queries(model, x_query)
+            timings[name] = {"fit_seconds": fit_seconds, "query_seconds": query_seconds}
+            logger.info(f"Neighbor index {name}: fit {fit_seconds:.4f}s, "
+                         f"{len(x_query)} queries {query_seconds:.4f}s")
+            if best is None or query_seconds < best[0]:
+                best = (query_seconds, model, algorithm, leaf_size)
+
+        _, model, algorithm, leaf_size = best
+        neighbor_index_artifact = NeighborIndexArtifact(
+            algorithm=algorithm, leaf_size=model.leaf_size if leaf_size is not None else None, timings=timings
+        )
+        logger.info(f"Selected neighbor index: {neighbor_index_artifact.algorithm} "
+                     f"leaf_size={neighbor_index_artifact.leaf_size}")
+        return model, neighbor_index_artifact
+
+    def train_model(self, x_train, y_train, x_query=None):
         try:
-            model = KNeighborsRegressor(n_neighbors= 6, metric='euclidean')
+            algorithm = self.model_trainer_config.neighbor_algorithm
+            if algorithm == "benchmark":
+                if x_query is None or len(x_query) == 0:
+                    x_query = x_train
+                n_query = min(len(x_query), self.model_trainer_config.benchmark_query_rows)
+                #a fixed sample so that reruns on the same data time the same queries
+                query_rows = np.random.default_rng(0).choice(len(x_query), size=n_query, replace=False)
+                return self.benchmark_neighbor_indexes(x_train, y_train, x_query[query_rows])
+
+            model = self.build_model(algorithm)
             model.fit(x_train, y_train)
-            return model
+            neighbor_index_artifact = NeighborIndexArtifact(
+                algorithm=algorithm,
+                leaf_size=None if algorithm in ("brute", "ivf") else model.leaf_size,
+                timings={},
+            )
+            return model, neighbor_index_artifact
 
         except Exception as e:
             raise e
 
+    def evaluate_approximate_model(self, model, x_train, y_train, x_test, y_test) -> ApproximateNeighborArtifact:
+        '''
+        compares the approximate model with an exact index fitted on the same rows:
+        recall@k of the neighbors it finds for the test split and the change in test R2
+        '''
+        logger.info("Entered evaluate_approximate_model method of ModelTrainer class")
+        exact_model = self.build_model("auto")
+        exact_model.fit(x_train, y_train)
+        k = self.model_trainer_config.n_neighbors
+        exact_neighbors = exact_model.kneighbors(x_test, n_neighbors=k, return_distance=False)
+        approximate_neighbors = model.kneighbors(x_test, n_neighbors=k, return_distance=False)
+        #neighbors found by both, counted row by row without a python loop
+        found = (exact_neighbors[:, :, None] == approximate_neighbors[:, None, :]).any(axis=2)
+        recall_at_k = float(found.mean())
+
+        exact_r2_score = get_regression_score(y_true=y_test, y_pred=exact_model.predict(x_test)).r2_score
+        approximate_r2_score = get_regression_score(y_true=y_test, y_pred=model.predict(x_test)).r2_score
+        r2_score_drop = float(exact_r2_score - approximate_r2_score)
+        approximate_neighbor_artifact = ApproximateNeighborArtifact(
+            recall_at_k=recall_at_k,
+            exact_r2_score=float(exact_r2_score),
+            approximate_r2_score=float(approximate_r2_score),
+            r2_score_drop=r2_score_drop,
+            is_within_threshold=(recall_at_k >= self.model_trainer_config.ann_min_recall
+                                 and r2_score_drop <= self.model_trainer_config.ann_max_r2_drop),
+        )
+        logger.info(f"Approximate neighbor artifact: {approximate_neighbor_artifact}")
+        return approximate_neighbor_artifact
+
     def initiate_model_trainer(self) -> ModelTrainerArtifact:
 
         try:
-            logging.info("Entered initiate_model_trainer method of ModelTrainer class")
+            logger.info("Entered initiate_model_trainer method of ModelTrainer class")
 
             train_file_path = self.data_transformation_artifact.transformed_train_file_path
             test_file_path = self.data_transformation_artifact.transformed_test_file_path
             
             #Load transformed data
-            train_arr = load_numpy_array_data(
-                file_path = train_file_path
-            )
-            test_arr = load_numpy_array_data(
-                file_path = test_file_path
-            )
+            train_arr = self.data_transformation_artifact.transformed_train_arr
+            if train_arr is None:
+                train_arr = load_numpy_array_data(
+                    file_path = train_file_path
+                )
+            test_arr = self.data_transformation_artifact.transformed_test_arr
+            if test_arr is None:
+                test_arr = load_numpy_array_data(
+                    file_path = test_file_path
+                )
             x_train, y_train, x_test, y_test = (
                 train_arr[:, :-1],
                 train_arr[:, -1],
@@ -56,7 +168,8 @@ class ModelTrainer:
                 test_arr[:, -1]
             )
 
-            model = self.train_model(x_train, y_train)
+            #the held out test rows are the query sample when the index is benchmarked
+            model, neighbor_index_artifact = self.train_model(x_train, y_train, x_query=x_test)
             y_train_pred = model.predict(x_train)
             regression_train_metric = get_regression_score(y_true = y_train, y_pred = y_train_pred)
 
@@ -66,12 +179,21 @@ class ModelTrainer:
             y_test_pred = model.predict(x_test)
             regression_test_metric = get_regression_score(y_true=y_test, y_pred=y_test_pred)
 
-            preprocessor = load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
+            approximate_neighbor_artifact = None
+            if isinstance(model, IVFNeighborsRegressor):
+                approximate_neighbor_artifact = self.evaluate_approximate_model(model, x_train, y_train, x_test, y_test)
+
+            preprocessor = self.data_transformation_artifact.transformed_object
+            if preprocessor is None:
+                preprocessor = load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
             
             model_dir_path = os.path.dirname(self.model_trainer_config.trained_model_file_path)
             os.makedirs(model_dir_path,exist_ok=True)
             toxicity_model = ToxicityModel(preprocessor=preprocessor,model=model)
-            save_object(self.model_trainer_config.trained_model_file_path, obj=toxicity_model)
+            self.artifact_persister.save(
+                self.model_trainer_config.trained_model_file_path, save_model,
+                self.model_trainer_config.trained_model_file_path, model=toxicity_model
+            )
 
             print("Train Metrics")
             print("Train_R2 score :", regression_train_metric.r2_score)
@@ -87,9 +209,12 @@ class ModelTrainer:
             model_trainer_artifact = ModelTrainerArtifact(
                 trained_model_file_path=self.model_trainer_config.trained_model_file_path, 
                 train_metric_artifact=regression_train_metric,
-                test_metric_artifact=regression_test_metric)
+                test_metric_artifact=regression_test_metric,
+                neighbor_index_artifact=neighbor_index_artifact,
+                approximate_neighbor_artifact=approximate_neighbor_artifact,
+                trained_model=toxicity_model)
             
-            logging.info(f"Model trainer artifact: {model_trainer_artifact}")
+            logger.info(f"Model trainer artifact: {model_trainer_artifact}")
             return model_trainer_artifact
 
         except Exception as e:
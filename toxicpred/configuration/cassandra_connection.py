@@ -1,11 +1,12 @@
 import os
 import sys
 
-from toxicpred.constant.database import KEYSPACE_NAME,DATABASE_NAME
-from toxicpred.constant.env_variable import ASTRA_CLUSTER_ID, ASTRA_REGION, ASTRA_DB_APPLICATION_TOKEN
+from toxicpred.constant.database import (KEYSPACE_NAME, DATABASE_NAME, CASSANDRA_FETCH_SIZE,
+                                         CASSANDRA_REQUEST_TIMEOUT_SECONDS)
+from toxicpred.constant.env_variable import (ASTRA_CLUSTER_ID, ASTRA_REGION, ASTRA_DB_APPLICATION_TOKEN,
+                                             ASTRA_REST_BASE_URL, ASTRA_SECURE_CONNECT_BUNDLE)
 from toxicpred.exception import ToxicityException
 from pathlib import Path
-from astrapy.rest import create_client, http_methods
 
 
 class AstraCassandraConfig:
@@ -17,12 +18,17 @@ class AstraCassandraConfig:
             self.astra_cluster_id = os.getenv(ASTRA_CLUSTER_ID)
             self.astra_region = os.getenv(ASTRA_REGION)
             self.astra_db_application_token = os.getenv(ASTRA_DB_APPLICATION_TOKEN)
+            self.astra_rest_base_url = os.getenv(ASTRA_REST_BASE_URL) or (
+                f"https://{self.astra_cluster_id}-{self.astra_region}.apps.astra.datastax.com"
+            )
+            self.astra_secure_connect_bundle = os.getenv(ASTRA_SECURE_CONNECT_BUNDLE)
 
         except Exception as e:
             raise ToxicityException(e, sys)
 
     def getAstraHTTPClient(self):
         try:
+             from astrapy.rest import create_client
              return create_client(astra_database_id=self.astra_cluster_id,
                          astra_database_region=self.astra_region,
                          astra_application_token=self.astra_db_application_token)
@@ -30,5 +36,24 @@ class AstraCassandraConfig:
         except Exception as e:
             raise ToxicityException(e, sys)
 
-        
+    def getCassandraSession(self):
+        '''
+        connects with the secure connect bundle and returns a session that returns rows as dicts,
+        the caller shuts down session.cluster when done
+        '''
+        try:
+            from cassandra.auth import PlainTextAuthProvider
+            from cassandra.cluster import EXEC_PROFILE_DEFAULT, Cluster, ExecutionProfile
+            from cassandra.query import dict_factory
+            profile = ExecutionProfile(row_factory=dict_factory, request_timeout=CASSANDRA_REQUEST_TIMEOUT_SECONDS)
+            cluster = Cluster(
+                cloud={"secure_connect_bundle": self.astra_secure_connect_bundle},
+                auth_provider=PlainTextAuthProvider("token", self.astra_db_application_token),
+                execution_profiles={EXEC_PROFILE_DEFAULT: profile},
+            )
+            session = cluster.connect()
+            session.default_fetch_size = CASSANDRA_FETCH_SIZE
+            return session
 
+        except Exception as e:
+            raise ToxicityException(e, sys)
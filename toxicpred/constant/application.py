@@ -1,2 +1,31 @@
 APP_HOST = "0.0.0.0"
-APP_PORT = 8080
\ No newline at end of file
+APP_PORT = 8080
+
+#seconds between checks of the saved model directory for a newer model
+MODEL_REGISTRY_REFRESH_INTERVAL: float = 1.0
+
+#preload and fork launcher, the parent loads the model once and forks the uvicorn workers
+SERVING_WORKERS: int = 4
+SERVING_WORKER_READY_TIMEOUT: float = 60.0
+#seconds a replaced worker gets to finish its in flight requests
+SERVING_GRACEFUL_TIMEOUT: float = 30.0
+
+#dynamic micro batching of /predict_single requests
+MICRO_BATCH_ENABLED: bool = True
+MICRO_BATCH_MAX_SIZE: int = 64
+MICRO_BATCH_MAX_WAIT_US: int = 2000
+
+#execution layer that runs validation and inference off the event loop, "thread" or "process"
+INFERENCE_EXECUTOR_KIND: str = "thread"
+INFERENCE_EXECUTOR_MAX_WORKERS: int = 4
+INFERENCE_EXECUTOR_MAX_QUEUE_SIZE: int = 64
+
+#streamed /predict_many parses, scores and returns the upload this many rows at a time
+STREAM_CHUNK_SIZE: int = 50_000
+
+#cache of single row and small batch predictions, keyed by model version and input features
+PREDICTION_CACHE_ENABLED: bool = True
+PREDICTION_CACHE_MAX_SIZE: int = 100_000
+PREDICTION_CACHE_TTL_SECONDS: float = 3600.0
+PREDICTION_CACHE_FLOAT_DECIMALS: int = 6
+PREDICTION_CACHE_MAX_BATCH_ROWS: int = 1_000
\ No newline at end of file
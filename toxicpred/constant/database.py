@@ -3,4 +3,24 @@ KEYSPACE_NAME = "qtoxickeys"
 DATABASE_NAME = "qtoxdata"
 
 #S3 BUCKET CONSTANTS
-TRAINING_BUCKET_NAME = "31165bsb4018-toxicity-s3"
\ No newline at end of file
+TRAINING_BUCKET_NAME = "31165bsb4018-toxicity-s3"
+
+#ASTRA REST EXPORT CONSTANTS
+ASTRA_REST_PAGE_SIZE = 1000
+#pages fetched ahead of the one being written to the feature store
+ASTRA_REST_PREFETCH_PAGES = 4
+ASTRA_REST_TIMEOUT_SECONDS = 30.0
+ASTRA_REST_MAX_RETRIES = 3
+
+#CASSANDRA DRIVER EXPORT CONSTANTS
+#the table is scanned by token ranges of its partition key, murmur3 tokens span a signed 64 bit ring
+CASSANDRA_PARTITION_KEY = "Index"
+MURMUR3_MIN_TOKEN = -2 ** 63
+MURMUR3_MAX_TOKEN = 2 ** 63 - 1
+CASSANDRA_SCAN_WORKERS = 8
+#more ranges than workers, so a worker that drew a small range picks up another one
+CASSANDRA_SCAN_SPLITS_PER_WORKER = 4
+CASSANDRA_FETCH_SIZE = 5000
+#pages scanned ahead of the one being written to the feature store
+CASSANDRA_MAX_PENDING_PAGES = 16
+CASSANDRA_REQUEST_TIMEOUT_SECONDS = 60.0
@@ -3,4 +3,10 @@ AWS_SECRET_ACCESS_KEY = "AWS_SECRET_ACCESS_KEY"
 AWS_REGION = "AWS_REGION"
 ASTRA_CLUSTER_ID = "ASTRA_CLUSTER_ID"
 ASTRA_REGION = "ASTRA_REGION"
-ASTRA_DB_APPLICATION_TOKEN = "ASTRA_DB_APPLICATION_TOKEN"
\ No newline at end of file
+ASTRA_DB_APPLICATION_TOKEN = "ASTRA_DB_APPLICATION_TOKEN"
+TOXICPRED_LOG_LEVEL = "TOXICPRED_LOG_LEVEL"
+TOXICPRED_LOG_LEVELS = "TOXICPRED_LOG_LEVELS"
+#overrides the https://<cluster id>-<region>.apps.astra.datastax.com REST endpoint, e.g. a local stand-in server
+ASTRA_REST_BASE_URL = "ASTRA_REST_BASE_URL"
+#path of the secure connect bundle zip of the database, used by the native driver export
+ASTRA_SECURE_CONNECT_BUNDLE = "ASTRA_SECURE_CONNECT_BUNDLE"
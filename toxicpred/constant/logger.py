@@ -0,0 +1,18 @@
+#records are handed to a background thread through a queue instead of being written by the caller
+LOG_QUEUE_ENABLED: bool = True
+#records logged while the queue is full are dropped and counted, the caller never waits
+LOG_QUEUE_MAX_SIZE: int = 10_000
+
+LOG_LEVEL: str = "INFO"
+#level of individual loggers, overridden by the TOXICPRED_LOG_LEVELS environment variable
+#given as "toxicpred.serving=DEBUG,toxicpred.components.model_prediction=WARNING"
+LOG_LOGGER_LEVELS: dict = {}
+
+#hot path loggers, at most this many records per second from each logging call site
+LOG_RATE_LIMITS: dict = {
+    "toxicpred.components.model_prediction": 5.0,
+    "toxicpred.pipeline.prediction_pipeline": 5.0,
+    "toxicpred.utils.main_utils": 5.0,
+}
+#loggers of which only this fraction of records is kept
+LOG_SAMPLE_RATES: dict = {}
@@ -4,16 +4,30 @@ SAVED_MODEL_DIR = os.path.join("saved_models")
 TARGET_COLUMN = "responseLC50"
 PIPELINE_NAME: str = "toxicity"
 ARTIFACT_DIR: str = "artifact"
-FILE_NAME: str = "toxicitypred.csv"
+#format of the dataframes passed between the stages, "parquet" and "feather" are written with
+#the dtypes declared in the schema file, "csv" leaves the types to be inferred by every reader
+ARTIFACT_FORMAT: str = "feather"
+ARTIFACT_FILE_EXTENSIONS: dict = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+ARTIFACT_FILE_EXTENSION: str = ARTIFACT_FILE_EXTENSIONS[ARTIFACT_FORMAT]
+#rows buffered into one parquet row group or feather record batch when written page by page
+ARTIFACT_ROW_GROUP_SIZE: int = 1_000_000
+FILE_NAME: str = f"toxicitypred{ARTIFACT_FILE_EXTENSION}"
 
 
 '''
 Defining basic and common file names
 '''
-TRAIN_FILE_NAME: str = "train.csv"
-TEST_FILE_NAME: str = "test.csv"
+TRAIN_FILE_NAME: str = f"train{ARTIFACT_FILE_EXTENSION}"
+TEST_FILE_NAME: str = f"test{ARTIFACT_FILE_EXTENSION}"
 PREPROCSSING_OBJECT_FILE_NAME = "preprocessing.pkl"
 MODEL_FILE_NAME = "model.pkl"
+#"mmap" saves the model as a json manifest with its arrays as .npy files that are
+#loaded memory mapped, "pickle" saves a single dill pickle as MODEL_FILE_NAME
+MODEL_FORMAT: str = "mmap"
+MODEL_MANIFEST_FILE_NAME = "model.json"
+MODEL_MANIFEST_FORMAT = "toxicpred-mmap-model"
+MODEL_MANIFEST_VERSION: int = 1
+MODEL_SAVE_FILE_NAME = MODEL_MANIFEST_FILE_NAME if MODEL_FORMAT == "mmap" else MODEL_FILE_NAME
 SCHEMA_FILE_PATH = os.path.join("config", "schema.yaml")
 VALID_SCHEMA_FILE_PATH = os.path.join("config", "validate.json")
 SCHEMA_DROP_COLS = "drop_columns"
@@ -27,6 +41,21 @@ DATA_INGESTION_FEATURE_STORE_DIR: str = "feature_store"
 DATA_INGESTION_INGESTED_DIR: str = "ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATION: float = 0.2
 DATA_INGESTION_RANDOM_STATE: int = 74
+#"restapi" pages through the Astra REST endpoint, "driver" scans token ranges in parallel with cassandra-driver
+DATA_INGESTION_EXPORT_METHOD: str = "restapi"
+#incremental ingestion keeps the exported table in a cache shared by all runs and only
+#fetches the rows whose change marker is at or after the highest one seen, it needs a
+#change marker column, without one every run exports the whole table
+DATA_INGESTION_INCREMENTAL_ENABLED: bool = True
+DATA_INGESTION_CACHE_DIR: str = "feature_store_cache"
+DATA_INGESTION_CACHE_STATE_FILE_NAME: str = "state.json"
+DATA_INGESTION_ROW_KEY: str = "Index"
+#a column the REST where clause can range over that grows whenever a row is written,
+#e.g. an indexed updated_at. It must not be the row key or the partition key: those do
+#not change when a row is updated, and a range over the partition key is a full scan
+DATA_INGESTION_CHANGE_MARKER_COLUMN: str = None
+#full re-export after this many seconds, so that deleted rows leave the cache
+DATA_INGESTION_FULL_REFRESH_SECONDS: float = 7 * 24 * 3600.0
 
 '''
 Data Validation related constant start with DATA_VALIDATION VAR NAME
@@ -54,6 +83,29 @@ MODEL_TRAINER_DIR_NAME: str = "model_trainer"
 MODEL_TRAINER_TRAINED_MODEL_DIR: str = "trained_model"
 MODEL_TRAINER_TRAINED_MODEL_NAME: str = "model.pkl"
 MODEL_TRAINER_EXPECTED_SCORE: float = 0.5
+MODEL_TRAINER_N_NEIGHBORS: int = 6
+MODEL_TRAINER_METRIC: str = "euclidean"
+#"brute", "kd_tree", "ball_tree", "auto" (sklearn picks from the data shape), "benchmark",
+#or "ivf" for the approximate inverted file index
+MODEL_TRAINER_NEIGHBOR_ALGORITHM: str = "benchmark"
+MODEL_TRAINER_LEAF_SIZE: int = 30
+#(algorithm, leaf_size) pairs timed in benchmark mode, all of them exact
+MODEL_TRAINER_BENCHMARK_CANDIDATES: list = [
+    ("brute", None),
+    ("kd_tree", 16), ("kd_tree", 30), ("kd_tree", 64),
+    ("ball_tree", 16), ("ball_tree", 30), ("ball_tree", 64),
+]
+MODEL_TRAINER_BENCHMARK_QUERY_ROWS: int = 1_000
+#queries are answered in batches the size the serving micro batcher sends
+MODEL_TRAINER_BENCHMARK_QUERY_BATCH_SIZE: int = 64
+MODEL_TRAINER_BENCHMARK_REPEAT: int = 3
+#None clusters the training rows into sqrt(rows) lists
+MODEL_TRAINER_IVF_N_LISTS: int = None
+MODEL_TRAINER_IVF_N_PROBE: int = 4
+#an approximate model is not pushed below this recall@k against the exact neighbors of the test split
+MODEL_TRAINER_ANN_MIN_RECALL: float = 0.95
+#or when its test R2 is more than this below the test R2 of the exact model
+MODEL_TRAINER_ANN_MAX_R2_DROP: float = 0.01
 
 
 '''
@@ -69,4 +121,56 @@ MODEL_EVALUATION_REPORT_NAME= "report.json"
 Model Pusher ralated constant start with MODEL_PUSHER VAR NAME
 '''
 MODEL_PUSHER_DIR_NAME = "model_pusher"
-MODEL_PUSHER_SAVED_MODEL_DIR = SAVED_MODEL_DIR
\ No newline at end of file
+MODEL_PUSHER_SAVED_MODEL_DIR = SAVED_MODEL_DIR
+
+
+'''
+Training job runner related constant start with TRAINING_JOB VAR NAME
+'''
+TRAINING_JOB_DIR: str = os.path.join(ARTIFACT_DIR, "training_jobs")
+TRAINING_JOB_LOCK_FILE_NAME: str = "training.lock"
+TRAINING_JOB_NICENESS: int = 10
+#start_job tries the lock once more after this delay, a status check may be probing it
+TRAINING_JOB_LOCK_RETRY_SECONDS: float = 0.05
+TRAINING_PIPELINE_STAGES = [
+    "data_ingestion",
+    "data_validation",
+    "data_transformation",
+    "model_trainer",
+    "model_evaluation",
+    "model_pusher",
+]
+
+
+'''
+Training profile related constant start with TRAINING_PROFILE VAR NAME
+'''
+TRAINING_PROFILE_FILE_NAME: str = "profile.json"
+TRAINING_PROFILE_TRACEMALLOC_ENABLED: bool = True
+#dumps <artifact_dir>/profile/<stage>.prof for every stage, slows training down noticeably
+TRAINING_PROFILE_CPROFILE_ENABLED: bool = False
+TRAINING_PROFILE_CPROFILE_DIR_NAME: str = "profile"
+
+
+'''
+Training artifact handoff related constant start with TRAINING_ARTIFACT VAR NAME
+'''
+#stages hand the dataframes, arrays and fitted objects they produced to the next stages in
+#their artifacts, the files are still written but only read back when this is off
+TRAINING_ARTIFACT_IN_MEMORY_ENABLED: bool = True
+#artifact files are written on background threads while the next stages run, the pipeline
+#waits for them before pushing the model and at the end of the run
+TRAINING_ARTIFACT_ASYNC_PERSIST_ENABLED: bool = True
+TRAINING_ARTIFACT_PERSIST_WORKERS: int = 2
+
+
+'''
+Training stage cache related constant start with TRAINING_STAGE_CACHE VAR NAME
+'''
+#a stage whose inputs, config, schema and code are unchanged since an earlier run hard links
+#the artifacts of that run instead of running again, the pusher always runs
+TRAINING_STAGE_CACHE_ENABLED: bool = True
+TRAINING_STAGE_CACHE_DIR: str = os.path.join(ARTIFACT_DIR, "stage_cache")
+TRAINING_STAGE_CACHE_MANIFEST_FILE_NAME: str = "manifest.json"
+#entries kept per stage, the oldest are removed first
+TRAINING_STAGE_CACHE_MAX_ENTRIES: int = 5
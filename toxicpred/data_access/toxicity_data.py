@@ -1,9 +1,137 @@
+import json
+import os
+import queue
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+
+import httpx
 import numpy as np
 import pandas as pd
 from toxicpred.exception import ToxicityException
 from toxicpred.configuration.cassandra_connection import AstraCassandraConfig
-from astrapy.rest import http_methods
+from toxicpred.constant.database import (ASTRA_REST_MAX_RETRIES, ASTRA_REST_PAGE_SIZE, ASTRA_REST_PREFETCH_PAGES,
+                                         ASTRA_REST_TIMEOUT_SECONDS, CASSANDRA_FETCH_SIZE, CASSANDRA_MAX_PENDING_PAGES,
+                                         CASSANDRA_PARTITION_KEY, CASSANDRA_REQUEST_TIMEOUT_SECONDS,
+                                         CASSANDRA_SCAN_SPLITS_PER_WORKER, CASSANDRA_SCAN_WORKERS, MURMUR3_MAX_TOKEN,
+                                         MURMUR3_MIN_TOKEN)
+from toxicpred.logger import get_logger
+from toxicpred.utils.main_utils import DataFrameWriter
+
+logger = get_logger(__name__)
+
+_END_OF_PAGES = object()
+
+
+def prefetch(iterator: Iterator, max_pending: int) -> Iterator:
+    '''
+    runs iterator on a background thread at most max_pending items ahead of the consumer,
+    an exception raised by iterator is raised again in the consumer
+    '''
+    pending = queue.Queue(maxsize=max(1, max_pending))
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterator:
+                if stop.is_set():
+                    return
+                pending.put(item)
+            pending.put(_END_OF_PAGES)
+        except BaseException as e:
+            pending.put(e)
+
+    producer = threading.Thread(target=produce, name="astra-rest-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = pending.get()
+            if item is _END_OF_PAGES:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        #the consumer stopped early, let the producer finish its current put and exit
+        stop.set()
+        while producer.is_alive():
+            try:
+                pending.get_nowait()
+            except queue.Empty:
+                producer.join(timeout=0.1)
+
+
+def token_ranges(n_splits: int) -> list:
+    '''
+    splits the murmur3 token ring into n_splits contiguous (start, end] ranges that cover it,
+    murmur3 never gives a key the minimum token so the first range starting there misses nothing
+    '''
+    span = MURMUR3_MAX_TOKEN - MURMUR3_MIN_TOKEN
+    bounds = [MURMUR3_MIN_TOKEN + span * i // n_splits for i in range(n_splits + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def scan_token_ranges(scan_range: Callable[[int, int], Iterator], ranges: list, workers: int,
+                      max_pending: int) -> Iterator:
+    '''
+    runs scan_range(start, end), an iterator of pages, for every range on a pool of at most
+    workers threads and yields the pages in the order they arrive, the scans block once
+    max_pending pages wait for the consumer, an exception raised by a scan is raised again
+    in the consumer
+    '''
+    pending = queue.Queue(maxsize=max(1, max_pending))
+    stop = threading.Event()
+
+    def scan(token_range):
+        try:
+            for item in scan_range(*token_range):
+                if stop.is_set():
+                    return
+                pending.put(item)
+            pending.put(_END_OF_PAGES)
+        except BaseException as e:
+            pending.put(e)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="cassandra-scan")
+    futures = [executor.submit(scan, token_range) for token_range in ranges]
+    try:
+        remaining = len(futures)
+        while remaining:
+            item = pending.get()
+            if item is _END_OF_PAGES:
+                remaining -= 1
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                yield item
+    finally:
+        #ranges not started yet are dropped, running scans finish their current put and exit
+        stop.set()
+        for future in futures:
+            future.cancel()
+        while not all(future.done() for future in futures):
+            try:
+                pending.get_nowait()
+            except queue.Empty:
+                time.sleep(0.01)
+        executor.shutdown()
+
+
+def write_pages(pages: Iterator[list], file_path: str) -> int:
+    '''
+    appends every page of row dicts to a feature store file as it arrives, in the artifact
+    format of its extension, returns the number of rows written
+    '''
+    n_pages = 0
+    with DataFrameWriter(file_path) as writer:
+        for rows in pages:
+            writer.write(pd.DataFrame.from_records(rows))
+            n_pages += 1
+    logger.info(f"Exported {writer.rows} rows in {n_pages} pages to {file_path}")
+    return writer.rows
+
 
 class ToxicityData:
     """
@@ -15,17 +143,151 @@ class ToxicityData:
         except Exception as e:
             raise ToxicityException(e, sys)
 
+    def _rest_client(self) -> httpx.Client:
+        #one keep alive connection is reused for every page
+        return httpx.Client(
+            base_url=self.astra_cassandra_configurer.astra_rest_base_url,
+            headers={
+                "X-Cassandra-Token": self.astra_cassandra_configurer.astra_db_application_token or "",
+                "Accept": "application/json",
+            },
+            timeout=ASTRA_REST_TIMEOUT_SECONDS,
+        )
+
+    @staticmethod
+    def _get_page(client: httpx.Client, path: str, params: dict) -> dict:
+        for attempt in range(ASTRA_REST_MAX_RETRIES + 1):
+            try:
+                response = client.get(path, params=params)
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response.json()
+                error = httpx.HTTPStatusError(f"HTTP {response.status_code} from {path}",
+                                              request=response.request, response=response)
+            except httpx.TransportError as e:
+                error = e
+            if attempt == ASTRA_REST_MAX_RETRIES:
+                raise error
+            logger.info(f"Astra REST page request failed with {error!r}, retrying")
+            time.sleep(0.5 * 2 ** attempt)
+
+    def iter_rest_pages(self, page_size: int = ASTRA_REST_PAGE_SIZE, where: dict = None) -> Iterator[list]:
+        '''
+        yields the rows of the table one page at a time, following pageState until the last page
+        where: REST v2 filter, e.g. {"Index": {"$gte": 1000}}, all rows when None
+        '''
+        path = (
+            f"/api/rest/v2/keyspaces/{self.astra_cassandra_configurer.keyspace_name}"
+            f"/{self.astra_cassandra_configurer.database_name}/rows"
+        )
+        with self._rest_client() as client:
+            page_state = None
+            while True:
+                params = {"page-size": page_size}
+                if where:
+                    params["where"] = json.dumps(where)
+                if page_state:
+                    params["page-state"] = page_state
+                page = self._get_page(client, path, params)
+                if page.get("data"):
+                    yield page["data"]
+                page_state = page.get("pageState")
+                if not page_state:
+                    return
+
+    def export_from_astra_database_to_feature_store_using_restapi(
+            self, file_path: str, page_size: int = ASTRA_REST_PAGE_SIZE,
+            prefetch_pages: int = ASTRA_REST_PREFETCH_PAGES, where: dict = None) -> int:
+        '''
+        appends every page of the table to a feature store file as soon as it arrives while
+        the next pages are already being fetched, returns the number of rows written
+        '''
+        try:
+            return write_pages(prefetch(self.iter_rest_pages(page_size, where), prefetch_pages), file_path)
+
+        except Exception as e:
+            raise ToxicityException(e, sys)
+
+    def export_from_astra_database_to_dataframe_using_restapi(self, page_size: int = ASTRA_REST_PAGE_SIZE,
+                                                              prefetch_pages: int = ASTRA_REST_PREFETCH_PAGES,
+                                                              where: dict = None) -> pd.DataFrame:
+        try:
+            frames = [
+                pd.DataFrame.from_records(rows)
+                for rows in prefetch(self.iter_rest_pages(page_size, where), prefetch_pages)
+            ]
+            if not frames:
+                return pd.DataFrame()
+            return pd.concat(frames, ignore_index=True)
+
+        except Exception as e:
+            raise ToxicityException(e, sys)
+
+    def _scan_query(self) -> str:
+        table = f"{self.astra_cassandra_configurer.keyspace_name}.{self.astra_cassandra_configurer.database_name}"
+        token = f'token("{CASSANDRA_PARTITION_KEY}")'
+        return f"SELECT * FROM {table} WHERE {token} > ? AND {token} <= ?"
+
+    @staticmethod
+    def _scan_token_range(session, statement, start: int, end: int) -> Iterator[list]:
+        result = session.execute(statement, (start, end), timeout=CASSANDRA_REQUEST_TIMEOUT_SECONDS)
+        while True:
+            if result.current_rows:
+                yield list(result.current_rows)
+            if not result.has_more_pages:
+                return
+            result.fetch_next_page()
+
+    def iter_driver_pages(self, session=None, workers: int = CASSANDRA_SCAN_WORKERS, n_splits: int = None,
+                          fetch_size: int = CASSANDRA_FETCH_SIZE,
+                          max_pending: int = CASSANDRA_MAX_PENDING_PAGES) -> Iterator[list]:
+        '''
+        yields the rows of the table one page at a time, scanning n_splits token ranges with
+        one prepared statement on a pool of workers threads
+        session: a session returning rows as dicts, by default one connected with the
+        secure connect bundle and shut down at the end
+        '''
+        owns_session = session is None
+        if owns_session:
+            session = self.astra_cassandra_configurer.getCassandraSession()
+        try:
+            statement = session.prepare(self._scan_query())
+            statement.fetch_size = fetch_size
+            ranges = token_ranges(n_splits or workers * CASSANDRA_SCAN_SPLITS_PER_WORKER)
+            logger.info(f"Scanning {len(ranges)} token ranges with {workers} workers")
+            yield from scan_token_ranges(
+                lambda start, end: self._scan_token_range(session, statement, start, end),
+                ranges, workers, max_pending,
+            )
+        finally:
+            if owns_session:
+                session.cluster.shutdown()
+
+    def export_from_astra_database_to_feature_store_using_driver(
+            self, file_path: str, session=None, workers: int = CASSANDRA_SCAN_WORKERS, n_splits: int = None,
+            fetch_size: int = CASSANDRA_FETCH_SIZE, max_pending: int = CASSANDRA_MAX_PENDING_PAGES) -> int:
+        '''
+        appends the pages of all token range scans to a feature store file as they arrive,
+        returns the number of rows written, rows are in no particular order
+        '''
+        try:
+            pages = self.iter_driver_pages(session, workers, n_splits, fetch_size, max_pending)
+            return write_pages(pages, file_path)
 
-    def export_from_astra_database_to_dataframe_using_restapi(self) -> pd.DataFrame:
+        except Exception as e:
+            raise ToxicityException(e, sys)
+
+    def export_from_astra_database_to_dataframe_using_driver(
+            self, session=None, workers: int = CASSANDRA_SCAN_WORKERS, n_splits: int = None,
+            fetch_size: int = CASSANDRA_FETCH_SIZE, max_pending: int = CASSANDRA_MAX_PENDING_PAGES) -> pd.DataFrame:
         try:
-            astra_http_client = self.astra_cassandra_configurer.getAstraHTTPClient()
-            url = f"/api/rest/v2/keyspaces/{self.astra_cassandra_configurer.keyspace_name}/{self.astra_cassandra_configurer.database_name}/rows?page-size=1000"
-            all_data = astra_http_client.request(method=http_methods.GET,path=url)
-            #print(len(all_data['data']))
-            rows = all_data['data']
-            #print(rows)
-            df = pd.DataFrame.from_dict(rows,orient="columns")
-            return df
+            frames = [
+                pd.DataFrame.from_records(rows)
+                for rows in self.iter_driver_pages(session, workers, n_splits, fetch_size, max_pending)
+            ]
+            if not frames:
+                return pd.DataFrame()
+            return pd.concat(frames, ignore_index=True)
 
         except Exception as e:
-            raise ToxicityException(e, sys)
\ No newline at end of file
+            raise ToxicityException(e, sys)
@@ -1,9 +1,41 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields, replace
+from typing import Any, List
+
+import numpy as np
+import pandas as pd
+
+
+def payload_field():
+    #in memory value handed to the next stages instead of reading the file back, left out of repr
+    return field(default=None, repr=False, compare=False, metadata={"payload": True})
+
+
+def without_payloads(artifact, *names):
+    '''
+    copy of the artifact with its payloads, or only the named ones, set to None so they can be freed
+    '''
+    return replace(artifact, **{
+        artifact_field.name: None for artifact_field in fields(artifact)
+        if artifact_field.metadata.get("payload") and (not names or artifact_field.name in names)
+    })
+
+
+def artifact_file_paths(artifact) -> List[str]:
+    '''
+    paths of the files the artifact points to
+    '''
+    return [
+        getattr(artifact, artifact_field.name) for artifact_field in fields(artifact)
+        if artifact_field.name.endswith("_path") and isinstance(getattr(artifact, artifact_field.name), str)
+    ]
+
 
 @dataclass
 class DataIngestionArtifact:
     trained_file_path: str
     test_file_path: str
+    train_df: pd.DataFrame = payload_field()
+    test_df: pd.DataFrame = payload_field()
 
 
 @dataclass
@@ -15,6 +47,8 @@ class DataValidationArtifact:
     invalid_test_file_path: str
     drift_report_file_path: str
     drift_report_dashboard_path: str
+    valid_train_df: pd.DataFrame = payload_field()
+    valid_test_df: pd.DataFrame = payload_field()
 
 
 @dataclass
@@ -22,6 +56,9 @@ class DataTransformationArtifact:
     transformed_object_file_path: str
     transformed_train_file_path: str
     transformed_test_file_path: str
+    transformed_object: Any = payload_field()
+    transformed_train_arr: np.ndarray = payload_field()
+    transformed_test_arr: np.ndarray = payload_field()
 
 
 @dataclass
@@ -31,11 +68,32 @@ class RegressionMetricArtifact:
     mae_value: float
 
 
+@dataclass
+class NeighborIndexArtifact:
+    algorithm: str
+    leaf_size: int
+    #candidate name -> fit_seconds and query_seconds, empty unless the index was benchmarked
+    timings: dict
+
+
+@dataclass
+class ApproximateNeighborArtifact:
+    recall_at_k: float
+    exact_r2_score: float
+    approximate_r2_score: float
+    r2_score_drop: float
+    is_within_threshold: bool
+
+
 @dataclass
 class ModelTrainerArtifact:
     trained_model_file_path: str
     train_metric_artifact: RegressionMetricArtifact
     test_metric_artifact: RegressionMetricArtifact
+    neighbor_index_artifact: NeighborIndexArtifact = None
+    #only set when the model uses an approximate neighbor index
+    approximate_neighbor_artifact: ApproximateNeighborArtifact = None
+    trained_model: Any = payload_field()
 
 
 @dataclass
@@ -46,9 +104,16 @@ class ModelEvaluationArtifact:
     trained_model_path: str
     train_model_metric_artifact: RegressionMetricArtifact
     best_model_metric_artifact: RegressionMetricArtifact
+    rejection_reason: str = None
 
 
 @dataclass
 class ModelPusherArtifact:
     saved_model_path:str
-    model_file_path:str
\ No newline at end of file
+    model_file_path:str
+
+@dataclass
+class DataValidityArtifact:
+    valid_mask: np.ndarray
+    reason_codes: np.ndarray
+    reason_names: List[str]
@@ -25,6 +25,15 @@ class DataIngestionConfig:
         )
         self.train_test_split_ratio: float = training_pipeline.DATA_INGESTION_TRAIN_TEST_SPLIT_RATION
         self.random_state: int = training_pipeline.DATA_INGESTION_RANDOM_STATE
+        self.export_method: str = training_pipeline.DATA_INGESTION_EXPORT_METHOD
+        self.incremental_enabled: bool = training_pipeline.DATA_INGESTION_INCREMENTAL_ENABLED
+        self.cache_file_path: str = os.path.join(training_pipeline.DATA_INGESTION_CACHE_DIR, training_pipeline.FILE_NAME)
+        self.cache_state_file_path: str = os.path.join(
+            training_pipeline.DATA_INGESTION_CACHE_DIR, training_pipeline.DATA_INGESTION_CACHE_STATE_FILE_NAME
+        )
+        self.row_key: str = training_pipeline.DATA_INGESTION_ROW_KEY
+        self.change_marker_column: str = training_pipeline.DATA_INGESTION_CHANGE_MARKER_COLUMN
+        self.full_refresh_seconds: float = training_pipeline.DATA_INGESTION_FULL_REFRESH_SECONDS
 
 
 class DataValidationConfig:
@@ -52,9 +61,9 @@ class DataTransformationConfig:
     def __init__(self,training_pipeline_config:TrainingPipelineConfig):
         self.data_transformation_dir: str = os.path.join( training_pipeline_config.artifact_dir,training_pipeline.DATA_TRANSFORMATION_DIR_NAME )
         self.transformed_train_file_path: str = os.path.join( self.data_transformation_dir,training_pipeline.DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-            training_pipeline.TRAIN_FILE_NAME.replace("csv", "npy"),)
+            os.path.splitext(training_pipeline.TRAIN_FILE_NAME)[0] + ".npy",)
         self.transformed_test_file_path: str = os.path.join(self.data_transformation_dir,  training_pipeline.DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-            training_pipeline.TEST_FILE_NAME.replace("csv", "npy"), )
+            os.path.splitext(training_pipeline.TEST_FILE_NAME)[0] + ".npy", )
         self.transformed_object_file_path: str = os.path.join( self.data_transformation_dir, training_pipeline.DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
             training_pipeline.PREPROCSSING_OBJECT_FILE_NAME,)
 
@@ -66,9 +75,21 @@ class ModelTrainerConfig:
         )
         self.trained_model_file_path: str = os.path.join(
             self.model_trainer_dir, training_pipeline.MODEL_TRAINER_TRAINED_MODEL_DIR, 
-            training_pipeline.MODEL_FILE_NAME
+            training_pipeline.MODEL_SAVE_FILE_NAME
         )
         self.expected_accuracy: float = training_pipeline.MODEL_TRAINER_EXPECTED_SCORE
+        self.n_neighbors: int = training_pipeline.MODEL_TRAINER_N_NEIGHBORS
+        self.metric: str = training_pipeline.MODEL_TRAINER_METRIC
+        self.neighbor_algorithm: str = training_pipeline.MODEL_TRAINER_NEIGHBOR_ALGORITHM
+        self.leaf_size: int = training_pipeline.MODEL_TRAINER_LEAF_SIZE
+        self.benchmark_candidates: list = training_pipeline.MODEL_TRAINER_BENCHMARK_CANDIDATES
+        self.benchmark_query_rows: int = training_pipeline.MODEL_TRAINER_BENCHMARK_QUERY_ROWS
+        self.benchmark_query_batch_size: int = training_pipeline.MODEL_TRAINER_BENCHMARK_QUERY_BATCH_SIZE
+        self.benchmark_repeat: int = training_pipeline.MODEL_TRAINER_BENCHMARK_REPEAT
+        self.ivf_n_lists: int = training_pipeline.MODEL_TRAINER_IVF_N_LISTS
+        self.ivf_n_probe: int = training_pipeline.MODEL_TRAINER_IVF_N_PROBE
+        self.ann_min_recall: float = training_pipeline.MODEL_TRAINER_ANN_MIN_RECALL
+        self.ann_max_r2_drop: float = training_pipeline.MODEL_TRAINER_ANN_MAX_R2_DROP
 
 class ModelEvaluationConfig: 
     def __init__(self,training_pipeline_config:TrainingPipelineConfig):
@@ -84,9 +105,9 @@ class ModelPusherConfig:
         self.model_evaluation_dir: str = os.path.join(
             training_pipeline_config.artifact_dir, training_pipeline.MODEL_PUSHER_DIR_NAME
         )
-        self.model_file_path = os.path.join(self.model_evaluation_dir,training_pipeline.MODEL_FILE_NAME)
+        self.model_file_path = os.path.join(self.model_evaluation_dir,training_pipeline.MODEL_SAVE_FILE_NAME)
         timestamp = round(datetime.now().timestamp())
         self.saved_model_path=os.path.join(
             training_pipeline.SAVED_MODEL_DIR,
             f"{timestamp}",
-            training_pipeline.MODEL_FILE_NAME)
\ No newline at end of file
+            training_pipeline.MODEL_SAVE_FILE_NAME)
\ No newline at end of file
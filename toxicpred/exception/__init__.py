@@ -22,9 +22,15 @@ def error_message_detail(error_message, error_detail: sys):
     at the point where the exception originally occurred.
     """
     exc_type, exc_obj, exc_tb = error_detail.exc_info()
-    file_name = exc_tb.tb_frame.f_code.co_file_name #get the file name
+    file_name = exc_tb.tb_frame.f_code.co_filename #get the file name
     error_message_detailed =  "Error occurred python script name [{0}] line number [{1}] error message [{2}]".format(
         file_name, exc_tb.tb_lineno, str(error_message)
     )
 
-    return error_message_detailed
\ No newline at end of file
+    return error_message_detailed
+
+class InferenceQueueFullException(Exception):
+    """
+    raised when the inference executor already holds its maximum number of
+    running and queued tasks
+    """
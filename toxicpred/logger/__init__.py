@@ -1,18 +1,184 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import threading
+import time
 from datetime import datetime
 
 from from_root import from_root
 
+from toxicpred.constant.env_variable import TOXICPRED_LOG_LEVEL, TOXICPRED_LOG_LEVELS
+from toxicpred.constant.logger import (LOG_LEVEL, LOG_LOGGER_LEVELS, LOG_QUEUE_ENABLED, LOG_QUEUE_MAX_SIZE,
+                                       LOG_RATE_LIMITS, LOG_SAMPLE_RATES)
+
 LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 logs_path = os.path.join(from_root(), "logs", LOG_FILE)
 
 os.makedirs(logs_path, exist_ok=True)
 
 LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE)
+LOG_FORMAT = "[ %(asctime)s ] %(name)s - %(levelname)s - %(message)s"
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    '''
+    hands records to the queue without ever blocking, records that do not fit are counted and dropped
+    '''
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        #the queue never leaves the process, so the message is formatted by the writer thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    '''
+    lets through at most max_per_second records from each logging call site,
+    the next record let through says how many were suppressed. Warnings and
+    errors always pass.
+    '''
+    def __init__(self, max_per_second: float):
+        super().__init__()
+        self.max_per_second = max_per_second
+        self.capacity = max(1.0, max_per_second)
+        #call site -> [tokens, last refill time, suppressed records]
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.capacity, now, 0]
+            tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.max_per_second)
+            bucket[1] = now
+            if tokens < 1.0:
+                bucket[0] = tokens
+                bucket[2] += 1
+                return False
+            bucket[0] = tokens - 1.0
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    '''
+    keeps the given fraction of records, warnings and errors always pass
+    '''
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+_handler = None
+_queue_listener = None
+_settings = {}
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+def parse_logger_levels(value: str) -> dict:
+    '''
+    parses "logger.name=LEVEL,other.logger=LEVEL"
+    '''
+    levels = {}
+    for part in value.split(","):
+        name, _, level = part.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _set_filter(logger: logging.Logger, filter_type: type, log_filter: logging.Filter) -> None:
+    for existing in [f for f in logger.filters if isinstance(f, filter_type)]:
+        logger.removeFilter(existing)
+    logger.addFilter(log_filter)
+
+
+def stop_queue_listener() -> None:
+    '''
+    writes out the records still in the queue and stops the writer thread
+    '''
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+def dropped_log_records() -> int:
+    return getattr(_handler, "dropped", 0)
+
+
+def configure_logging(queue_enabled: bool = LOG_QUEUE_ENABLED, level: str = None, logger_levels: dict = None,
+                      rate_limits: dict = LOG_RATE_LIMITS, sample_rates: dict = LOG_SAMPLE_RATES) -> None:
+    '''
+    (re)configures the root logger to write to LOG_FILE_PATH. With queue_enabled
+    the caller only puts the record on a queue and a background thread formats
+    and writes it.
+    '''
+    global _handler, _queue_listener, _settings
+    _settings = dict(queue_enabled=queue_enabled, level=level, logger_levels=logger_levels,
+                     rate_limits=rate_limits, sample_rates=sample_rates)
+    stop_queue_listener()
+    root_logger = logging.getLogger()
+    if _handler is not None:
+        root_logger.removeHandler(_handler)
+        _handler.close()
+
+    file_handler = logging.FileHandler(LOG_FILE_PATH)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    if queue_enabled:
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_MAX_SIZE)
+        _handler = DroppingQueueHandler(log_queue)
+        _queue_listener = logging.handlers.QueueListener(log_queue, file_handler)
+        _queue_listener.start()
+    else:
+        _handler = file_handler
+    root_logger.addHandler(_handler)
+    root_logger.setLevel(level or os.getenv(TOXICPRED_LOG_LEVEL, LOG_LEVEL).upper())
+
+    levels = dict(LOG_LOGGER_LEVELS)
+    levels.update(logger_levels or {})
+    levels.update(parse_logger_levels(os.getenv(TOXICPRED_LOG_LEVELS, "")))
+    for name, logger_level in levels.items():
+        get_logger(name).setLevel(logger_level)
+    for name, max_per_second in rate_limits.items():
+        _set_filter(get_logger(name), RateLimitFilter, RateLimitFilter(max_per_second))
+    for name, rate in sample_rates.items():
+        _set_filter(get_logger(name), SamplingFilter, SamplingFilter(rate))
+
+
+def _reconfigure_after_fork() -> None:
+    #the writer thread does not exist in a forked child and the queue lock may be held, start over
+    global _queue_listener
+    _queue_listener = None
+    if _settings:
+        configure_logging(**_settings)
+
 
-logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    format="[ %(asctime)s ] %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
\ No newline at end of file
+configure_logging()
+atexit.register(stop_queue_listener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reconfigure_after_fork)
@@ -0,0 +1,157 @@
+import numpy as np
+
+
+def _squared_distances(x: np.ndarray, points: np.ndarray, x_norms: np.ndarray = None,
+                       point_norms: np.ndarray = None) -> np.ndarray:
+    if x_norms is None:
+        x_norms = np.einsum("ij,ij->i", x, x)
+    if point_norms is None:
+        point_norms = np.einsum("ij,ij->i", points, points)
+    distances = x_norms[:, None] - 2.0 * (x @ points.T) + point_norms[None, :]
+    #the expansion can go slightly negative for identical rows
+    np.maximum(distances, 0.0, out=distances)
+    return distances
+
+
+class IVFNeighborsRegressor:
+    """
+    Approximate k nearest neighbors regressor with an inverted file index, built
+    with NumPy only. The training rows are clustered with k-means into n_lists
+    lists. A query is compared with the rows of the n_probe lists whose
+    centroids are nearest to it instead of with every training row. The
+    prediction is the mean target of the k neighbors found, like
+    KNeighborsRegressor with uniform weights and the euclidean metric.
+    """
+    def __init__(self, n_neighbors: int = 6, n_lists: int = None, n_probe: int = 8, kmeans_iterations: int = 10,
+                 kmeans_sample_per_list: int = 64, query_chunk_size: int = 4096, random_state: int = 0):
+        self.n_neighbors = n_neighbors
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.kmeans_iterations = kmeans_iterations
+        self.kmeans_sample_per_list = kmeans_sample_per_list
+        self.query_chunk_size = query_chunk_size
+        self.random_state = random_state
+
+    def _assign(self, x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        '''
+        index of the nearest centroid of every row, in chunks that keep the distance matrix small
+        '''
+        labels = np.empty(len(x), dtype=np.int64)
+        centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+        chunk_size = max(1, 4_000_000 // len(centroids))
+        for start in range(0, len(x), chunk_size):
+            chunk = x[start:start + chunk_size]
+            labels[start:start + chunk_size] = _squared_distances(chunk, centroids, point_norms=centroid_norms).argmin(axis=1)
+        return labels
+
+    def _kmeans(self, x: np.ndarray, n_lists: int, rng: np.random.Generator) -> np.ndarray:
+        sample_size = min(len(x), n_lists * self.kmeans_sample_per_list)
+        sample = x[rng.choice(len(x), size=sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            labels = self._assign(sample, centroids)
+            counts = np.bincount(labels, minlength=n_lists)
+            sums = np.column_stack([
+                np.bincount(labels, weights=sample[:, j], minlength=n_lists) for j in range(sample.shape[1])
+            ])
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+            #lists that lost all their rows restart from a random row
+            n_empty = int((~filled).sum())
+            if n_empty:
+                centroids[~filled] = sample[rng.choice(sample_size, size=n_empty)]
+        return centroids
+
+    def fit(self, x, y):
+        x = np.ascontiguousarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if len(x) < self.n_neighbors:
+            raise ValueError(f"Expected at least n_neighbors={self.n_neighbors} rows, got {len(x)}")
+        rng = np.random.default_rng(self.random_state)
+        n_lists = self.n_lists or int(np.sqrt(len(x)))
+        n_lists = int(np.clip(n_lists, 1, len(x)))
+
+        self.centroids_ = self._kmeans(x, n_lists, rng)
+        labels = self._assign(x, self.centroids_)
+        #rows are stored grouped by list so that a list is one contiguous slice
+        order = np.argsort(labels, kind="stable")
+        self.ids_ = order
+        self.points_ = np.ascontiguousarray(x[order])
+        self.point_norms_ = np.einsum("ij,ij->i", self.points_, self.points_)
+        self.targets_ = y[order]
+        self.list_offsets_ = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))])
+        self.n_features_in_ = x.shape[1]
+        return self
+
+    def _search(self, x: np.ndarray, k: int):
+        '''
+        returns the squared distances and storage positions of the k nearest rows found for every query
+        '''
+        n_queries = len(x)
+        n_lists = len(self.centroids_)
+        n_probe = min(self.n_probe, n_lists)
+        x_norms = np.einsum("ij,ij->i", x, x)
+        centroid_distances = _squared_distances(x, self.centroids_, x_norms=x_norms)
+        if n_probe < n_lists:
+            probes = np.argpartition(centroid_distances, n_probe - 1, axis=1)[:, :n_probe]
+        else:
+            probes = np.broadcast_to(np.arange(n_lists), (n_queries, n_lists))
+
+        best_distances = np.full((n_queries, k), np.inf)
+        best_positions = np.full((n_queries, k), -1, dtype=np.int64)
+        #visit every probed list once, with all the queries that probe it
+        list_ids = probes.ravel()
+        query_ids = np.repeat(np.arange(n_queries), n_probe)
+        order = np.argsort(list_ids, kind="stable")
+        list_ids, query_ids = list_ids[order], query_ids[order]
+        unique_lists, starts = np.unique(list_ids, return_index=True)
+        ends = np.append(starts[1:], len(list_ids))
+        for list_id, start, end in zip(unique_lists, starts, ends):
+            low, high = self.list_offsets_[list_id], self.list_offsets_[list_id + 1]
+            if low == high:
+                continue
+            queries = query_ids[start:end]
+            distances = _squared_distances(x[queries], self.points_[low:high], x_norms=x_norms[queries],
+                                           point_norms=self.point_norms_[low:high])
+            candidate_distances = np.concatenate([best_distances[queries], distances], axis=1)
+            candidate_positions = np.concatenate(
+                [best_positions[queries], np.broadcast_to(np.arange(low, high), distances.shape)], axis=1
+            )
+            keep = np.argpartition(candidate_distances, k - 1, axis=1)[:, :k]
+            best_distances[queries] = np.take_along_axis(candidate_distances, keep, axis=1)
+            best_positions[queries] = np.take_along_axis(candidate_positions, keep, axis=1)
+
+        #queries whose probed lists held fewer than k rows are answered exactly
+        short = (best_positions < 0).any(axis=1)
+        if short.any():
+            distances = _squared_distances(x[short], self.points_, x_norms=x_norms[short], point_norms=self.point_norms_)
+            keep = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            best_distances[short] = np.take_along_axis(distances, keep, axis=1)
+            best_positions[short] = keep
+
+        order = np.argsort(best_distances, axis=1)
+        return np.take_along_axis(best_distances, order, axis=1), np.take_along_axis(best_positions, order, axis=1)
+
+    def _search_chunks(self, x, k: int):
+        x = np.ascontiguousarray(x, dtype=np.float64)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        distances = np.empty((len(x), k))
+        positions = np.empty((len(x), k), dtype=np.int64)
+        for start in range(0, len(x), self.query_chunk_size):
+            end = start + self.query_chunk_size
+            distances[start:end], positions[start:end] = self._search(x[start:end], k)
+        return distances, positions
+
+    def kneighbors(self, x, n_neighbors: int = None, return_distance: bool = True):
+        '''
+        same contract as KNeighborsRegressor.kneighbors, the indices are training row indices
+        '''
+        distances, positions = self._search_chunks(x, n_neighbors or self.n_neighbors)
+        if return_distance:
+            return np.sqrt(distances), self.ids_[positions]
+        return self.ids_[positions]
+
+    def predict(self, x) -> np.ndarray:
+        _, positions = self._search_chunks(x, self.n_neighbors)
+        return self.targets_[positions].mean(axis=1)
@@ -1,8 +1,11 @@
 from toxicpred.constant.training_pipeline import SCHEMA_FILE_PATH
 from toxicpred.utils.main_utils import read_yaml_file
+import numpy as np
 import pandas as pd
 import os
-from toxicpred.constant.training_pipeline import SAVED_MODEL_DIR, MODEL_FILE_NAME
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from toxicpred.constant.training_pipeline import SAVED_MODEL_DIR, MODEL_FILE_NAME, MODEL_MANIFEST_FILE_NAME
 
 
 class ToxicityModel:
@@ -11,20 +14,88 @@ class ToxicityModel:
             self.preprocessor = preprocessor
             self.model = model
             self._schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+            self._compile_column_layout()
+        except Exception as e:
+            raise e
+
+    def _compile_column_layout(self) -> None:
+        '''
+        precomputes the model input column order and, when the preprocessor is a
+        plain SimpleImputer, its fill values so that predict_array can impute in NumPy
+        '''
+        numerical_columns = self._schema_config["numerical_columns"]
+        categorical_columns = self._schema_config["categorical_columns"]
+        self._feature_columns = list(numerical_columns) + list(categorical_columns)
+        self._n_numerical = len(numerical_columns)
+        self._fill_values = None
+        self._missing_values = None
+
+        imputer = self.preprocessor
+        if isinstance(imputer, Pipeline) and len(imputer.steps) == 1:
+            imputer = imputer.steps[0][1]
+        if isinstance(imputer, SimpleImputer) and not getattr(imputer, "add_indicator", False):
+            fill_values = np.asarray(imputer.statistics_, dtype=np.float64)
+            #columns dropped by the imputer leave NaN statistics, keep using transform for those
+            if fill_values.shape == (self._n_numerical,) and not np.isnan(fill_values).any():
+                self._fill_values = fill_values
+                self._missing_values = imputer.missing_values
+
+    @property
+    def feature_columns(self) -> list:
+        if "_feature_columns" not in self.__dict__:
+            #models pickled before the column layout existed
+            self._compile_column_layout()
+        return self._feature_columns
+
+    def to_feature_array(self, x) -> np.ndarray:
+        '''
+        returns a new C contiguous float64 array with the columns in model input order
+        '''
+        if isinstance(x, (pd.DataFrame, dict)):
+            columns = [np.atleast_1d(np.asarray(x[column], dtype=np.float64)) for column in self.feature_columns]
+            x_array = np.empty((len(columns[0]), len(columns)), dtype=np.float64)
+            for i, values in enumerate(columns):
+                x_array[:, i] = values
+            return x_array
+        x_array = np.array(x, dtype=np.float64, order="C", copy=True)
+        if x_array.ndim == 1:
+            x_array = x_array.reshape(1, -1)
+        if x_array.shape[1] != len(self.feature_columns):
+            raise ValueError(f"Expected {len(self.feature_columns)} columns in the order {self.feature_columns}, got {x_array.shape[1]}")
+        return x_array
+
+    def transform_array(self, x) -> np.ndarray:
+        '''
+        takes a float array with the columns in feature_columns order or a dict of
+        columns and returns the preprocessed model input
+        '''
+        try:
+            x_array = self.to_feature_array(x)
+            n_numerical = self._n_numerical
+            if self._fill_values is None:
+                x_array[:, :n_numerical] = self.preprocessor.transform(x_array[:, :n_numerical])
+                return x_array
+
+            numerical = x_array[:, :n_numerical]
+            if isinstance(self._missing_values, float) and np.isnan(self._missing_values):
+                missing_mask = np.isnan(numerical)
+            else:
+                missing_mask = numerical == self._missing_values
+            if missing_mask.any():
+                np.copyto(numerical, np.broadcast_to(self._fill_values, numerical.shape), where=missing_mask)
+            return x_array
+        except Exception as e:
+            raise e
+
+    def predict_array(self, x):
+        try:
+            return self.model.predict(self.transform_array(x))
         except Exception as e:
             raise e
     
     def predict(self,x: pd.DataFrame):
         try:
-            numerical_columns = self._schema_config["numerical_columns"]
-            categorical_columns = self._schema_config["categorical_columns"]
-            x_transform = self.preprocessor.transform(x[numerical_columns])
-            x_transform_df = pd.DataFrame(x_transform, columns = numerical_columns)
-            x_transform_df_main = x_transform_df.reset_index(drop=True)
-            categorical_df = x[categorical_columns].reset_index(drop=True)
-            x_transform_df_main = pd.concat([x_transform_df_main,categorical_df],axis=1)
-            y_hat = self.model.predict(x_transform_df_main)
-            return y_hat
+            return self.predict_array(x)
         except Exception as e:
             raise e
 
@@ -41,7 +112,10 @@ class ModelResolver:
         try:
             timestamps = list(map(int, os.listdir(self.model_dir)))
             latest_timestamp = max(timestamps)
-            latest_model_path = os.path.join(self.model_dir, f"{latest_timestamp}", MODEL_FILE_NAME)
+            latest_model_path = os.path.join(self.model_dir, f"{latest_timestamp}", MODEL_MANIFEST_FILE_NAME)
+            if not os.path.exists(latest_model_path):
+                #models saved before the manifest format
+                latest_model_path = os.path.join(self.model_dir, f"{latest_timestamp}", MODEL_FILE_NAME)
             return latest_model_path       
         
         except Exception as e:
@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+import numpy as np
+
+from toxicpred.constant.application import (PREDICTION_CACHE_FLOAT_DECIMALS, PREDICTION_CACHE_MAX_SIZE,
+                                            PREDICTION_CACHE_TTL_SECONDS)
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of predictions with a time to live, keyed by the model
+    version and the input feature row rounded to float_decimals places.
+
+    Rows that are already being computed by another caller are not computed
+    again; the caller waits for that result instead (single flight). Entries of
+    an older model version are dropped as soon as a newer version is seen.
+    """
+    def __init__(self, max_size: int = PREDICTION_CACHE_MAX_SIZE,
+                 ttl_seconds: float = PREDICTION_CACHE_TTL_SECONDS,
+                 float_decimals: Optional[int] = PREDICTION_CACHE_FLOAT_DECIMALS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.float_decimals = float_decimals
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._model_version = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _row_keys(self, model_version, features: np.ndarray) -> list:
+        if self.float_decimals is not None:
+            #adding 0.0 turns -0.0 into 0.0 so both round to the same key
+            features = np.round(features, self.float_decimals) + 0.0
+        features = np.ascontiguousarray(features, dtype=np.float64)
+        return [(model_version, row.tobytes()) for row in features]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "model_version": self._model_version,
+        }
+
+    def predict(self, model_version, features: np.ndarray, compute_fn: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        '''
+        returns the predictions for every row of features, calling compute_fn
+        once with the rows that are neither cached nor being computed elsewhere
+        '''
+        keys = self._row_keys(model_version, features)
+        y_pred = np.empty(len(keys), dtype=np.float64)
+        now = time.monotonic()
+        owned = {}
+        waiting = []
+
+        with self._lock:
+            if model_version != self._model_version:
+                self._entries.clear()
+                self._model_version = model_version
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    y_pred[i] = entry[0]
+                    self.hits += 1
+                    continue
+                future = self._in_flight.get(key)
+                if future is not None:
+                    waiting.append((i, future))
+                    self.coalesced += 1
+                    continue
+                future = owned.get(key)
+                if future is None:
+                    future = Future()
+                    owned[key] = future
+                    self._in_flight[key] = future
+                    self.misses += 1
+                else:
+                    self.coalesced += 1
+                waiting.append((i, future))
+
+        if owned:
+            owned_keys = list(owned)
+            first_row = {}
+            for i, key in enumerate(keys):
+                first_row.setdefault(key, i)
+            try:
+                computed = compute_fn(features[[first_row[key] for key in owned_keys]])
+            except BaseException as e:
+                with self._lock:
+                    for key in owned_keys:
+                        self._in_flight.pop(key, None)
+                for future in owned.values():
+                    future.set_exception(e)
+                raise
+
+            expires_at = time.monotonic() + self.ttl_seconds
+            with self._lock:
+                for key, value in zip(owned_keys, computed):
+                    self._in_flight.pop(key, None)
+                    if key[0] == self._model_version:
+                        self._entries[key] = (float(value), expires_at)
+                        self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            for key, value in zip(owned_keys, computed):
+                owned[key].set_result(float(value))
+
+        for i, future in waiting:
+            y_pred[i] = future.result()
+        return y_pred
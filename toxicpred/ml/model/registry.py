@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+
+from toxicpred.constant.application import MODEL_REGISTRY_REFRESH_INTERVAL
+from toxicpred.constant.training_pipeline import SAVED_MODEL_DIR
+from toxicpred.logger import get_logger
+from toxicpred.ml.model.estimator import ModelResolver
+from toxicpred.serving.metrics import MODEL_LOAD_SECONDS, MODEL_VERSION
+from toxicpred.utils.main_utils import load_model
+
+logger = get_logger(__name__)
+
+
+class ModelRegistry:
+    """
+    Process-wide holder of the newest model in the saved model directory.
+
+    The model is loaded once and shared by every request. A new timestamp
+    directory is detected by comparing the mtime of the saved model directory,
+    which is a single stat call, at most once per refresh interval. The new model
+    is loaded outside of the request path lock and swapped in with one reference
+    assignment, so requests already holding the previous model finish with it.
+    A model that fails to load while another one is served is skipped until its
+    file changes, the current model keeps being served.
+    """
+    _registries = {}
+    _registries_lock = threading.Lock()
+
+    def __init__(self, model_dir=SAVED_MODEL_DIR, refresh_interval: float = MODEL_REGISTRY_REFRESH_INTERVAL):
+        self.model_resolver = ModelResolver(model_dir=model_dir)
+        self.refresh_interval = refresh_interval
+        self._load_lock = threading.Lock()
+        self._current = (None, None)
+        self._dir_mtime = None
+        self._next_check = 0.0
+        self._pinned = False
+        #(model_version, mtime of its file) of the last model that could not be loaded
+        self._failed_load = None
+
+    @classmethod
+    def get_registry(cls, model_dir=SAVED_MODEL_DIR) -> "ModelRegistry":
+        with cls._registries_lock:
+            registry = cls._registries.get(model_dir)
+            if registry is None:
+                registry = cls(model_dir=model_dir)
+                cls._registries[model_dir] = registry
+            return registry
+
+    @property
+    def model_version(self):
+        return self._current[0]
+
+    def get_model(self):
+        """
+        returns (model_version, model) for the newest saved model,
+        (None, None) if no model has been saved yet
+        """
+        current = self._current
+        if current[1] is not None and (self._pinned or time.monotonic() < self._next_check):
+            return current
+
+        if current[1] is None:
+            #nothing to serve yet, wait for whoever is loading the first model
+            with self._load_lock:
+                self._refresh()
+        elif self._load_lock.acquire(blocking=False):
+            #another request is already loading the new model, keep serving the current one
+            try:
+                self._refresh()
+            finally:
+                self._load_lock.release()
+        return self._current
+
+    def _refresh(self) -> None:
+        self._next_check = time.monotonic() + self.refresh_interval
+        model_dir = self.model_resolver.model_dir
+        try:
+            dir_mtime = os.stat(model_dir).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if dir_mtime == self._dir_mtime and self._current[1] is not None:
+            return
+
+        if not self.model_resolver.is_model_exists():
+            #timestamp directory created but the model file is not in place yet
+            return
+        best_model_path = self.model_resolver.get_best_model_path()
+        model_version = int(os.path.basename(os.path.dirname(best_model_path)))
+        if model_version != self._current[0]:
+            model_load = (model_version, os.stat(best_model_path).st_mtime_ns)
+            if model_load == self._failed_load and self._current[1] is not None:
+                return
+            logger.info(f"Loading model version [{model_version}] from {best_model_path}")
+            try:
+                with MODEL_LOAD_SECONDS.time():
+                    model = load_model(file_path=best_model_path)
+            except Exception:
+                if self._current[1] is None:
+                    raise
+                #e.g. a partial copy or a corrupt file, retried once the model file changes
+                self._failed_load = model_load
+                logger.exception(
+                    f"Could not load model version [{model_version}], "
+                    f"still serving model version [{self._current[0]}]"
+                )
+                return
+            self._failed_load = None
+            self._current = (model_version, model)
+            MODEL_VERSION.set(model_version)
+            logger.info(f"Model version [{model_version}] is now being served")
+        self._dir_mtime = dir_mtime
+
+    def pin(self) -> None:
+        """
+        keeps serving the loaded model without looking for newer ones, used by
+        forked workers whose parent replaces them when a new model is pushed
+        """
+        self._pinned = True
+
+    def reload(self) -> None:
+        """
+        forces the next get_model call to look at the saved model directory
+        """
+        with self._load_lock:
+            self._dir_mtime = None
+            self._next_check = 0.0
@@ -0,0 +1,128 @@
+import sys
+from typing import List
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from toxicpred.entity.artifact_entity import DataValidityArtifact
+from toxicpred.exception import ToxicityException
+
+MISSING_COLUMN = "missing_column"
+NULL_VALUE = "null_value"
+OUT_OF_RANGE = "out_of_range"
+INVALID_VALUE = "invalid_value"
+INVALID_CATEGORY = "invalid_category"
+
+
+class DataValidityChecker:
+    """
+    Row level checks compiled once from the valid schema (config/validate.json).
+
+    Columns with a {"min", "max"} entry are range checked together as one float
+    matrix, columns with a list entry are checked against the allowed categories.
+    Every failed check sets one bit in the row's reason code, so a row is valid
+    when its reason code is 0.
+    """
+    def __init__(self, valid_schema: dict):
+        try:
+            self.range_columns = [column for column, rule in valid_schema.items() if isinstance(rule, dict)]
+            self.categorical_columns = [column for column, rule in valid_schema.items() if isinstance(rule, list)]
+            self._lower = np.array([valid_schema[column]["min"] for column in self.range_columns], dtype=np.float64)
+            self._upper = np.array([valid_schema[column]["max"] for column in self.range_columns], dtype=np.float64)
+            self._categories = {
+                column: np.array(valid_schema[column], dtype=np.float64) for column in self.categorical_columns
+            }
+
+            self.reason_names: List[str] = []
+            self._bits = {}
+            for column in self.range_columns:
+                for reason in (MISSING_COLUMN, NULL_VALUE, INVALID_VALUE, OUT_OF_RANGE):
+                    self._add_reason(column, reason)
+            for column in self.categorical_columns:
+                for reason in (MISSING_COLUMN, NULL_VALUE, INVALID_CATEGORY):
+                    self._add_reason(column, reason)
+            if len(self.reason_names) > 64:
+                raise ValueError("Too many validity checks to fit in a 64 bit reason code")
+
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def _add_reason(self, column: str, reason: str) -> None:
+        self._bits[(column, reason)] = np.uint64(1 << len(self.reason_names))
+        self.reason_names.append(f"{column}:{reason}")
+
+    @staticmethod
+    def _as_float_matrix(df: DataFrame, columns: List[str]) -> np.ndarray:
+        '''
+        returns the columns as an (n_rows, n_columns) float matrix,
+        values that are not numbers become NaN
+        '''
+        matrix = np.empty((len(df), len(columns)), dtype=np.float64)
+        for i, column in enumerate(columns):
+            values = df[column]
+            if not pd.api.types.is_numeric_dtype(values):
+                values = pd.to_numeric(values, errors="coerce")
+            matrix[:, i] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        return matrix
+
+    def check(self, df: DataFrame) -> DataValidityArtifact:
+        '''
+        Takes input a dataframe and returns the per row validity mask
+        and reason codes
+        '''
+        try:
+            n_rows = len(df)
+            reason_codes = np.zeros(n_rows, dtype=np.uint64)
+            zero = np.uint64(0)
+
+            present_range_columns = [column for column in self.range_columns if column in df.columns]
+            if present_range_columns:
+                present = np.array([column in df.columns for column in self.range_columns])
+                values = self._as_float_matrix(df, present_range_columns)
+                null_mask = df[present_range_columns].isna().to_numpy()
+                #values that could not be read as numbers are NaN without being null
+                invalid_mask = np.isnan(values) & ~null_mask
+                out_of_range_mask = (values < self._lower[present]) | (values > self._upper[present])
+                for i, column in enumerate(present_range_columns):
+                    reason_codes |= np.where(null_mask[:, i], self._bits[(column, NULL_VALUE)], zero)
+                    reason_codes |= np.where(invalid_mask[:, i], self._bits[(column, INVALID_VALUE)], zero)
+                    reason_codes |= np.where(out_of_range_mask[:, i], self._bits[(column, OUT_OF_RANGE)], zero)
+
+            present_categorical_columns = [column for column in self.categorical_columns if column in df.columns]
+            if present_categorical_columns:
+                values = self._as_float_matrix(df, present_categorical_columns)
+                null_mask = df[present_categorical_columns].isna().to_numpy()
+                for i, column in enumerate(present_categorical_columns):
+                    invalid_mask = ~null_mask[:, i] & ~np.isin(values[:, i], self._categories[column])
+                    reason_codes |= np.where(null_mask[:, i], self._bits[(column, NULL_VALUE)], zero)
+                    reason_codes |= np.where(invalid_mask, self._bits[(column, INVALID_CATEGORY)], zero)
+
+            for column in self.range_columns + self.categorical_columns:
+                if column not in df.columns:
+                    reason_codes |= self._bits[(column, MISSING_COLUMN)]
+
+            return DataValidityArtifact(
+                valid_mask=reason_codes == 0,
+                reason_codes=reason_codes,
+                reason_names=self.reason_names,
+            )
+
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def describe_invalid_rows(self, data_validity_artifact: DataValidityArtifact) -> List[dict]:
+        '''
+        returns [{"row": position, "reasons": [...]}, ...] for every invalid row
+        '''
+        try:
+            invalid_rows = np.flatnonzero(~data_validity_artifact.valid_mask)
+            invalid_codes = data_validity_artifact.reason_codes[invalid_rows]
+            reasons = [[] for _ in range(len(invalid_rows))]
+            for bit, reason_name in enumerate(data_validity_artifact.reason_names):
+                for i in np.flatnonzero(invalid_codes & np.uint64(1 << bit)):
+                    reasons[i].append(reason_name)
+            return [{"row": int(row), "reasons": row_reasons} for row, row_reasons in zip(invalid_rows, reasons)]
+
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
@@ -1,8 +1,13 @@
 import sys
 from toxicpred.exception import ToxicityException
-from toxicpred.logger import logging
+from toxicpred.logger import get_logger
+import numpy as np
 from pandas import DataFrame
 from toxicpred.components.model_prediction import ModelPrediction
+from toxicpred.entity.artifact_entity import DataValidityArtifact
+logger = get_logger(__name__)
+
+
 class PredictionPipeline:
     def __init__(self):
         try:
@@ -12,23 +17,65 @@ class PredictionPipeline:
 
     def validate(self, df:DataFrame) -> bool:
         try:
-            logging.info("Entered the validate method of PredictionPipeline class")
+            logger.info("Entered the validate method of PredictionPipeline class")
             status = self.prediction_component.check_data_validity(df)
-            logging.info("Exiting the validate method of PredictionPipeline class")
+            logger.info("Exiting the validate method of PredictionPipeline class")
             return status
         
         except Exception as e:
             raise ToxicityException(e,sys) from e
     
+    def validate_rows(self, df:DataFrame) -> DataValidityArtifact:
+        try:
+            logger.info("Entered the validate_rows method of PredictionPipeline class")
+            data_validity_artifact = self.prediction_component.check_row_validity(df)
+            logger.info("Exiting the validate_rows method of PredictionPipeline class")
+            return data_validity_artifact
+
+        except Exception as e:
+            raise ToxicityException(e,sys) from e
+
+    def describe_invalid_rows(self, data_validity_artifact:DataValidityArtifact) -> list:
+        try:
+            return self.prediction_component.describe_invalid_rows(data_validity_artifact)
+
+        except Exception as e:
+            raise ToxicityException(e,sys) from e
+
     def predict(self, df:DataFrame):
         try:
-            logging.info("Entered the predict method of PredictionPipeline class")
+            logger.info("Entered the predict method of PredictionPipeline class")
             prediction_result = self.prediction_component.predict_output(df)
-            logging.info("Exiting the predict method of PredictionPipeline class")
+            logger.info("Exiting the predict method of PredictionPipeline class")
             return prediction_result
 
         except Exception as e:
             raise ToxicityException(e,sys) from e
-    
-        
 
+    def predict_valid_rows(self, df:DataFrame):
+        '''
+        validates every row and scores only the valid ones, returns
+        (predictions, data_validity_artifact) where predictions is aligned with
+        the rows of df and holds None for invalid rows, or is None when no
+        model is available
+        '''
+        try:
+            data_validity_artifact = self.validate_rows(df)
+            valid_mask = data_validity_artifact.valid_mask
+            predictions = np.full(len(df), None, dtype=object)
+            if valid_mask.any():
+                valid_predictions = self.predict(df if valid_mask.all() else df[valid_mask])
+                if not valid_predictions:
+                    return None, data_validity_artifact
+                predictions[valid_mask] = valid_predictions
+            return predictions.tolist(), data_validity_artifact
+
+        except Exception as e:
+            raise ToxicityException(e,sys) from e
+
+    @property
+    def model_version(self):
+        return self.prediction_component.model_registry.model_version
+
+    def prediction_cache_stats(self) -> dict:
+        return self.prediction_component.prediction_cache_stats()
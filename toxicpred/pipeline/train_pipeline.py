@@ -1,4 +1,6 @@
+import os
 import sys
+from contextlib import contextmanager
 from toxicpred.components.data_ingestion import DataIngestion
 from toxicpred.components.data_transformation import DataTransformation
 from toxicpred.components.data_validation import DataValidation
@@ -6,35 +8,147 @@ from toxicpred.components.model_pusher import ModelPusher
 from toxicpred.components.model_trainer import ModelTrainer
 from toxicpred.components.model_evaluation import ModelEvaluation
 from toxicpred.entity.config_entity import DataTransformationConfig, DataValidationConfig, ModelEvaluationConfig, ModelPusherConfig, ModelTrainerConfig, TrainingPipelineConfig,DataIngestionConfig
-from toxicpred.entity.artifact_entity import DataIngestionArtifact, DataTransformationArtifact, DataValidationArtifact, ModelEvaluationArtifact, ModelTrainerArtifact
+from toxicpred.entity.artifact_entity import DataIngestionArtifact, DataTransformationArtifact, DataValidationArtifact, ModelEvaluationArtifact, ModelTrainerArtifact, artifact_file_paths, without_payloads
 from toxicpred.constant.database import TRAINING_BUCKET_NAME
-from toxicpred.constant.training_pipeline import SAVED_MODEL_DIR
+from toxicpred.constant.training_pipeline import (SAVED_MODEL_DIR, TRAINING_ARTIFACT_ASYNC_PERSIST_ENABLED,
+                                                  TRAINING_ARTIFACT_IN_MEMORY_ENABLED, TRAINING_PROFILE_CPROFILE_DIR_NAME,
+                                                  TRAINING_PROFILE_CPROFILE_ENABLED, TRAINING_PROFILE_FILE_NAME,
+                                                  TRAINING_PROFILE_TRACEMALLOC_ENABLED, TRAINING_STAGE_CACHE_ENABLED)
 
 from toxicpred.exception import ToxicityException
-from toxicpred.logger import logging,LOG_FILE_PATH
+from toxicpred.logger import get_logger
 from toxicpred.cloud_storage.s3_syncer import S3Sync
+from toxicpred.ml.model.estimator import ModelResolver
+from toxicpred.utils.artifact_persister import ArtifactPersister
+from toxicpred.utils.stage_cache import StageCache, file_digest
+from toxicpred.utils.stage_profiler import StageProfiler
+
+logger = get_logger(__name__)
 
 class TrainPipeline:
     is_pipeline_running=False
-    def __init__(self):
+    def __init__(self, progress_callback=None, enable_cprofile: bool = TRAINING_PROFILE_CPROFILE_ENABLED,
+                 in_memory_artifacts: bool = TRAINING_ARTIFACT_IN_MEMORY_ENABLED,
+                 async_persist: bool = TRAINING_ARTIFACT_ASYNC_PERSIST_ENABLED,
+                 stage_cache: bool = TRAINING_STAGE_CACHE_ENABLED):
+        '''
+        progress_callback: optional callable(stage_name) called before each stage starts
+        enable_cprofile: also dump cProfile stats of every stage next to profile.json
+        in_memory_artifacts: hand dataframes, arrays and fitted objects to the next stages in the artifacts
+        async_persist: write the artifact files in the background while the next stages run
+        stage_cache: reuse the artifacts of an earlier run for the stages whose inputs did not change
+        '''
         self.training_pipeline_config = TrainingPipelineConfig()
+        self.in_memory_artifacts = in_memory_artifacts
+        self.artifact_persister = ArtifactPersister(asynchronous=async_persist)
+        self.stage_cache = StageCache(enabled=stage_cache)
+        #stage name -> fingerprint of its inputs, and whether its artifacts were reused
+        self.stage_fingerprints = {}
+        self.stage_cache_hits = {}
+        #stages that ran, cached once their files are written
+        self._stage_cache_entries = []
         self.s3_sync = S3Sync()
+        self.progress_callback = progress_callback
+        self.stage_profiler = StageProfiler(
+            enable_tracemalloc=TRAINING_PROFILE_TRACEMALLOC_ENABLED,
+            enable_cprofile=enable_cprofile,
+            cprofile_dir=os.path.join(self.training_pipeline_config.artifact_dir, TRAINING_PROFILE_CPROFILE_DIR_NAME),
+        )
+
+    def report_progress(self, stage_name: str) -> None:
+        if self.progress_callback is not None:
+            self.progress_callback(stage_name)
+
+    @contextmanager
+    def run_stage(self, stage_name: str):
+        '''
+        reports progress and profiles the stage run in the with block
+        '''
+        self.report_progress(stage_name)
+        with self.stage_profiler.profile(stage_name) as stage_profile:
+            yield stage_profile
+            stage_profile.cache_hit = self.stage_cache_hits.get(stage_name)
+
+    def run_cached(self, stage_name: str, config, stage_dir: str, artifact_class, run_fn, *inputs):
+        '''
+        returns the artifact of an earlier run of the stage with the same fingerprint, or runs it
+        inputs: fingerprints of the upstream stages or digests of the data the stage reads
+        '''
+        if not self.stage_cache.enabled:
+            return run_fn()
+        artifact_dir = self.training_pipeline_config.artifact_dir
+        fingerprint = self.stage_cache.fingerprint(stage_name, config, artifact_dir, *inputs)
+        self.stage_fingerprints[stage_name] = fingerprint
+        artifact = self.stage_cache.load(stage_name, fingerprint, artifact_class, stage_dir, artifact_dir)
+        self.stage_cache_hits[stage_name] = artifact is not None
+        if artifact is not None:
+            return artifact
+        artifact = run_fn()
+        self._stage_cache_entries.append((stage_name, fingerprint, without_payloads(artifact), stage_dir))
+        return artifact
+
+    def save_stage_cache(self) -> None:
+        #only called once the artifact persister is closed, so that every file is complete
+        artifact_dir = self.training_pipeline_config.artifact_dir
+        for stage_name, fingerprint, artifact, stage_dir in self._stage_cache_entries:
+            self.stage_cache.save(stage_name, fingerprint, artifact, stage_dir, artifact_dir)
+        self._stage_cache_entries = []
+
+    def handoff(self, artifact):
+        '''
+        the artifact as the next stages get it, without its payloads when they read the files instead
+        '''
+        if self.in_memory_artifacts:
+            return artifact
+        #the next stages read the files, which may still be written in the background
+        self.artifact_persister.wait(artifact_file_paths(artifact))
+        return without_payloads(artifact)
+
+    def files_read(self, file_paths: list) -> list:
+        #the stages only read these files when the artifacts do not carry them in memory
+        return [] if self.in_memory_artifacts else file_paths
+
+    def close_artifact_persister(self) -> None:
+        #waits for the artifact files still being written in the background
+        try:
+            self.artifact_persister.close()
+        except Exception as e:
+            logger.exception(f"Could not write the training artifacts: {e}")
+            raise
+
+    def write_profile_report(self, status: str) -> None:
+        try:
+            self.stage_profiler.write_report(
+                os.path.join(self.training_pipeline_config.artifact_dir, TRAINING_PROFILE_FILE_NAME),
+                pipeline_timestamp=self.training_pipeline_config.timestamp,
+                status=status,
+            )
+        except Exception as e:
+            #a missing report must not hide the outcome of the training run
+            logger.exception(f"Could not write the training profile report: {e}")
     
     def start_data_ingestion(self) -> DataIngestionArtifact:
         try:
             
-            logging.info(
+            logger.info(
               "Entered the start_data_ingestion method of TrainPipeline class"
             )
             self.data_ingestion_config = DataIngestionConfig(training_pipeline_config=self.training_pipeline_config)
             
-            logging.info("Starting data ingestion")
+            logger.info("Starting data ingestion")
             data_ingestion = DataIngestion(
-                data_ingestion_config=self.data_ingestion_config
+                data_ingestion_config=self.data_ingestion_config,
+                artifact_persister=self.artifact_persister
             )
-            data_ingestion_artifact = data_ingestion.initiate_data_ingestion()
-            logging.info(f"Data ingestion completed and artifact: {data_ingestion_artifact}")
-            logging.info(
+            #the table is exported on every run, the split is reused when its content did not change
+            dataframe = data_ingestion.export_data_into_feature_store()
+            data_ingestion_artifact = self.run_cached(
+                "data_ingestion", self.data_ingestion_config, self.data_ingestion_config.data_ingestion_dir,
+                DataIngestionArtifact, lambda: data_ingestion.initiate_data_ingestion(dataframe),
+                file_digest(self.data_ingestion_config.feature_store_file_path) if self.stage_cache.enabled else None,
+            )
+            logger.info(f"Data ingestion completed and artifact: {data_ingestion_artifact}")
+            logger.info(
                 "Exited the start_data_ingestion method of TrainPipeline class"
             )
             
@@ -49,17 +163,22 @@ class TrainPipeline:
     ) -> DataValidationArtifact:
       
         try:
-            logging.info("Entered the start_data_validation method of TrainPipeline class")
+            logger.info("Entered the start_data_validation method of TrainPipeline class")
             data_validation_config = DataValidationConfig(training_pipeline_config=self.training_pipeline_config)
             data_validation = DataValidation(
                 data_ingestion_artifact=data_ingestion_artifact,
-                data_validation_config=data_validation_config
+                data_validation_config=data_validation_config,
+                artifact_persister=self.artifact_persister
             )
 
-            data_validation_artifact = data_validation.initiate_data_validation()
+            data_validation_artifact = self.run_cached(
+                "data_validation", data_validation_config, data_validation_config.data_validation_dir,
+                DataValidationArtifact, data_validation.initiate_data_validation,
+                self.stage_fingerprints.get("data_ingestion"),
+            )
 
-            logging.info("Performed the data validation operation")
-            logging.info(
+            logger.info("Performed the data validation operation")
+            logger.info(
                 "Exited the start_data_validation method of TrainPipeline class"
             )
             
@@ -73,17 +192,22 @@ class TrainPipeline:
         self, data_validation_artifact:DataValidationArtifact
     ) -> DataTransformationArtifact:
         try:
-            logging.info("Entered the start_data_transformation method of TrainPipeline class")
+            logger.info("Entered the start_data_transformation method of TrainPipeline class")
             data_transformation_config = DataTransformationConfig(training_pipeline_config=self.training_pipeline_config)
 
             data_transformation = DataTransformation(
                data_validation_artifact = data_validation_artifact,
                data_transformation_config = data_transformation_config,
+               artifact_persister = self.artifact_persister,
+            )
+            data_transformation_artifact = self.run_cached(
+                "data_transformation", data_transformation_config, data_transformation_config.data_transformation_dir,
+                DataTransformationArtifact, data_transformation.initiate_data_transformation,
+                self.stage_fingerprints.get("data_validation"),
             )
-            data_transformation_artifact = data_transformation.initiate_data_transformation()
             
-            logging.info("Performed the data transformation operation")
-            logging.info(
+            logger.info("Performed the data transformation operation")
+            logger.info(
                 "Exited the start_data_transformation method of TrainPipeline class"
             )
             
@@ -94,14 +218,18 @@ class TrainPipeline:
 
     def start_model_trainer(self,data_transformation_artifact:DataTransformationArtifact):
         try:
-            logging.info("Entered the start_model_trainer method of TrainPipeline class")
+            logger.info("Entered the start_model_trainer method of TrainPipeline class")
             model_trainer_config = ModelTrainerConfig(training_pipeline_config=self.training_pipeline_config)
-            model_trainer = ModelTrainer(model_trainer_config, data_transformation_artifact)
-            model_trainer_artifact = model_trainer.initiate_model_trainer()
+            model_trainer = ModelTrainer(model_trainer_config, data_transformation_artifact, self.artifact_persister)
+            model_trainer_artifact = self.run_cached(
+                "model_trainer", model_trainer_config, model_trainer_config.model_trainer_dir,
+                ModelTrainerArtifact, model_trainer.initiate_model_trainer,
+                self.stage_fingerprints.get("data_transformation"),
+            )
 
 
-            logging.info("Performed the Model Training operation")
-            logging.info(
+            logger.info("Performed the Model Training operation")
+            logger.info(
                 "Exited the start_model_trainer method of TrainPipeline class"
             )
 
@@ -117,13 +245,21 @@ class TrainPipeline:
                                  model_trainer_artifact:ModelTrainerArtifact,
                                 ):
         try:
-            logging.info("Entered the start_model_evaluation method of TrainPipeline class")
+            logger.info("Entered the start_model_evaluation method of TrainPipeline class")
             model_eval_config = ModelEvaluationConfig(self.training_pipeline_config)
             model_eval = ModelEvaluation(model_eval_config, data_validation_artifact, data_transformation_artifact, model_trainer_artifact)
-            model_eval_artifact = model_eval.initiate_model_evaluation()
+            #the trained model is compared against the best saved model, a newly pushed one changes the result
+            model_resolver = ModelResolver()
+            best_model_path = model_resolver.get_best_model_path() if model_resolver.is_model_exists() else None
+            model_eval_artifact = self.run_cached(
+                "model_evaluation", model_eval_config, model_eval_config.model_evaluation_dir,
+                ModelEvaluationArtifact, model_eval.initiate_model_evaluation,
+                self.stage_fingerprints.get("data_validation"), self.stage_fingerprints.get("data_transformation"),
+                self.stage_fingerprints.get("model_trainer"), best_model_path,
+            )
 
-            logging.info("Performed the Model Evaluation operation")
-            logging.info(
+            logger.info("Performed the Model Evaluation operation")
+            logger.info(
                 "Exited the start_model_evaluation method of TrainPipeline class"
             )
             
@@ -135,13 +271,13 @@ class TrainPipeline:
 
     def start_model_pusher(self,model_eval_artifact:ModelEvaluationArtifact):
         try:
-            logging.info("Entered the start_model_pusher method of TrainPipeline class")
+            logger.info("Entered the start_model_pusher method of TrainPipeline class")
             model_pusher_config = ModelPusherConfig(training_pipeline_config=self.training_pipeline_config)
-            model_pusher = ModelPusher(model_pusher_config, model_eval_artifact)
+            model_pusher = ModelPusher(model_pusher_config, model_eval_artifact, self.artifact_persister)
             model_pusher_artifact = model_pusher.initiate_model_pusher()
 
-            logging.info("Performed the Model Pusher operation")
-            logging.info(
+            logger.info("Performed the Model Pusher operation")
+            logger.info(
                 "Exited the start_model_pusher method of TrainPipeline class"
             )
             
@@ -152,49 +288,119 @@ class TrainPipeline:
   
     def sync_artifact_dir_to_s3(self):
         try:
-            logging.info("Entered the sync_artifact_dir_to_s3 method of TrainPipeline class")
+            logger.info("Entered the sync_artifact_dir_to_s3 method of TrainPipeline class")
             aws_bucket_url = f"s3://{TRAINING_BUCKET_NAME}/artifact/{self.training_pipeline_config.timestamp}"
             self.s3_sync.sync_folder_to_s3(folder = self.training_pipeline_config.artifact_dir,aws_buket_url=aws_bucket_url)
-            logging.info("Performed Syncing of artifact to S3 bucket")
+            logger.info("Performed Syncing of artifact to S3 bucket")
 
         except Exception as e:
             raise ToxicityException(e,sys)
 
     def sync_saved_model_dir_to_s3(self):
         try:
-            logging.info("Entered the sync_saved_model_dir_to_s3 method of TrainPipeline class")
+            logger.info("Entered the sync_saved_model_dir_to_s3 method of TrainPipeline class")
             aws_bucket_url = f"s3://{TRAINING_BUCKET_NAME}/{SAVED_MODEL_DIR}"
             self.s3_sync.sync_folder_to_s3(folder = SAVED_MODEL_DIR,aws_buket_url=aws_bucket_url)
-            logging.info("Performed Syncing of saved models to S3 bucket")
+            logger.info("Performed Syncing of saved models to S3 bucket")
         except Exception as e:
             raise ToxicityException(e,sys)
     
     def run_pipeline(self,) -> None:
         try:
             
-            logging.info("Entered the run_pipeline method of TrainPipeline class")
+            logger.info("Entered the run_pipeline method of TrainPipeline class")
             TrainPipeline.is_pipeline_running=True
-            data_ingestion_artifact:DataIngestionArtifact = self.start_data_ingestion()
-            data_validation_artifact = self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
-            data_transformation_artifact = self.start_data_transformation(data_validation_artifact=data_validation_artifact)
-            model_trainer_artifact = self.start_model_trainer(data_transformation_artifact)
-            model_eval_artifact = self.start_model_evaluation(data_validation_artifact, data_transformation_artifact, model_trainer_artifact)
+            with self.run_stage("data_ingestion") as stage_profile:
+                data_ingestion_artifact:DataIngestionArtifact = self.handoff(self.start_data_ingestion())
+            stage_profile.record_files(written=[
+                self.data_ingestion_config.feature_store_file_path,
+                data_ingestion_artifact.trained_file_path,
+                data_ingestion_artifact.test_file_path,
+            ])
+
+            with self.run_stage("data_validation") as stage_profile:
+                data_validation_artifact = self.handoff(self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact))
+            stage_profile.record_files(
+                read=self.files_read([data_ingestion_artifact.trained_file_path, data_ingestion_artifact.test_file_path]),
+                written=[
+                    data_validation_artifact.valid_train_file_path,
+                    data_validation_artifact.valid_test_file_path,
+                    data_validation_artifact.drift_report_file_path,
+                    data_validation_artifact.drift_report_dashboard_path,
+                ],
+            )
+            #no later stage uses the ingested dataframes
+            data_ingestion_artifact = without_payloads(data_ingestion_artifact)
+
+            with self.run_stage("data_transformation") as stage_profile:
+                data_transformation_artifact = self.handoff(self.start_data_transformation(data_validation_artifact=data_validation_artifact))
+            stage_profile.record_files(
+                read=self.files_read([data_validation_artifact.valid_train_file_path, data_validation_artifact.valid_test_file_path]),
+                written=[
+                    data_transformation_artifact.transformed_train_file_path,
+                    data_transformation_artifact.transformed_test_file_path,
+                    data_transformation_artifact.transformed_object_file_path,
+                ],
+            )
+
+            with self.run_stage("model_trainer") as stage_profile:
+                model_trainer_artifact = self.handoff(self.start_model_trainer(data_transformation_artifact))
+            stage_profile.record_files(
+                read=self.files_read([
+                    data_transformation_artifact.transformed_train_file_path,
+                    data_transformation_artifact.transformed_test_file_path,
+                    data_transformation_artifact.transformed_object_file_path,
+                ]),
+                written=[model_trainer_artifact.trained_model_file_path],
+            )
+            data_transformation_artifact = without_payloads(
+                data_transformation_artifact, "transformed_train_arr", "transformed_test_arr"
+            )
+
+            with self.run_stage("model_evaluation") as stage_profile:
+                model_eval_artifact = self.start_model_evaluation(data_validation_artifact, data_transformation_artifact, model_trainer_artifact)
+            stage_profile.record_files(read=[
+                *self.files_read([
+                    data_validation_artifact.valid_train_file_path,
+                    data_validation_artifact.valid_test_file_path,
+                    model_eval_artifact.trained_model_path,
+                ]),
+                *([model_eval_artifact.best_model_path]
+                  if model_eval_artifact.best_model_path != model_eval_artifact.trained_model_path else []),
+            ])
             if not model_eval_artifact.is_model_accepted:
-                print("Process Completed Succesfully. Model Trained and Evaluated but the Trained model is not better than the best model. So, we do not push this model to Production. Exiting.")
-                raise Exception("Process Completed Succesfully. Model Trained and Evaluated but the Trained model is not better than the best model. So, we do not push this model to Production. Exiting.")
+                message = f"Process Completed Succesfully. Model Trained and Evaluated but {model_eval_artifact.rejection_reason}. So, we do not push this model to Production. Exiting."
+                print(message)
+                raise Exception(message)
             
-            model_pusher_artifact = self.start_model_pusher(model_eval_artifact)
+            with self.run_stage("model_pusher") as stage_profile:
+                model_pusher_artifact = self.start_model_pusher(model_eval_artifact)
+            stage_profile.record_files(
+                read=[model_eval_artifact.trained_model_path],
+                written=[model_pusher_artifact.model_file_path, model_pusher_artifact.saved_model_path],
+            )
+            self.close_artifact_persister()
+            self.save_stage_cache()
+            self.write_profile_report(status="succeeded")
             TrainPipeline.is_pipeline_running=False
             #self.sync_artifact_dir_to_s3()
             #self.sync_saved_model_dir_to_s3()
             
               
-            logging.info("Training Pipeline Running Operation Complete")
-            logging.info(
+            logger.info("Training Pipeline Running Operation Complete")
+            logger.info(
                 "Exited the run_pipeline method of TrainPipeline class"
             )
         except Exception as e:
            
             #self.sync_artifact_dir_to_s3()
             TrainPipeline.is_pipeline_running=False
+            try:
+                self.close_artifact_persister()
+                #the stages that completed before the failure are still reused by the next run
+                self.save_stage_cache()
+            except Exception:
+                #the error of the stage is the one to report
+                pass
+            self.write_profile_report(status="failed")
             raise ToxicityException(e, sys) from e
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""
+Runs TrainPipeline in a separate process so that serving workers are never
+blocked by training.
+
+The serving worker takes an exclusive flock on the training lock file and
+hands the locked file descriptor to the child process, which keeps the lock
+until it exits. The lock is therefore held by exactly one run across every
+uvicorn worker and process on the host, and it is released by the kernel even
+if the training process dies. Job status and progress are kept in one json
+file per job under TRAINING_JOB_DIR.
+"""
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import time
+import traceback
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from toxicpred.constant.training_pipeline import (TRAINING_JOB_DIR, TRAINING_JOB_LOCK_FILE_NAME,
+                                                  TRAINING_JOB_LOCK_RETRY_SECONDS, TRAINING_JOB_NICENESS,
+                                                  TRAINING_PIPELINE_STAGES)
+from toxicpred.exception import ToxicityException
+from toxicpred.logger import get_logger
+
+logger = get_logger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class TrainingJobRunner:
+    def __init__(self, job_dir: str = TRAINING_JOB_DIR):
+        try:
+            self.job_dir = job_dir
+            self.lock_file_path = os.path.join(job_dir, TRAINING_JOB_LOCK_FILE_NAME)
+            self._processes = []
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def _job_file_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _write_job_status(self, job_status: dict) -> None:
+        #write then rename so that readers never see a partial file
+        job_file_path = self._job_file_path(job_status["job_id"])
+        with open(f"{job_file_path}.tmp", "w") as job_file:
+            json.dump(job_status, job_file)
+        os.replace(f"{job_file_path}.tmp", job_file_path)
+
+    def _update_job_status(self, job_id: str, **changes) -> dict:
+        job_status = self._read_job_status(job_id)
+        job_status.update(changes)
+        self._write_job_status(job_status)
+        return job_status
+
+    def _reap_finished_processes(self) -> None:
+        self._processes = [process for process in self._processes if process.poll() is None]
+
+    def _read_job_status(self, job_id: str) -> Optional[dict]:
+        job_file_path = self._job_file_path(os.path.basename(job_id))
+        if not os.path.exists(job_file_path):
+            return None
+        with open(job_file_path) as job_file:
+            return json.load(job_file)
+
+    @staticmethod
+    def _is_process_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            #exists but belongs to another user
+            return True
+        try:
+            #a child of another worker stays a zombie until that worker reaps it
+            with open(f"/proc/{pid}/stat") as stat_file:
+                return stat_file.read().rsplit(")", 1)[1].split()[0] != "Z"
+        except (OSError, IndexError):
+            return True
+
+    def _is_job_process_gone(self, job_status: dict) -> bool:
+        if job_status["pid"] is not None:
+            return not self._is_process_alive(job_status["pid"])
+        #queued before its process started, the lock is released by the kernel if the worker died
+        return not self.is_training_running()
+
+    def get_job_status(self, job_id: str) -> Optional[dict]:
+        '''
+        returns the status of the job or None if there is no such job, a queued or
+        running job whose process is gone is marked failed
+        '''
+        try:
+            self._reap_finished_processes()
+            job_status = self._read_job_status(job_id)
+            if job_status is None or job_status["status"] not in (QUEUED, RUNNING):
+                return job_status
+            if not self._is_job_process_gone(job_status):
+                return job_status
+            #the job may have written its final status between the two reads
+            job_status = self._read_job_status(job_id)
+            if job_status["status"] in (QUEUED, RUNNING):
+                logger.info(f"Training job [{job_status['job_id']}] exited without a final status")
+                job_status.update(status=FAILED, finished_at=_now(), error="training process exited unexpectedly")
+                self._write_job_status(job_status)
+            return job_status
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def is_training_running(self) -> bool:
+        '''
+        whether some training run holds the training lock
+        '''
+        try:
+            os.makedirs(self.job_dir, exist_ok=True)
+            with open(self.lock_file_path, "a") as lock_file:
+                try:
+                    #a shared probe, start_job retries once if it collides with it
+                    fcntl.flock(lock_file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return True
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                return False
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def start_job(self) -> Optional[dict]:
+        '''
+        starts a training run in a new process and returns its job status,
+        None when another run already holds the training lock
+        '''
+        try:
+            self._reap_finished_processes()
+            os.makedirs(self.job_dir, exist_ok=True)
+            lock_fd = os.open(self.lock_file_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                try:
+                    fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    #a status check holds a shared probe for a moment, a training run keeps the lock
+                    time.sleep(TRAINING_JOB_LOCK_RETRY_SECONDS)
+                    try:
+                        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        return None
+
+                job_id = uuid.uuid4().hex
+                job_status = {
+                    "job_id": job_id,
+                    "status": QUEUED,
+                    "pid": None,
+                    "created_at": _now(),
+                    "started_at": None,
+                    "finished_at": None,
+                    "stage": None,
+                    "stage_index": 0,
+                    "total_stages": len(TRAINING_PIPELINE_STAGES),
+                    "progress": 0.0,
+                    "artifact_dir": None,
+                    "error": None,
+                }
+                self._write_job_status(job_status)
+                try:
+                    process = subprocess.Popen(
+                        [sys.executable, "-m", "toxicpred.pipeline.training_job", job_id, self.job_dir, str(lock_fd)],
+                        pass_fds=(lock_fd,),
+                        start_new_session=True,
+                    )
+                except Exception as e:
+                    self._update_job_status(job_id, status=FAILED, finished_at=_now(), error=str(e))
+                    raise
+                self._processes.append(process)
+                logger.info(f"Started training job [{job_id}] in process [{process.pid}]")
+                return self._update_job_status(job_id, pid=process.pid)
+            finally:
+                #the child process keeps the lock through its own copy of the descriptor
+                os.close(lock_fd)
+
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def run_job(self, job_id: str) -> None:
+        '''
+        runs the training pipeline for an already created job, called in the child process
+        '''
+        def report_progress(stage_name: str) -> None:
+            stage_index = TRAINING_PIPELINE_STAGES.index(stage_name)
+            self._update_job_status(
+                job_id,
+                stage=stage_name,
+                stage_index=stage_index,
+                progress=round(stage_index / len(TRAINING_PIPELINE_STAGES), 3),
+            )
+
+        try:
+            #imported here so that the serving workers never load the training stack
+            from toxicpred.pipeline.train_pipeline import TrainPipeline
+            train_pipeline = TrainPipeline(progress_callback=report_progress)
+            self._update_job_status(
+                job_id, status=RUNNING, started_at=_now(),
+                artifact_dir=train_pipeline.training_pipeline_config.artifact_dir,
+            )
+            train_pipeline.run_pipeline()
+            self._update_job_status(job_id, status=SUCCEEDED, finished_at=_now(), progress=1.0)
+        except Exception as e:
+            logger.exception(f"Training job [{job_id}] failed")
+            self._update_job_status(job_id, status=FAILED, finished_at=_now(), error=str(e))
+
+
+def main():
+    job_id, job_dir, lock_fd = sys.argv[1], sys.argv[2], int(sys.argv[3])
+    #training must not take cpu time away from the serving workers on the same host
+    os.nice(TRAINING_JOB_NICENESS)
+    try:
+        TrainingJobRunner(job_dir=job_dir).run_job(job_id)
+    except Exception:
+        traceback.print_exc()
+    finally:
+        os.close(lock_fd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import asyncio
+import functools
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from toxicpred.constant.application import (INFERENCE_EXECUTOR_KIND, INFERENCE_EXECUTOR_MAX_QUEUE_SIZE,
+                                            INFERENCE_EXECUTOR_MAX_WORKERS)
+from toxicpred.exception import InferenceQueueFullException, ToxicityException
+
+
+class InferenceExecutor:
+    """
+    Runs CPU bound validation and inference on a thread or process pool so the
+    event loop stays free for request parsing and health checks.
+
+    At most max_workers tasks run and max_queue_size more wait; submitting beyond
+    that raises InferenceQueueFullException instead of growing the backlog.
+    With the process pool every worker process keeps its own model registry, so
+    functions and arguments have to be picklable module level objects.
+    """
+    def __init__(self, kind: str = INFERENCE_EXECUTOR_KIND,
+                 max_workers: int = INFERENCE_EXECUTOR_MAX_WORKERS,
+                 max_queue_size: int = INFERENCE_EXECUTOR_MAX_QUEUE_SIZE,
+                 initializer: Optional[Callable] = None):
+        try:
+            if kind == "thread":
+                self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference",
+                                                initializer=initializer)
+            elif kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=max_workers, initializer=initializer,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            else:
+                raise ValueError(f"Unknown inference executor kind [{kind}], expected 'thread' or 'process'")
+            self.kind = kind
+            self.max_workers = max_workers
+            self.max_pending = max_workers + max_queue_size
+            #tasks submitted to the pool and not done yet, whether or not a request still awaits them
+            self._futures = set()
+            self._futures_lock = threading.Lock()
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    @property
+    def pending(self) -> int:
+        return len(self._futures)
+
+    def _task_done(self, future) -> None:
+        with self._futures_lock:
+            self._futures.discard(future)
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        with self._futures_lock:
+            if len(self._futures) >= self.max_pending:
+                raise InferenceQueueFullException(
+                    f"Inference executor is full with {len(self._futures)} running and queued tasks"
+                )
+            future = self._pool.submit(functools.partial(fn, *args, **kwargs))
+            self._futures.add(future)
+        #a task keeps counting against the bound until the pool is done with it, even when the
+        #request awaiting it is cancelled, e.g. because the client disconnected
+        future.add_done_callback(self._task_done)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        #queued tasks are cancelled by hand, cancel_futures of shutdown needs python 3.9
+        with self._futures_lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,96 @@
+"""
+Module level tasks handed to the InferenceExecutor.
+
+They only take and return plain, picklable data so the same functions run on
+the thread pool and on the process pool. Each process builds its own
+PredictionPipeline on first use.
+"""
+import json
+import threading
+
+import pandas as pd
+
+from toxicpred.pipeline.prediction_pipeline import PredictionPipeline
+from toxicpred.serving.input_formats import InputFrameReader
+from toxicpred.serving.metrics import REQUEST_PARSE_SECONDS
+
+INVALID_INPUT = "Invalid input"
+MODEL_NOT_AVAILABLE = "Model is not available"
+
+_prediction_pipeline = None
+_prediction_pipeline_lock = threading.Lock()
+_input_frame_reader = None
+
+
+def get_prediction_pipeline() -> PredictionPipeline:
+    global _prediction_pipeline
+    if _prediction_pipeline is None:
+        with _prediction_pipeline_lock:
+            if _prediction_pipeline is None:
+                _prediction_pipeline = PredictionPipeline()
+    return _prediction_pipeline
+
+
+def predict_single_rows(items: list) -> list:
+    '''
+    scores a batch of single row requests, returns for every item either
+    {"prediction": [value]} or an error message
+    '''
+    with REQUEST_PARSE_SECONDS.time(route="predict_single"):
+        df = pd.DataFrame(items)
+    predictions, _ = get_prediction_pipeline().predict_valid_rows(df)
+    if predictions is None:
+        return [MODEL_NOT_AVAILABLE for _ in items]
+    return [
+        {"prediction": [prediction]} if prediction is not None else INVALID_INPUT
+        for prediction in predictions
+    ]
+
+
+def get_input_frame_reader() -> InputFrameReader:
+    global _input_frame_reader
+    if _input_frame_reader is None:
+        _input_frame_reader = InputFrameReader()
+    return _input_frame_reader
+
+
+def predict_upload(contents: bytes, content_type: str = None):
+    '''
+    parses, validates and scores an uploaded csv, parquet, arrow or npy file,
+    returns the json encoded {"prediction": [...], "invalid_rows": [...]} as
+    bytes or an error message. Encoding here keeps serialization of large
+    results off the event loop.
+    '''
+    prediction_pipeline = get_prediction_pipeline()
+    with REQUEST_PARSE_SECONDS.time(route="predict_many"):
+        df = get_input_frame_reader().read(contents, content_type)
+    predictions, data_validity = prediction_pipeline.predict_valid_rows(df)
+    if predictions is None:
+        return MODEL_NOT_AVAILABLE
+    invalid_rows = prediction_pipeline.describe_invalid_rows(data_validity)
+    return json.dumps({"prediction": predictions, "invalid_rows": invalid_rows}).encode()
+
+
+def predict_chunk(df: pd.DataFrame, first_row: int, output_format: str):
+    '''
+    validates and scores one chunk of a streamed upload, returns the encoded
+    ndjson or csv lines as bytes or an error message. Rows are numbered from
+    first_row so that numbering continues across chunks.
+    '''
+    prediction_pipeline = get_prediction_pipeline()
+    predictions, data_validity = prediction_pipeline.predict_valid_rows(df)
+    if predictions is None:
+        return MODEL_NOT_AVAILABLE
+    reasons = {
+        invalid_row["row"]: invalid_row["reasons"]
+        for invalid_row in prediction_pipeline.describe_invalid_rows(data_validity)
+    }
+    lines = []
+    for i, prediction in enumerate(predictions):
+        if output_format == "csv":
+            lines.append(f"{first_row + i},{'' if prediction is None else prediction},{';'.join(reasons.get(i, []))}\n")
+        elif i in reasons:
+            lines.append(json.dumps({"row": first_row + i, "prediction": None, "reasons": reasons[i]}) + "\n")
+        else:
+            lines.append(json.dumps({"row": first_row + i, "prediction": prediction}) + "\n")
+    return "".join(lines).encode()
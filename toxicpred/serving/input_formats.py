@@ -0,0 +1,158 @@
+import csv
+import importlib.util
+import io
+import sys
+from typing import BinaryIO, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from toxicpred.constant.training_pipeline import SCHEMA_FILE_PATH
+from toxicpred.exception import ToxicityException
+from toxicpred.utils.main_utils import get_schema_column_dtypes, read_yaml_file
+
+CSV = "csv"
+PARQUET = "parquet"
+ARROW_FILE = "arrow_file"
+ARROW_STREAM = "arrow_stream"
+NPY = "npy"
+
+#checked in order against the first bytes of the upload
+MAGIC_BYTES = [
+    (b"PAR1", PARQUET),
+    (b"ARROW1", ARROW_FILE),
+    (b"\xff\xff\xff\xff", ARROW_STREAM),
+    (b"\x93NUMPY", NPY),
+]
+
+CONTENT_TYPES = {
+    "text/csv": CSV,
+    "application/vnd.apache.parquet": PARQUET,
+    "application/x-parquet": PARQUET,
+    "application/vnd.apache.arrow.file": ARROW_FILE,
+    "application/x-feather": ARROW_FILE,
+    "application/vnd.apache.arrow.stream": ARROW_STREAM,
+    "application/x-npy": NPY,
+}
+
+
+class InputFrameReader:
+    """
+    Reads a batch prediction upload into a DataFrame of the model input columns.
+
+    The format is taken from the magic bytes of the upload, then from its content
+    type, and is csv otherwise. Csv columns are parsed with the dtypes declared in
+    schema.yaml instead of being inferred. Parquet and Arrow columns keep the types
+    stored in the file. A 2-D .npy array holds the columns in model input order
+    (numerical then categorical columns of schema.yaml), a structured .npy array
+    names them.
+    """
+    def __init__(self):
+        try:
+            schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+            self.feature_columns = schema_config["numerical_columns"] + schema_config["categorical_columns"]
+            self.column_dtypes = get_schema_column_dtypes(schema_config, columns=self.feature_columns)
+            #the pyarrow csv parser is multithreaded and much faster on nullable int columns
+            self.csv_engine = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    @staticmethod
+    def detect_format(contents: bytes, content_type: Optional[str] = None) -> str:
+        for magic, input_format in MAGIC_BYTES:
+            if contents.startswith(magic):
+                return input_format
+        if content_type:
+            return CONTENT_TYPES.get(content_type.split(";")[0].strip().lower(), CSV)
+        return CSV
+
+    def _select_feature_columns(self, table):
+        present = [column for column in self.feature_columns if column in table.schema.names]
+        return table.select(present).to_pandas()
+
+    def read_csv(self, contents: bytes) -> pd.DataFrame:
+        try:
+            header_end = contents.find(b"\n")
+            header_line = (contents if header_end == -1 else contents[:header_end]).decode("utf-8-sig")
+            header = next(csv.reader([header_line]), [])
+            present = [column for column in header if column in self.column_dtypes]
+            return pd.read_csv(io.BytesIO(contents), usecols=present, engine=self.csv_engine,
+                               dtype={column: self.column_dtypes[column] for column in present})
+        except ValueError:
+            #a malformed value in a typed column, fall back to inferred parsing so
+            #that validation can report the offending rows instead of failing the file
+            return pd.read_csv(io.BytesIO(contents))
+
+    def _apply_column_dtypes(self, df: pd.DataFrame) -> pd.DataFrame:
+        #a column holding a value that is not of its type is left as read, validation reports its rows
+        typed = {}
+        for column in df.columns:
+            try:
+                typed[column] = pd.to_numeric(df[column]).astype(self.column_dtypes[column])
+            except (ValueError, TypeError):
+                pass
+        return df.assign(**typed)
+
+    @staticmethod
+    def _record_batch_chunks(batches, columns: list, chunk_size: int) -> Iterator[pd.DataFrame]:
+        for batch in batches:
+            batch = batch.select([column for column in columns if column in batch.schema.names])
+            for offset in range(0, batch.num_rows, chunk_size):
+                yield batch.slice(offset, chunk_size).to_pandas()
+
+    def iter_chunks(self, file: BinaryIO, chunk_size: int, content_type: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        '''
+        yields the upload chunk_size rows at a time without reading all of it, csv, parquet
+        and arrow uploads can be read this way, file has to be seekable
+        '''
+        input_format = self.detect_format(file.read(8), content_type)
+        file.seek(0)
+        if input_format == CSV:
+            for chunk in pd.read_csv(file, chunksize=chunk_size, dtype=str,
+                                     usecols=lambda column: column in self.column_dtypes):
+                yield self._apply_column_dtypes(chunk)
+            return
+        if input_format == NPY:
+            raise ValueError(".npy uploads cannot be streamed, send them without stream=true")
+
+        import pyarrow as pa
+        if input_format == PARQUET:
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(file)
+            present = [column for column in self.feature_columns if column in parquet_file.schema_arrow.names]
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=present):
+                yield batch.to_pandas()
+            return
+        if input_format == ARROW_FILE:
+            reader = pa.ipc.open_file(file)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        else:
+            batches = pa.ipc.open_stream(file)
+        yield from self._record_batch_chunks(batches, self.feature_columns, chunk_size)
+
+    def read(self, contents: bytes, content_type: Optional[str] = None) -> pd.DataFrame:
+        try:
+            input_format = self.detect_format(contents, content_type)
+            if input_format == CSV:
+                return self.read_csv(contents)
+
+            if input_format == NPY:
+                array = np.load(io.BytesIO(contents), allow_pickle=False)
+                if array.dtype.names is not None:
+                    return pd.DataFrame({name: array[name] for name in array.dtype.names if name in self.column_dtypes})
+                if array.ndim != 2 or array.shape[1] != len(self.feature_columns):
+                    raise ValueError(f".npy upload must be a 2-D array with columns {self.feature_columns}")
+                return pd.DataFrame(array, columns=self.feature_columns, copy=False)
+
+            import pyarrow as pa
+            if input_format == PARQUET:
+                import pyarrow.parquet as pq
+                parquet_file = pq.ParquetFile(io.BytesIO(contents))
+                present = [column for column in self.feature_columns if column in parquet_file.schema_arrow.names]
+                return parquet_file.read(columns=present).to_pandas()
+            if input_format == ARROW_FILE:
+                return self._select_feature_columns(pa.ipc.open_file(pa.BufferReader(contents)).read_all())
+            return self._select_feature_columns(pa.ipc.open_stream(pa.BufferReader(contents)).read_all())
+
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
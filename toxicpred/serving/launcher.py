@@ -0,0 +1,265 @@
+"""
+Preload and fork launcher for the FastAPI app.
+
+The parent process imports the app, loads the config and the newest saved model
+once, binds the listening socket and then forks the uvicorn workers. The
+workers inherit the loaded model, so its memory is shared copy on write instead
+of being loaded again by every worker, and they all serve the same version.
+
+Workers never look for a newer model themselves. The parent checks the saved
+model directory every MODEL_REGISTRY_REFRESH_INTERVAL seconds, or at once on
+SIGHUP. When a new model is there it loads it and replaces the workers one at a
+time: a new worker is forked and has to be accepting connections before an
+old one is sent SIGTERM and finishes its in flight requests. Workers that exit
+are forked again. SIGTERM or SIGINT stops all workers and the parent.
+
+Run from the repository root:
+    python -m toxicpred.serving.launcher --workers 4
+"""
+import argparse
+import asyncio
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+from toxicpred.constant.application import (APP_HOST, APP_PORT, MODEL_REGISTRY_REFRESH_INTERVAL,
+                                            SERVING_GRACEFUL_TIMEOUT, SERVING_WORKER_READY_TIMEOUT, SERVING_WORKERS)
+from toxicpred.constant.training_pipeline import SAVED_MODEL_DIR
+from toxicpred.exception import ToxicityException
+from toxicpred.logger import get_logger, stop_queue_listener
+from toxicpred.ml.model.registry import ModelRegistry
+
+logger = get_logger(__name__)
+
+
+class PreforkLauncher:
+    def __init__(self, app: str = "app:app", host: str = APP_HOST, port: int = APP_PORT,
+                 workers: int = SERVING_WORKERS, model_dir: str = SAVED_MODEL_DIR,
+                 check_interval: float = MODEL_REGISTRY_REFRESH_INTERVAL,
+                 ready_timeout: float = SERVING_WORKER_READY_TIMEOUT,
+                 graceful_timeout: float = SERVING_GRACEFUL_TIMEOUT, log_level: str = "warning"):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.n_workers = workers
+        self.model_dir = model_dir
+        self.check_interval = check_interval
+        self.ready_timeout = ready_timeout
+        self.graceful_timeout = graceful_timeout
+        self.log_level = log_level
+        self.model_registry = None
+        self.model_version = None
+        #worker pid -> model version it was forked with
+        self.workers = {}
+        self._socket = None
+        self._stopping = False
+        self._reload_requested = False
+
+    def preload(self) -> None:
+        '''
+        imports the app and loads the newest model in the parent, before any worker is forked
+        '''
+        logger.info(f"Preloading {self.app}")
+        self._asgi_app = import_from_string(self.app)
+        from toxicpred.serving.inference_tasks import get_prediction_pipeline
+        get_prediction_pipeline()
+        self.model_registry = ModelRegistry.get_registry(model_dir=self.model_dir)
+        self.model_version, _ = self.model_registry.get_model()
+        self._freeze_heap()
+        logger.info(f"Preloaded model version [{self.model_version}]")
+
+    @staticmethod
+    def _freeze_heap() -> None:
+        #objects that exist before the fork are left out of garbage collection in the
+        #workers, a collection would otherwise write to every one of their pages
+        gc.collect()
+        gc.freeze()
+
+    def bind(self) -> None:
+        self._socket = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(2048)
+        self._socket.set_inheritable(True)
+        logger.info(f"Listening on {self.host}:{self._socket.getsockname()[1]}")
+
+    def _run_worker(self, ready_fd: int) -> None:
+        for signal_number in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signal_number, signal.SIG_DFL)
+        #replaced by the parent when a newer model is pushed instead
+        self.model_registry.pin()
+        config = uvicorn.Config(self._asgi_app, log_level=self.log_level, timeout_graceful_shutdown=self.graceful_timeout)
+        server = uvicorn.Server(config)
+
+        async def serve():
+            serve_task = asyncio.create_task(server.serve(sockets=[self._socket]))
+            while not server.started and not serve_task.done():
+                await asyncio.sleep(0.01)
+            if server.started:
+                os.write(ready_fd, b"1")
+            os.close(ready_fd)
+            await serve_task
+
+        asyncio.run(serve())
+
+    def spawn_worker(self) -> int:
+        '''
+        forks a worker and returns its pid once it accepts connections
+        '''
+        ready_read_fd, ready_write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                os.close(ready_read_fd)
+                self._run_worker(ready_write_fd)
+            except BaseException:
+                logger.exception("Serving worker failed")
+                exit_code = 1
+            finally:
+                stop_queue_listener()
+                os._exit(exit_code)
+
+        os.close(ready_write_fd)
+        try:
+            readable, _, _ = select.select([ready_read_fd], [], [], self.ready_timeout)
+            ready = bool(readable) and os.read(ready_read_fd, 1) == b"1"
+        finally:
+            os.close(ready_read_fd)
+        self.workers[pid] = self.model_version
+        if not ready:
+            logger.info(f"Worker [{pid}] did not become ready within {self.ready_timeout}s")
+        else:
+            logger.info(f"Worker [{pid}] is serving model version [{self.model_version}]")
+        return pid
+
+    def stop_worker(self, pid: int, timeout: float = None) -> None:
+        timeout = self.graceful_timeout if timeout is None else timeout
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._reap(pid):
+                return
+            time.sleep(0.05)
+        logger.info(f"Worker [{pid}] did not stop within {timeout}s, killing it")
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self._reap_blocking(pid)
+
+    def _reap_blocking(self, pid: int) -> None:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+        self.workers.pop(pid, None)
+
+    def _reap(self, pid: int = -1) -> bool:
+        '''
+        collects exited workers, returns whether pid (any worker for -1) has exited
+        '''
+        exited = False
+        while True:
+            try:
+                exited_pid, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                #already collected
+                if pid != -1:
+                    self.workers.pop(pid, None)
+                    return True
+                return exited
+            if exited_pid == 0:
+                return exited
+            self.workers.pop(exited_pid, None)
+            exited = True
+            if not self._stopping and pid == -1:
+                logger.info(f"Worker [{exited_pid}] exited with status {status}")
+            if pid != -1:
+                return exited
+
+    def check_model(self, force: bool = False) -> None:
+        if force:
+            self.model_registry.reload()
+        model_version, _ = self.model_registry.get_model()
+        if model_version is None or model_version == self.model_version:
+            return
+        logger.info(f"Model version [{model_version}] found, replacing the workers of version [{self.model_version}]")
+        self.model_version = model_version
+        self._freeze_heap()
+        for pid, worker_model_version in list(self.workers.items()):
+            if self._stopping:
+                return
+            if worker_model_version == model_version:
+                continue
+            self.spawn_worker()
+            self.stop_worker(pid)
+
+    def _handle_stop(self, signal_number, frame) -> None:
+        self._stopping = True
+
+    def _handle_reload(self, signal_number, frame) -> None:
+        self._reload_requested = True
+
+    def run(self) -> None:
+        try:
+            self.preload()
+            self.bind()
+            signal.signal(signal.SIGTERM, self._handle_stop)
+            signal.signal(signal.SIGINT, self._handle_stop)
+            signal.signal(signal.SIGHUP, self._handle_reload)
+            for _ in range(self.n_workers):
+                self.spawn_worker()
+
+            next_check = time.monotonic() + self.check_interval
+            while not self._stopping:
+                time.sleep(0.1)
+                self._reap()
+                while len(self.workers) < self.n_workers and not self._stopping:
+                    self.spawn_worker()
+                if self._reload_requested or time.monotonic() >= next_check:
+                    force, self._reload_requested = self._reload_requested, False
+                    self.check_model(force=force)
+                    next_check = time.monotonic() + self.check_interval
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+        finally:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        self._stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.workers):
+            self.stop_worker(pid)
+        if self._socket is not None:
+            self._socket.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="app:app")
+    parser.add_argument("--host", default=APP_HOST)
+    parser.add_argument("--port", type=int, default=APP_PORT)
+    parser.add_argument("--workers", type=int, default=SERVING_WORKERS)
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+    PreforkLauncher(app=args.app, host=args.host, port=args.port, workers=args.workers,
+                    log_level=args.log_level).run()
+
+
+if __name__ == "__main__":
+    main()
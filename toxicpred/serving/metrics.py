@@ -0,0 +1,224 @@
+"""
+In-process metrics of the serving path, rendered in the Prometheus text format
+by the /metrics route.
+
+Every metric keeps its values per tuple of label values behind its own lock, so
+recording from the event loop, the inference threads and the micro batcher is
+safe and costs about a microsecond. Metrics are recorded in the process that
+runs the stage: with the "process" inference executor the stage timings of the
+worker processes are not visible to /metrics, only the request level ones.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+#seconds, from half a millisecond up to a large upload
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(label_names: Tuple[str, ...], label_values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict) -> tuple:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"Metric {self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ] + self.render_samples()
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render_samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(Counter):
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._label_values(labels)
+        bucket_index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                #one count per bucket plus the +Inf bucket, then sum and count
+                values = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            values[0][bucket_index] += 1
+            values[1] += value
+            values[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        '''
+        observes the wall time spent in the with block, in seconds
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render_samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        samples = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(upper_bound)}"'
+                samples.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            samples.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            samples.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[_Metric]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[_Metric]]) -> None:
+        '''
+        collector is called on every render and returns metrics built from
+        state that is kept elsewhere, such as the prediction cache counters
+        '''
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for collector in collectors:
+            metrics.extend(collector())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "toxicpred_request_seconds", "End to end latency of prediction requests.", ["route"])
+REQUEST_PARSE_SECONDS = REGISTRY.histogram(
+    "toxicpred_request_parse_seconds", "Time spent turning the request payload into a DataFrame.", ["route"])
+VALIDATION_SECONDS = REGISTRY.histogram(
+    "toxicpred_validation_seconds", "Time spent checking the rows against the valid schema.")
+MODEL_RESOLUTION_SECONDS = REGISTRY.histogram(
+    "toxicpred_model_resolution_seconds", "Time spent resolving the model to serve, including any reload.")
+MODEL_LOAD_SECONDS = REGISTRY.histogram(
+    "toxicpred_model_load_seconds", "Time spent unpickling a newly saved model.")
+PREPROCESSING_SECONDS = REGISTRY.histogram(
+    "toxicpred_preprocessing_seconds", "Time spent building and imputing the model input array.")
+MODEL_PREDICT_SECONDS = REGISTRY.histogram(
+    "toxicpred_model_predict_seconds", "Time spent in the regressor predict call.")
+BATCH_SIZE = REGISTRY.histogram(
+    "toxicpred_batch_size_rows", "Number of rows handed to the model per prediction call.",
+    buckets=BATCH_SIZE_BUCKETS)
+ROWS_VALIDATED = REGISTRY.counter(
+    "toxicpred_rows_validated_total", "Rows checked against the valid schema.", ["result"])
+ROWS_SCORED = REGISTRY.counter(
+    "toxicpred_rows_scored_total", "Rows for which a prediction was returned.")
+MODEL_VERSION = REGISTRY.gauge(
+    "toxicpred_model_version", "Timestamp of the model currently being served, 0 when there is none.")
+MODEL_VERSION.set(0)
+
+
+def render_cache_stats(cache_stats: Optional[dict]) -> List[_Metric]:
+    '''
+    turns PredictionCache.stats() into metrics for a render
+    '''
+    if not cache_stats:
+        return []
+    metrics = []
+    for stat in ("hits", "misses", "coalesced"):
+        counter = Counter(f"toxicpred_prediction_cache_{stat}_total", f"Prediction cache {stat}.")
+        counter.inc(cache_stats[stat])
+        metrics.append(counter)
+    size = Gauge("toxicpred_prediction_cache_size", "Entries held by the prediction cache.")
+    size.set(cache_stats["size"])
+    metrics.append(size)
+    return metrics
@@ -0,0 +1,101 @@
+import asyncio
+import sys
+from typing import Any, Callable, List, Optional
+
+from toxicpred.constant.application import MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_US
+from toxicpred.exception import ToxicityException
+from toxicpred.logger import get_logger
+from toxicpred.serving.executor import InferenceExecutor
+
+logger = get_logger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single row requests and scores them with one call.
+
+    The first queued row opens a window of at most max_wait_us microseconds;
+    every row arriving in that window, up to max_batch_size rows, is handed to
+    batch_fn as one list and each caller receives the element of the returned
+    list at its own position. An exception raised by batch_fn is set on every
+    caller of that batch. When an executor is given batch_fn runs on it instead
+    of on the event loop.
+    """
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = MICRO_BATCH_MAX_SIZE,
+                 max_wait_us: int = MICRO_BATCH_MAX_WAIT_US,
+                 executor: Optional[InferenceExecutor] = None):
+        try:
+            if max_batch_size < 1:
+                raise ValueError("max_batch_size must be at least 1")
+            self.batch_fn = batch_fn
+            self.executor = executor
+            self.max_batch_size = max_batch_size
+            self.max_wait = max_wait_us / 1_000_000
+            self._queue = None
+            self._worker = None
+            self._loop = None
+            self._dispatching = set()
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, row: Any) -> Any:
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((row, future))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run_batch(self, rows: list) -> list:
+        if self.executor is not None:
+            return await self.executor.run(self.batch_fn, rows)
+        return self.batch_fn(rows)
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            #callers that went away while waiting do not need a result
+            batch = [(row, future) for row, future in batch if not future.done()]
+            if not batch:
+                continue
+            #keep collecting the next batch while this one runs on the executor
+            task = self._loop.create_task(self._dispatch(batch))
+            self._dispatching.add(task)
+            task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, batch: list) -> None:
+        try:
+            results = await self._run_batch([row for row, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch function returned {len(results)} results for {len(batch)} rows")
+        except Exception as e:
+            logger.exception(f"Micro batch of {len(batch)} rows failed")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
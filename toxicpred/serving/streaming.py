@@ -0,0 +1,88 @@
+import asyncio
+import json
+from typing import AsyncIterator, BinaryIO, Optional
+
+import pandas as pd
+
+from toxicpred.constant.application import STREAM_CHUNK_SIZE
+from toxicpred.logger import get_logger
+from toxicpred.serving.executor import InferenceExecutor
+from toxicpred.serving.inference_tasks import predict_chunk
+from toxicpred.serving.input_formats import InputFrameReader
+from toxicpred.serving.metrics import REQUEST_PARSE_SECONDS
+
+logger = get_logger(__name__)
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+CSV_HEADER = b"row,prediction,reasons\n"
+
+
+class ChunkedPredictionStream:
+    """
+    Scores an uploaded csv, parquet or arrow file chunk by chunk.
+
+    Only one chunk of parsed rows and its encoded results are held at a time,
+    so memory stays bounded by chunk_size whatever the size of the upload.
+    Parsing runs on a background thread and scoring on the inference executor.
+    The first chunk is scored by start() so that a missing model can still be
+    answered with a plain error response before the stream begins.
+    """
+    def __init__(self, file: BinaryIO, output_format: str, executor: InferenceExecutor,
+                 chunk_size: int = STREAM_CHUNK_SIZE, content_type: Optional[str] = None):
+        if output_format not in STREAM_MEDIA_TYPES:
+            raise ValueError(f"Unknown stream format [{output_format}], expected one of {list(STREAM_MEDIA_TYPES)}")
+        self.output_format = output_format
+        self.media_type = STREAM_MEDIA_TYPES[output_format]
+        self.executor = executor
+        #the format is detected like for the uploads read at once, csv columns get the schema dtypes
+        self._reader = InputFrameReader().iter_chunks(file, chunk_size, content_type)
+        self._rows_scored = 0
+        self._first_result: Optional[bytes] = None
+
+    def _next_chunk(self) -> Optional[pd.DataFrame]:
+        with REQUEST_PARSE_SECONDS.time(route="predict_many_stream"):
+            return next(self._reader, None)
+
+    async def _score_next_chunk(self):
+        loop = asyncio.get_running_loop()
+        df = await loop.run_in_executor(None, self._next_chunk)
+        if df is None:
+            return None
+        result = await self.executor.run(predict_chunk, df, self._rows_scored, self.output_format)
+        self._rows_scored += len(df)
+        return result
+
+    async def start(self) -> Optional[str]:
+        '''
+        scores the first chunk, returns an error message if it could not be scored
+        '''
+        result = await self._score_next_chunk()
+        if isinstance(result, str):
+            return result
+        self._first_result = result or b""
+        return None
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        if self.output_format == "csv":
+            yield CSV_HEADER
+        yield self._first_result
+        try:
+            while True:
+                result = await self._score_next_chunk()
+                if result is None:
+                    break
+                if isinstance(result, str):
+                    raise RuntimeError(result)
+                yield result
+        except Exception as e:
+            #the status line is already sent, report the failure in the stream itself
+            logger.exception(f"Streamed prediction failed after {self._rows_scored} rows")
+            if self.output_format == "csv":
+                yield f"error,,{e}\n".encode()
+            else:
+                yield (json.dumps({"error": str(e), "rows_scored": self._rows_scored}) + "\n").encode()
+        finally:
+            self._reader.close()
@@ -0,0 +1,181 @@
+"""
+Local stand-in for the Astra REST v2 rows endpoint, so that ToxicityData can be
+run without a database.
+
+It answers GET /api/rest/v2/keyspaces/<keyspace>/<table>/rows with at most
+page-size rows of the frame it was given, a pageState that continues after the
+last row returned, and no pageState on the last page, like Astra. A where
+parameter with $eq, $gt, $gte, $lt and $lte conditions filters the rows. Requests
+without the expected X-Cassandra-Token get a 401. The rows can be changed between
+requests with upsert_rows.
+
+    with AstraRestStandIn(df) as stand_in:
+        os.environ[ASTRA_REST_BASE_URL] = stand_in.base_url
+        ToxicityData().export_from_astra_database_to_feature_store_using_restapi(path)
+
+Run standalone on synthetic rows:
+    python -m toxicpred.test.astra_rest_stand_in --rows 100000 --port 8181
+"""
+import argparse
+import base64
+import json
+import operator
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from toxicpred.constant.database import DATABASE_NAME, KEYSPACE_NAME
+
+WHERE_OPERATORS = {"$eq": operator.eq, "$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+
+def encode_page_state(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(offset).encode()).decode()
+
+
+def decode_page_state(page_state: str) -> int:
+    return int(base64.urlsafe_b64decode(page_state.encode()).decode())
+
+
+class AstraRestStandIn:
+    def __init__(self, df: pd.DataFrame, host: str = "127.0.0.1", port: int = 0, token: str = None,
+                 keyspace_name: str = KEYSPACE_NAME, table_name: str = DATABASE_NAME,
+                 max_page_size: int = 1000, page_latency_seconds: float = 0.0):
+        self.rows = self._records(df)
+        #where clause -> matching rows, so that a filtered scan does not filter again for every page
+        self._filtered_rows = {}
+        self.token = token
+        self.path = f"/api/rest/v2/keyspaces/{keyspace_name}/{table_name}/rows"
+        self.max_page_size = max_page_size
+        self.page_latency_seconds = page_latency_seconds
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @staticmethod
+    def _records(df: pd.DataFrame) -> list:
+        #rows are kept as json ready dicts, missing values as null
+        return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+    def upsert_rows(self, df: pd.DataFrame, key: str) -> None:
+        '''
+        replaces the rows with the same key and appends the others, like an insert into the table
+        '''
+        self._filtered_rows = {}
+        positions = {row[key]: i for i, row in enumerate(self.rows)}
+        for row in self._records(df):
+            if row[key] in positions:
+                self.rows[positions[row[key]]] = row
+            else:
+                self.rows.append(row)
+
+    @staticmethod
+    def _matches(row: dict, where: dict) -> bool:
+        for column, conditions in where.items():
+            for operator_name, value in conditions.items():
+                if row.get(column) is None or not WHERE_OPERATORS[operator_name](row[column], value):
+                    return False
+        return True
+
+    def page(self, page_size: int, page_state: str = None, where: dict = None) -> dict:
+        rows = self.rows
+        if where:
+            where_key = json.dumps(where, sort_keys=True)
+            if where_key not in self._filtered_rows:
+                self._filtered_rows[where_key] = [row for row in self.rows if self._matches(row, where)]
+            rows = self._filtered_rows[where_key]
+        offset = decode_page_state(page_state) if page_state else 0
+        end = offset + min(page_size, self.max_page_size)
+        page = {"count": len(rows[offset:end]), "data": rows[offset:end]}
+        if end < len(rows):
+            page["pageState"] = encode_page_state(end)
+        return page
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send_json(self, status: int, content: dict) -> None:
+                body = json.dumps(content).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                stand_in.requests += 1
+                url = urlparse(self.path)
+                if url.path != stand_in.path:
+                    self._send_json(404, {"description": f"unknown path {url.path}"})
+                    return
+                if stand_in.token is not None and self.headers.get("X-Cassandra-Token") != stand_in.token:
+                    self._send_json(401, {"description": "missing or invalid X-Cassandra-Token"})
+                    return
+                query = parse_qs(url.query)
+                try:
+                    page_size = int(query.get("page-size", ["100"])[0])
+                    where = json.loads(query["where"][0]) if "where" in query else None
+                    page = stand_in.page(page_size, query.get("page-state", [None])[0], where)
+                except (ValueError, KeyError) as e:
+                    self._send_json(400, {"description": str(e)})
+                    return
+                if stand_in.page_latency_seconds:
+                    time.sleep(stand_in.page_latency_seconds)
+                self._send_json(200, page)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "AstraRestStandIn":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="astra-rest-stand-in", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "AstraRestStandIn":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8181)
+    parser.add_argument("--token", default=None)
+    parser.add_argument("--page-latency", type=float, default=0.0, help="seconds added to every page")
+    args = parser.parse_args()
+
+    from toxicpred.utils.synthetic_data import SyntheticDescriptorGenerator
+    df = SyntheticDescriptorGenerator(seed=0).training_frame(args.rows)
+    stand_in = AstraRestStandIn(df, host=args.host, port=args.port, token=args.token,
+                                page_latency_seconds=args.page_latency)
+    print(f"serving {len(df)} rows at {stand_in.base_url}{stand_in.path}", flush=True)
+    try:
+        stand_in._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stand_in._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Local stand-in for a cassandra-driver session, so that the token range export of
+ToxicityData can be run and benchmarked without a database.
+
+It holds the rows of a frame with a 64 bit token computed from the partition key
+and answers the prepared token range query of ToxicityData like the driver with a
+dict_factory row factory: execute(statement, (start, end)) returns the rows with
+start < token <= end, fetch_size at a time through current_rows, has_more_pages
+and fetch_next_page(). Every page can be delayed to stand in for the round trip,
+the delay releases the GIL like waiting on the network does.
+
+    session = CassandraSessionStandIn(df, page_latency_seconds=0.005)
+    ToxicityData().export_from_astra_database_to_feature_store_using_driver(path, session=session)
+"""
+import hashlib
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from toxicpred.constant.database import CASSANDRA_FETCH_SIZE, CASSANDRA_PARTITION_KEY
+
+
+def stand_in_token(key) -> int:
+    #a stable signed 64 bit hash, murmur3 itself is not needed for the scan to be exercised
+    return int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), "little", signed=True)
+
+
+class PreparedStatementStandIn:
+    def __init__(self, query: str):
+        self.query = query
+        self.fetch_size = None
+
+
+class ResultSetStandIn:
+    def __init__(self, session: "CassandraSessionStandIn", rows: list, fetch_size: int):
+        self._session = session
+        self._rows = rows
+        self._fetch_size = fetch_size
+        self._offset = 0
+        self.current_rows = []
+        self.fetch_next_page()
+
+    @property
+    def has_more_pages(self) -> bool:
+        return self._offset < len(self._rows)
+
+    def fetch_next_page(self) -> None:
+        self._session._page_round_trip()
+        self.current_rows = self._rows[self._offset:self._offset + self._fetch_size]
+        self._offset += self._fetch_size
+
+
+class ClusterStandIn:
+    def __init__(self):
+        self.is_shutdown = False
+
+    def shutdown(self) -> None:
+        self.is_shutdown = True
+
+
+class CassandraSessionStandIn:
+    def __init__(self, df: pd.DataFrame, partition_key: str = CASSANDRA_PARTITION_KEY,
+                 page_latency_seconds: float = 0.0):
+        tokens = np.array([stand_in_token(key) for key in df[partition_key]], dtype=np.int64)
+        order = np.argsort(tokens, kind="stable")
+        self.tokens = tokens[order]
+        #rows are kept in token order as dicts, missing values as None
+        self.rows = df.iloc[order].astype(object).where(df.iloc[order].notna(), None).to_dict(orient="records")
+        self.partition_key = partition_key
+        self.page_latency_seconds = page_latency_seconds
+        self.default_fetch_size = CASSANDRA_FETCH_SIZE
+        self.cluster = ClusterStandIn()
+        self.queries = 0
+        self.pages = 0
+        self.max_concurrent_pages = 0
+        self._concurrent_pages = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, query: str) -> PreparedStatementStandIn:
+        if not re.search(rf'token\("?{re.escape(self.partition_key)}"?\) > \? AND token\("?'
+                         rf'{re.escape(self.partition_key)}"?\) <= \?', query):
+            raise ValueError(f"not a token range query on {self.partition_key}: {query}")
+        return PreparedStatementStandIn(query)
+
+    def execute(self, statement: PreparedStatementStandIn, parameters: tuple, timeout: float = None) -> ResultSetStandIn:
+        start, end = parameters
+        with self._lock:
+            self.queries += 1
+        first = np.searchsorted(self.tokens, start, side="right")
+        last = np.searchsorted(self.tokens, end, side="right")
+        return ResultSetStandIn(self, self.rows[first:last], statement.fetch_size or self.default_fetch_size)
+
+    def _page_round_trip(self) -> None:
+        with self._lock:
+            self.pages += 1
+            self._concurrent_pages += 1
+            self.max_concurrent_pages = max(self.max_concurrent_pages, self._concurrent_pages)
+        try:
+            if self.page_latency_seconds:
+                time.sleep(self.page_latency_seconds)
+        finally:
+            with self._lock:
+                self._concurrent_pages -= 1
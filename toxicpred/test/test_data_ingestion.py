@@ -0,0 +1,79 @@
+import os
+
+import pandas as pd
+import pytest
+
+from toxicpred.components.data_ingestion import DataIngestion
+from toxicpred.constant.env_variable import ASTRA_REST_BASE_URL
+from toxicpred.data_access.toxicity_data import ToxicityData
+from toxicpred.entity.config_entity import DataIngestionConfig, TrainingPipelineConfig
+from toxicpred.test.astra_rest_stand_in import AstraRestStandIn
+from toxicpred.utils.main_utils import read_dataframe, read_json_file
+from toxicpred.utils.synthetic_data import SyntheticDescriptorGenerator
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def data_ingestion(tmp_path, monkeypatch):
+    #the schema is read from config/ relative to the working directory
+    monkeypatch.chdir(REPO_ROOT)
+    config = DataIngestionConfig(TrainingPipelineConfig())
+    config.cache_file_path = str(tmp_path / "cache" / os.path.basename(config.cache_file_path))
+    config.cache_state_file_path = str(tmp_path / "cache" / "state.json")
+    config.incremental_enabled = True
+    config.change_marker_column = "updated_at"
+    os.makedirs(tmp_path / "cache")
+    return DataIngestion(config)
+
+
+def toxicity_frame(n_rows: int) -> pd.DataFrame:
+    df = SyntheticDescriptorGenerator(seed=0).training_frame(n_rows)
+    #rows written one after another
+    df["updated_at"] = df["Index"] * 10
+    return df
+
+
+def test_incremental_refresh_merges_new_and_updated_rows(data_ingestion, monkeypatch):
+    df = toxicity_frame(3000)
+    config = data_ingestion.data_ingestion_config
+    with AstraRestStandIn(df) as stand_in:
+        monkeypatch.setenv(ASTRA_REST_BASE_URL, stand_in.base_url)
+        toxic_data = ToxicityData()
+
+        state = data_ingestion.refresh_feature_store_cache(toxic_data)
+        assert state["last_mode"] == "full"
+        assert state["last_rows_fetched"] == 3000
+        assert state["watermark"] == 29990
+
+        updated = df[df["Index"] == 10].copy()
+        updated["CIC0"] = 9.5
+        added = toxicity_frame(3100).iloc[3000:].copy()
+        changes = pd.concat([updated, added], ignore_index=True)
+        changes["updated_at"] = 50000
+        stand_in.upsert_rows(changes, "Index")
+
+        state = data_ingestion.refresh_feature_store_cache(toxic_data)
+
+    assert state["last_mode"] == "incremental"
+    #the last row before the watermark, the updated row and the new rows
+    assert state["last_rows_fetched"] == 1 + 1 + 100
+    assert state["watermark"] == 50000
+    cache = read_dataframe(config.cache_file_path)
+    assert len(cache) == 3100
+    assert cache["Index"].is_unique and cache["Index"].is_monotonic_increasing
+    assert cache.loc[cache["Index"] == 10, "CIC0"].item() == 9.5
+    assert cache.loc[cache["Index"] == 11, "CIC0"].item() == df.loc[df["Index"] == 11, "CIC0"].item()
+    assert read_json_file(config.cache_state_file_path)["rows"] == 3100
+
+
+@pytest.mark.parametrize("change_marker_column", [None, "Index"])
+def test_incremental_needs_a_change_marker_other_than_the_key(data_ingestion, change_marker_column):
+    data_ingestion.data_ingestion_config.change_marker_column = change_marker_column
+    assert not data_ingestion.is_incremental()
+
+
+def test_incremental_with_change_marker(data_ingestion):
+    assert data_ingestion.is_incremental()
+    data_ingestion.data_ingestion_config.incremental_enabled = False
+    assert not data_ingestion.is_incremental()
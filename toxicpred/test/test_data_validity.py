@@ -0,0 +1,34 @@
+import pandas as pd
+
+from toxicpred.ml.validation.data_validity import DataValidityChecker
+
+VALID_SCHEMA = {"GATS1i": {"min": 0.396, "max": 2.920}, "NdsCH": [0, 1, 2, 3, 4]}
+
+
+def reasons(df: pd.DataFrame) -> list:
+    checker = DataValidityChecker(VALID_SCHEMA)
+    return [row["reasons"] for row in checker.describe_invalid_rows(checker.check(df))]
+
+
+def test_value_that_is_not_a_number_is_invalid_not_out_of_range():
+    df = pd.DataFrame({"GATS1i": ["x", "1.0", None, "5.0"], "NdsCH": [0, 1, 2, 3]})
+
+    assert reasons(df) == [["GATS1i:invalid_value"], ["GATS1i:null_value"], ["GATS1i:out_of_range"]]
+
+
+def test_categorical_and_missing_column_reasons():
+    df = pd.DataFrame({"NdsCH": [0, 7, "x", None]})
+
+    assert reasons(df) == [
+        ["GATS1i:missing_column"],
+        ["GATS1i:missing_column", "NdsCH:invalid_category"],
+        ["GATS1i:missing_column", "NdsCH:invalid_category"],
+        ["GATS1i:missing_column", "NdsCH:null_value"],
+    ]
+
+
+def test_valid_rows():
+    checker = DataValidityChecker(VALID_SCHEMA)
+    artifact = checker.check(pd.DataFrame({"GATS1i": [0.5, 2.9], "NdsCH": [0, 4]}))
+
+    assert artifact.valid_mask.tolist() == [True, True]
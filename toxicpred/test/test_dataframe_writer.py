@@ -0,0 +1,94 @@
+import os
+
+import pandas as pd
+import pytest
+
+from toxicpred.constant.training_pipeline import ARTIFACT_FILE_EXTENSIONS
+from toxicpred.utils.main_utils import DataFrameWriter, read_dataframe, write_dataframe
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    #the writer reads config/schema.yaml relative to the working directory
+    monkeypatch.chdir(REPO_ROOT)
+
+
+def write_pages(file_path: str, pages: list, row_group_size: int) -> int:
+    with DataFrameWriter(file_path, row_group_size=row_group_size) as writer:
+        for page in pages:
+            writer.write(page)
+    return writer.rows
+
+
+@pytest.mark.parametrize("artifact_format", list(ARTIFACT_FILE_EXTENSIONS))
+@pytest.mark.parametrize("row_group_size", [1, 1000])
+def test_category_pages_with_different_categories(tmp_path, artifact_format, row_group_size):
+    file_path = str(tmp_path / f"toxicity{ARTIFACT_FILE_EXTENSIONS[artifact_format]}")
+    pages = [
+        pd.DataFrame({"Index": [1, 2], "class": ["a", "b"]}),
+        pd.DataFrame({"Index": [3, 4], "class": ["c", None]}),
+    ]
+
+    assert write_pages(file_path, pages, row_group_size) == 4
+
+    df = read_dataframe(file_path)
+    assert df["Index"].tolist() == [1, 2, 3, 4]
+    assert df["class"].iloc[:3].tolist() == ["a", "b", "c"]
+    assert pd.isna(df["class"].iloc[3])
+    if artifact_format != "csv":
+        assert isinstance(df["class"].dtype, pd.CategoricalDtype)
+
+
+@pytest.mark.parametrize("artifact_format", list(ARTIFACT_FILE_EXTENSIONS))
+@pytest.mark.parametrize("row_group_size", [1, 1000])
+def test_undeclared_column_without_values_in_the_first_page(tmp_path, artifact_format, row_group_size):
+    file_path = str(tmp_path / f"toxicity{ARTIFACT_FILE_EXTENSIONS[artifact_format]}")
+    pages = [
+        pd.DataFrame({"Index": [1], "note": [None]}),
+        pd.DataFrame({"Index": [2], "note": ["measured twice"]}),
+    ]
+
+    write_pages(file_path, pages, row_group_size)
+
+    df = read_dataframe(file_path)
+    assert pd.isna(df["note"].iloc[0])
+    assert df["note"].iloc[1] == "measured twice"
+
+
+@pytest.mark.parametrize("artifact_format", list(ARTIFACT_FILE_EXTENSIONS))
+def test_empty_export_writes_the_declared_columns(tmp_path, artifact_format):
+    file_path = str(tmp_path / f"toxicity{ARTIFACT_FILE_EXTENSIONS[artifact_format]}")
+
+    assert write_pages(file_path, [], 1000) == 0
+
+    df = read_dataframe(file_path)
+    assert len(df) == 0
+    assert {"Index", "CIC0", "class"} <= set(df.columns)
+
+
+@pytest.mark.parametrize("artifact_format", ["parquet", "feather"])
+def test_declared_dtypes_are_kept(tmp_path, artifact_format):
+    file_path = str(tmp_path / f"toxicity{ARTIFACT_FILE_EXTENSIONS[artifact_format]}")
+    write_dataframe(file_path, pd.DataFrame({"Index": ["1", "2"], "CIC0": ["1.5", "na"], "NdsCH": [1, 2]}))
+
+    df = read_dataframe(file_path)
+    assert df["Index"].tolist() == [1, 2]
+    assert df["CIC0"].iloc[0] == 1.5 and pd.isna(df["CIC0"].iloc[1])
+    assert df["NdsCH"].tolist() == [1, 2]
+
+
+def test_csv_header_is_written_once_after_empty_pages(tmp_path):
+    file_path = str(tmp_path / "toxicity.csv")
+    pages = [
+        pd.DataFrame({"Index": [], "class": []}),
+        pd.DataFrame({"Index": [], "class": []}),
+        pd.DataFrame({"Index": [1], "class": ["a"]}),
+        pd.DataFrame({"Index": [2], "class": ["b"]}),
+    ]
+
+    assert write_pages(file_path, pages, 1000) == 2
+
+    with open(file_path) as csv_file:
+        assert csv_file.read().splitlines() == ["Index,class", "1,a", "2,b"]
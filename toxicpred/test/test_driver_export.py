@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from toxicpred.constant.database import MURMUR3_MAX_TOKEN, MURMUR3_MIN_TOKEN
+from toxicpred.data_access.toxicity_data import ToxicityData, scan_token_ranges, token_ranges
+from toxicpred.exception import ToxicityException
+from toxicpred.test.cassandra_stand_in import CassandraSessionStandIn
+from toxicpred.utils.synthetic_data import SyntheticDescriptorGenerator
+
+
+@pytest.fixture(scope="module")
+def toxicity_df():
+    return SyntheticDescriptorGenerator(seed=0).training_frame(5000)
+
+
+@pytest.mark.parametrize("n_splits", [1, 7, 32])
+def test_token_ranges_cover_the_ring(n_splits):
+    ranges = token_ranges(n_splits)
+
+    assert len(ranges) == n_splits
+    assert ranges[0][0] == MURMUR3_MIN_TOKEN
+    assert ranges[-1][1] == MURMUR3_MAX_TOKEN
+    assert all(start < end for start, end in ranges)
+    assert all(previous[1] == current[0] for previous, current in zip(ranges, ranges[1:]))
+
+
+@pytest.mark.parametrize("workers,n_splits", [(1, 1), (4, 16), (8, 37)])
+def test_driver_scan_returns_every_row_once(toxicity_df, workers, n_splits):
+    session = CassandraSessionStandIn(toxicity_df)
+
+    pages = list(ToxicityData().iter_driver_pages(session=session, workers=workers, n_splits=n_splits, fetch_size=300))
+
+    indexes = [row["Index"] for rows in pages for row in rows]
+    assert sorted(indexes) == list(toxicity_df["Index"])
+    assert session.queries == n_splits
+    assert all(len(rows) <= 300 for rows in pages)
+    #a session handed in is left open for the caller
+    assert not session.cluster.is_shutdown
+
+
+def test_driver_export_writes_every_row(toxicity_df, tmp_path):
+    file_path = str(tmp_path / "toxicity.csv")
+
+    n_rows = ToxicityData().export_from_astra_database_to_feature_store_using_driver(
+        file_path, session=CassandraSessionStandIn(toxicity_df), workers=4, fetch_size=500
+    )
+
+    assert n_rows == len(toxicity_df)
+
+
+def test_scan_error_reaches_the_consumer():
+    def scan_range(start, end):
+        yield [{"start": start}]
+        if start == MURMUR3_MIN_TOKEN:
+            raise TimeoutError("read timeout")
+        yield [{"end": end}]
+
+    with pytest.raises(TimeoutError, match="read timeout"):
+        list(scan_token_ranges(scan_range, token_ranges(8), workers=4, max_pending=2))
+
+
+def test_driver_export_raises_scan_errors(toxicity_df, tmp_path):
+    session = CassandraSessionStandIn(toxicity_df)
+    execute = session.execute
+    calls = []
+
+    def failing_execute(statement, parameters, timeout=None):
+        calls.append(parameters)
+        if len(calls) == 3:
+            raise ConnectionError("node down")
+        return execute(statement, parameters, timeout)
+
+    session.execute = failing_execute
+    with pytest.raises(ToxicityException, match="node down"):
+        ToxicityData().export_from_astra_database_to_feature_store_using_driver(
+            str(tmp_path / "toxicity.csv"), session=session, workers=2, n_splits=8
+        )
+
+
+def test_scan_stops_when_the_consumer_stops():
+    scanned = []
+    lock = threading.Lock()
+
+    def scan_range(start, end):
+        for page in range(100):
+            with lock:
+                scanned.append(page)
+            yield [page]
+
+    pages = scan_token_ranges(scan_range, token_ranges(16), workers=2, max_pending=1)
+    assert next(pages) is not None
+    pages.close()
+
+    assert len(scanned) < 16 * 100
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from toxicpred.exception import InferenceQueueFullException
+from toxicpred.serving.executor import InferenceExecutor
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_run_returns_the_result():
+    executor = InferenceExecutor(kind="thread", max_workers=2, max_queue_size=2)
+
+    assert asyncio.run(executor.run(sum, [1, 2, 3])) == 6
+    assert executor.pending == 0
+    executor.shutdown()
+
+
+def test_cancelled_request_counts_until_its_task_is_done():
+    executor = InferenceExecutor(kind="thread", max_workers=1, max_queue_size=0)
+    release = threading.Event()
+
+    async def scenario():
+        request = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        #the client disconnects while its task runs
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        assert executor.pending == 1
+        with pytest.raises(InferenceQueueFullException):
+            await executor.run(sum, [1])
+
+    asyncio.run(scenario())
+    release.set()
+    wait_until(lambda: executor.pending == 0)
+    executor.shutdown()
+
+
+def test_shutdown_cancels_queued_tasks():
+    executor = InferenceExecutor(kind="thread", max_workers=1, max_queue_size=1)
+    release = threading.Event()
+    ran = []
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(ran.append, 1))
+        await asyncio.sleep(0.05)
+        executor.shutdown()
+        release.set()
+        await running
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+    asyncio.run(scenario())
+    assert ran == []
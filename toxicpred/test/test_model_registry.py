@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+import pytest
+
+from toxicpred.constant.training_pipeline import MODEL_MANIFEST_FILE_NAME
+from toxicpred.ml.model import registry as registry_module
+from toxicpred.ml.model.registry import ModelRegistry
+from toxicpred.utils.main_utils import save_model
+
+
+def push_model(model_dir, version: int, weight: float) -> str:
+    file_path = os.path.join(str(model_dir), str(version), MODEL_MANIFEST_FILE_NAME)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    save_model(file_path, {"version": version, "weights": np.full(4, weight)})
+    touch_dir(model_dir)
+    return file_path
+
+
+def corrupt_model(model_dir, version: int) -> str:
+    file_path = os.path.join(str(model_dir), str(version), MODEL_MANIFEST_FILE_NAME)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w") as model_file:
+        model_file.write('{"format": "partial')
+    touch_dir(model_dir)
+    return file_path
+
+
+def touch_dir(model_dir) -> None:
+    #mtimes of quick successive changes can be equal, the registry compares them
+    stat = os.stat(str(model_dir))
+    os.utime(str(model_dir), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000))
+
+
+@pytest.fixture
+def load_counter(monkeypatch):
+    loads = []
+    load_model = registry_module.load_model
+
+    def counting_load_model(file_path):
+        loads.append(file_path)
+        return load_model(file_path=file_path)
+
+    monkeypatch.setattr(registry_module, "load_model", counting_load_model)
+    return loads
+
+
+def test_new_model_version_is_swapped_in(tmp_path, load_counter):
+    push_model(tmp_path, 1, 1.0)
+    registry = ModelRegistry(model_dir=str(tmp_path), refresh_interval=0.0)
+
+    version, model = registry.get_model()
+    assert version == 1 and model["weights"][0] == 1.0
+    #nothing changed, the loaded model is reused
+    assert registry.get_model()[1] is model
+    assert len(load_counter) == 1
+
+    push_model(tmp_path, 2, 2.0)
+    version, model = registry.get_model()
+    assert version == 2 and model["weights"][0] == 2.0
+    assert registry.model_version == 2
+
+
+def test_model_that_fails_to_load_keeps_the_current_one(tmp_path, load_counter):
+    push_model(tmp_path, 1, 1.0)
+    registry = ModelRegistry(model_dir=str(tmp_path), refresh_interval=0.0)
+    assert registry.get_model()[0] == 1
+
+    corrupt_model(tmp_path, 2)
+    for _ in range(5):
+        version, model = registry.get_model()
+        assert version == 1 and model["weights"][0] == 1.0
+    #the broken model is not loaded again on every request
+    assert len(load_counter) == 2
+
+    #the copy completes, the new model is loaded
+    model_file_path = push_model(tmp_path, 2, 2.0)
+    stat = os.stat(model_file_path)
+    os.utime(model_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000))
+    assert registry.get_model()[0] == 2
+
+
+def test_first_model_that_fails_to_load_is_an_error(tmp_path):
+    corrupt_model(tmp_path, 1)
+    registry = ModelRegistry(model_dir=str(tmp_path), refresh_interval=0.0)
+
+    with pytest.raises(Exception):
+        registry.get_model()
+
+
+def test_no_saved_model(tmp_path):
+    registry = ModelRegistry(model_dir=str(tmp_path / "missing"), refresh_interval=0.0)
+
+    assert registry.get_model() == (None, None)
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from toxicpred.constant.env_variable import ASTRA_DB_APPLICATION_TOKEN, ASTRA_REST_BASE_URL
+from toxicpred.data_access.toxicity_data import ToxicityData
+from toxicpred.exception import ToxicityException
+from toxicpred.test.astra_rest_stand_in import AstraRestStandIn
+from toxicpred.utils.main_utils import read_dataframe
+from toxicpred.utils.synthetic_data import SyntheticDescriptorGenerator
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="module")
+def toxicity_df():
+    return SyntheticDescriptorGenerator(seed=0).training_frame(12_345)
+
+
+@pytest.fixture
+def stand_in(toxicity_df, monkeypatch):
+    with AstraRestStandIn(toxicity_df, token="test-token", max_page_size=1000) as stand_in:
+        monkeypatch.setenv(ASTRA_REST_BASE_URL, stand_in.base_url)
+        monkeypatch.setenv(ASTRA_DB_APPLICATION_TOKEN, "test-token")
+        yield stand_in
+
+
+def test_page_state_loop_returns_every_row(stand_in, toxicity_df):
+    pages = list(ToxicityData().iter_rest_pages(page_size=1000))
+
+    assert [len(rows) for rows in pages] == [1000] * 12 + [345]
+    assert stand_in.requests == 13
+    assert sorted(row["Index"] for rows in pages for row in rows) == list(toxicity_df["Index"])
+
+
+def test_export_to_feature_store_writes_every_row(stand_in, toxicity_df, tmp_path, monkeypatch):
+    #the feature store is typed with config/schema.yaml relative to the working directory
+    monkeypatch.chdir(REPO_ROOT)
+    file_path = str(tmp_path / "toxicity.feather")
+
+    n_rows = ToxicityData().export_from_astra_database_to_feature_store_using_restapi(file_path, page_size=1000)
+
+    exported = read_dataframe(file_path)
+    assert n_rows == len(exported) == 12_345
+    assert exported["Index"].tolist() == toxicity_df["Index"].tolist()
+    assert exported["CIC0"].tolist() == pytest.approx(toxicity_df["CIC0"].tolist())
+
+
+def test_export_to_dataframe_filters_with_where(stand_in):
+    df = ToxicityData().export_from_astra_database_to_dataframe_using_restapi(
+        page_size=1000, where={"Index": {"$gte": 12_000}}
+    )
+
+    assert df["Index"].tolist() == list(range(12_000, 12_345))
+
+
+def test_wrong_token_is_an_error(stand_in, monkeypatch):
+    monkeypatch.setenv(ASTRA_DB_APPLICATION_TOKEN, "wrong-token")
+
+    with pytest.raises(ToxicityException):
+        ToxicityData().export_from_astra_database_to_dataframe_using_restapi(page_size=1000)
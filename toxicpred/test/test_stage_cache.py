@@ -0,0 +1,116 @@
+import os
+import shutil
+import time
+from datetime import datetime
+
+import pytest
+
+from toxicpred.constant.training_pipeline import SCHEMA_FILE_PATH, TRAINING_STAGE_CACHE_MANIFEST_FILE_NAME
+from toxicpred.entity.artifact_entity import DataIngestionArtifact
+from toxicpred.entity.config_entity import DataIngestionConfig, TrainingPipelineConfig
+from toxicpred.utils.main_utils import read_dataframe, write_dataframe
+from toxicpred.utils.stage_cache import StageCache
+from toxicpred.utils.synthetic_data import SyntheticDescriptorGenerator
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    #the fingerprints read config/schema.yaml and config/validate.json relative to the working directory
+    shutil.copytree(os.path.join(REPO_ROOT, "config"), tmp_path / "config")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def ingestion_config(second: int) -> DataIngestionConfig:
+    #every run has its own artifact directory
+    return DataIngestionConfig(TrainingPipelineConfig(timestamp=datetime(2024, 1, 1, 0, 0, second)))
+
+
+def run_ingestion(config: DataIngestionConfig) -> DataIngestionArtifact:
+    df = SyntheticDescriptorGenerator(seed=0).training_frame(20)
+    write_dataframe(config.training_file_path, df.iloc[:15])
+    write_dataframe(config.testing_file_path, df.iloc[15:])
+    return DataIngestionArtifact(trained_file_path=config.training_file_path, test_file_path=config.testing_file_path)
+
+
+def artifact_dir(config: DataIngestionConfig) -> str:
+    return os.path.dirname(config.data_ingestion_dir)
+
+
+def cache_run(stage_cache: StageCache, config: DataIngestionConfig, fingerprint: str) -> None:
+    artifact = run_ingestion(config)
+    stage_cache.save("data_ingestion", fingerprint, artifact, config.data_ingestion_dir, artifact_dir(config))
+
+
+def load(stage_cache: StageCache, config: DataIngestionConfig, fingerprint: str):
+    return stage_cache.load(
+        "data_ingestion", fingerprint, DataIngestionArtifact, config.data_ingestion_dir, artifact_dir(config)
+    )
+
+
+def test_unchanged_stage_is_a_hit(workdir):
+    stage_cache = StageCache(cache_dir=str(workdir / "stage_cache"))
+    first, second = ingestion_config(1), ingestion_config(2)
+    fingerprint = stage_cache.fingerprint("data_ingestion", first, artifact_dir(first), "feature_store")
+    cache_run(stage_cache, first, fingerprint)
+
+    #paths under the artifact directory of the run do not change the fingerprint
+    assert stage_cache.fingerprint("data_ingestion", second, artifact_dir(second), "feature_store") == fingerprint
+    artifact = load(stage_cache, second, fingerprint)
+    assert artifact == DataIngestionArtifact(
+        trained_file_path=second.training_file_path, test_file_path=second.testing_file_path
+    )
+
+
+def test_changed_config_schema_or_upstream_is_a_miss(workdir):
+    stage_cache = StageCache(cache_dir=str(workdir / "stage_cache"))
+    config = ingestion_config(1)
+    fingerprint = stage_cache.fingerprint("data_ingestion", config, artifact_dir(config), "feature_store")
+    cache_run(stage_cache, config, fingerprint)
+
+    upstream_changed = stage_cache.fingerprint("data_ingestion", config, artifact_dir(config), "other_feature_store")
+    config.train_test_split_ratio = 0.5
+    config_changed = stage_cache.fingerprint("data_ingestion", config, artifact_dir(config), "feature_store")
+    config.train_test_split_ratio = ingestion_config(1).train_test_split_ratio
+    with open(SCHEMA_FILE_PATH, "a") as schema_file:
+        schema_file.write("\n#changed\n")
+    schema_changed = stage_cache.fingerprint("data_ingestion", config, artifact_dir(config), "feature_store")
+
+    assert len({fingerprint, upstream_changed, config_changed, schema_changed}) == 4
+    for changed in (upstream_changed, config_changed, schema_changed):
+        assert load(stage_cache, ingestion_config(2), changed) is None
+
+
+def test_hit_links_files_the_next_stage_reads(workdir):
+    stage_cache = StageCache(cache_dir=str(workdir / "stage_cache"))
+    first, second = ingestion_config(1), ingestion_config(2)
+    fingerprint = stage_cache.fingerprint("data_ingestion", first, artifact_dir(first), "feature_store")
+    cache_run(stage_cache, first, fingerprint)
+    expected = read_dataframe(first.training_file_path)
+    #the cache keeps the files when the run they came from is removed
+    shutil.rmtree(artifact_dir(first))
+
+    artifact = load(stage_cache, second, fingerprint)
+
+    df = read_dataframe(artifact.trained_file_path)
+    assert df.equals(expected)
+    assert len(read_dataframe(artifact.test_file_path)) == 5
+
+
+def test_eviction_keeps_the_newest_entries(workdir):
+    stage_cache = StageCache(cache_dir=str(workdir / "stage_cache"), max_entries=2)
+    config = ingestion_config(1)
+    fingerprints = [f"fingerprint_{i}" for i in range(4)]
+    created_at = time.time() - 100
+    for i, fingerprint in enumerate(fingerprints):
+        cache_run(stage_cache, config, fingerprint)
+        #saves in quick succession can have the same mtime, the entries are ordered by it
+        manifest_path = os.path.join(stage_cache._entry_dir("data_ingestion", fingerprint),
+                                     TRAINING_STAGE_CACHE_MANIFEST_FILE_NAME)
+        os.utime(manifest_path, (created_at + i, created_at + i))
+
+    assert sorted(os.listdir(workdir / "stage_cache" / "data_ingestion")) == fingerprints[2:]
+    assert load(stage_cache, ingestion_config(2), fingerprints[0]) is None
+    assert load(stage_cache, ingestion_config(2), fingerprints[3]) is not None
@@ -0,0 +1,108 @@
+import asyncio
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from toxicpred.serving import streaming
+from toxicpred.serving.input_formats import InputFrameReader
+from toxicpred.serving.streaming import ChunkedPredictionStream
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FEATURES = pd.DataFrame({
+    "CIC0": np.linspace(1.0, 5.0, 25),
+    "SM1_DzZ": np.linspace(0.1, 2.0, 25),
+    "GATS1i": np.linspace(0.5, 2.5, 25),
+    "NdsCH": np.arange(25) % 5,
+    "NdssC": np.arange(25) % 7,
+    "MLOGP": np.linspace(-2.0, 6.0, 25),
+})
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    #the reader takes the feature columns and dtypes from config/schema.yaml
+    monkeypatch.chdir(REPO_ROOT)
+
+
+def upload(input_format: str) -> io.BytesIO:
+    buffer = io.BytesIO()
+    table = pa.Table.from_pandas(FEATURES, preserve_index=False)
+    if input_format == "csv":
+        FEATURES.to_csv(buffer, index=False)
+    elif input_format == "parquet":
+        pq.write_table(table, buffer, row_group_size=10)
+    elif input_format == "arrow_file":
+        with pa.ipc.new_file(buffer, table.schema) as writer:
+            writer.write_table(table, max_chunksize=20)
+    elif input_format == "arrow_stream":
+        with pa.ipc.new_stream(buffer, table.schema) as writer:
+            writer.write_table(table, max_chunksize=20)
+    else:
+        np.save(buffer, FEATURES.to_numpy())
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize("input_format,chunk_rows", [
+    ("csv", [8, 8, 8, 1]),
+    ("parquet", [8, 8, 8, 1]),
+    #arrow chunks do not span the record batches of 20 rows
+    ("arrow_file", [8, 8, 4, 5]),
+    ("arrow_stream", [8, 8, 4, 5]),
+])
+def test_chunks_of_every_streamable_format(input_format, chunk_rows):
+    chunks = list(InputFrameReader().iter_chunks(upload(input_format), chunk_size=8))
+
+    assert [len(chunk) for chunk in chunks] == chunk_rows
+    df = pd.concat(chunks, ignore_index=True)
+    assert df["CIC0"].tolist() == pytest.approx(FEATURES["CIC0"].tolist())
+    assert df["NdsCH"].tolist() == FEATURES["NdsCH"].tolist()
+
+
+def test_csv_chunks_get_the_schema_dtypes():
+    chunk = next(InputFrameReader().iter_chunks(upload("csv"), chunk_size=8))
+
+    assert chunk["CIC0"].dtype == np.float64
+    assert chunk["NdsCH"].dtype == pd.Int64Dtype()
+
+
+def test_csv_value_that_is_not_a_number_is_kept_for_validation():
+    file = io.BytesIO(b"CIC0,NdsCH\n1.5,1\nx,2\n")
+
+    chunk = next(InputFrameReader().iter_chunks(file, chunk_size=8))
+
+    assert chunk["CIC0"].tolist() == ["1.5", "x"]
+    assert chunk["NdsCH"].dtype == pd.Int64Dtype()
+
+
+def test_npy_upload_cannot_be_streamed():
+    with pytest.raises(ValueError, match="cannot be streamed"):
+        next(InputFrameReader().iter_chunks(upload("npy"), chunk_size=8))
+
+
+class InlineExecutor:
+    async def run(self, fn, *args):
+        return fn(*args)
+
+
+def test_stream_numbers_rows_across_chunks(monkeypatch):
+    def predict_chunk(df, first_row, output_format):
+        return "".join(f"{first_row + i},{value}\n" for i, value in enumerate(df["NdsCH"])).encode()
+
+    monkeypatch.setattr(streaming, "predict_chunk", predict_chunk)
+
+    async def scenario():
+        stream = ChunkedPredictionStream(upload("parquet"), "csv", InlineExecutor(), chunk_size=10,
+                                         content_type="application/octet-stream")
+        assert await stream.start() is None
+        return b"".join([part async for part in stream])
+
+    lines = asyncio.run(scenario()).decode().splitlines()
+    assert lines[0] == "row,prediction,reasons"
+    assert lines[1:] == [f"{i},{i % 5}" for i in range(25)]
@@ -0,0 +1,77 @@
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+pytest.importorskip("evidently")
+
+from toxicpred.constant.env_variable import ASTRA_REST_BASE_URL
+from toxicpred.constant.training_pipeline import TRAINING_PROFILE_FILE_NAME
+from toxicpred.exception import ToxicityException
+from toxicpred.pipeline.train_pipeline import TrainPipeline
+from toxicpred.test.astra_rest_stand_in import AstraRestStandIn
+from toxicpred.utils.artifact_persister import ArtifactPersister
+from toxicpred.utils.synthetic_data import SyntheticDescriptorGenerator
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    #artifacts, saved models and caches are written relative to the working directory
+    shutil.copytree(os.path.join(REPO_ROOT, "config"), tmp_path / "config")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def slow_background_writes(monkeypatch):
+    #every artifact file is still being written when the next stage starts
+    save = ArtifactPersister._save
+
+    def slow_save(file_path, save_fn, args, kwargs):
+        time.sleep(0.3)
+        return save(file_path, save_fn, args, kwargs)
+
+    monkeypatch.setattr(ArtifactPersister, "_save", staticmethod(slow_save))
+
+
+@pytest.mark.parametrize("in_memory_artifacts", [False, True])
+def test_pipeline_with_background_writes(workdir, slow_background_writes, monkeypatch, in_memory_artifacts):
+    df = SyntheticDescriptorGenerator(seed=0).training_frame(3000)
+    with AstraRestStandIn(df) as stand_in:
+        monkeypatch.setenv(ASTRA_REST_BASE_URL, stand_in.base_url)
+        train_pipeline = TrainPipeline(in_memory_artifacts=in_memory_artifacts, async_persist=True, stage_cache=False)
+        train_pipeline.run_pipeline()
+
+    artifact_dir = train_pipeline.training_pipeline_config.artifact_dir
+    with open(os.path.join(artifact_dir, TRAINING_PROFILE_FILE_NAME)) as profile_file:
+        profile = json.load(profile_file)
+    assert profile["status"] == "succeeded"
+    for stage in profile["stages"]:
+        assert stage["status"] == "succeeded"
+        #every file a stage read back was complete by then
+        assert all(file_info["bytes"] for file_info in stage["files_read"])
+    assert train_pipeline.artifact_persister.pending() == 0
+
+
+def test_second_run_reuses_the_cached_stages(workdir, monkeypatch):
+    df = SyntheticDescriptorGenerator(seed=0).training_frame(3000)
+    with AstraRestStandIn(df) as stand_in:
+        monkeypatch.setenv(ASTRA_REST_BASE_URL, stand_in.base_url)
+        first_run = TrainPipeline(async_persist=True, stage_cache=True)
+        first_run.run_pipeline()
+        #the cached files outlive the run they came from
+        shutil.rmtree(first_run.training_pipeline_config.artifact_dir)
+        second_run = TrainPipeline(async_persist=True, stage_cache=True)
+        #the reused model is evaluated against the one the first run pushed, and is not better
+        with pytest.raises(ToxicityException, match="not better than the best model"):
+            second_run.run_pipeline()
+
+    assert not any(first_run.stage_cache_hits.values())
+    for stage_name in ["data_ingestion", "data_validation", "data_transformation", "model_trainer"]:
+        assert second_run.stage_cache_hits[stage_name]
+        assert second_run.stage_fingerprints[stage_name] == first_run.stage_fingerprints[stage_name]
+    assert not second_run.stage_cache_hits["model_evaluation"]
@@ -0,0 +1,98 @@
+import fcntl
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from toxicpred.pipeline import training_job
+from toxicpred.pipeline.training_job import FAILED, QUEUED, RUNNING, SUCCEEDED, TrainingJobRunner
+
+
+def exited_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def write_job(runner: TrainingJobRunner, job_id: str, status: str, pid: int) -> None:
+    os.makedirs(runner.job_dir, exist_ok=True)
+    runner._write_job_status({"job_id": job_id, "status": status, "pid": pid, "finished_at": None, "error": None})
+
+
+def test_running_job_without_process_is_failed(tmp_path):
+    runner = TrainingJobRunner(job_dir=str(tmp_path))
+    write_job(runner, "killed", RUNNING, exited_pid())
+
+    job_status = runner.get_job_status("killed")
+
+    assert job_status["status"] == FAILED
+    assert job_status["error"] == "training process exited unexpectedly"
+    assert job_status["finished_at"] is not None
+    #the failure is written, not only reported
+    assert runner.get_job_status("killed")["status"] == FAILED
+
+
+def test_queued_job_with_free_lock_is_failed(tmp_path):
+    runner = TrainingJobRunner(job_dir=str(tmp_path))
+    write_job(runner, "never_started", QUEUED, None)
+
+    assert runner.get_job_status("never_started")["status"] == FAILED
+
+
+def test_running_job_holding_the_lock_stays_running(tmp_path):
+    runner = TrainingJobRunner(job_dir=str(tmp_path))
+    write_job(runner, "training", RUNNING, os.getpid())
+    with open(runner.lock_file_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        assert runner.is_training_running()
+        assert runner.get_job_status("training")["status"] == RUNNING
+
+
+def test_finished_job_is_left_alone(tmp_path):
+    runner = TrainingJobRunner(job_dir=str(tmp_path))
+    write_job(runner, "done", SUCCEEDED, exited_pid())
+
+    assert runner.get_job_status("done")["status"] == SUCCEEDED
+    assert runner.get_job_status("missing") is None
+
+
+class PopenStandIn:
+    def __init__(self, *args, **kwargs):
+        self.pid = os.getpid()
+
+    def poll(self):
+        return None
+
+
+def test_start_job_is_not_refused_by_a_status_probe(tmp_path, monkeypatch):
+    monkeypatch.setattr(training_job.subprocess, "Popen", PopenStandIn)
+    runner = TrainingJobRunner(job_dir=str(tmp_path))
+    os.makedirs(runner.job_dir, exist_ok=True)
+    probe = open(runner.lock_file_path, "a")
+    fcntl.flock(probe, fcntl.LOCK_SH)
+    #the probe is released while start_job waits to retry
+    threading.Timer(0.01, probe.close).start()
+
+    job_status = runner.start_job()
+
+    assert job_status is not None and job_status["status"] == QUEUED
+
+
+def test_start_job_is_refused_while_training_holds_the_lock(tmp_path):
+    runner = TrainingJobRunner(job_dir=str(tmp_path))
+    os.makedirs(runner.job_dir, exist_ok=True)
+    with open(runner.lock_file_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        assert runner.start_job() is None
+
+
+def test_zombie_process_is_not_alive():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    #exited but not reaped yet
+    deadline = time.monotonic() + 5.0
+    while TrainingJobRunner._is_process_alive(process.pid):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    process.wait()
+    assert TrainingJobRunner._is_process_alive(os.getpid())
@@ -0,0 +1,79 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from toxicpred.constant.training_pipeline import TRAINING_ARTIFACT_PERSIST_WORKERS
+from toxicpred.exception import ToxicityException
+from toxicpred.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ArtifactPersister:
+    """
+    Saves artifact files on background threads so that the next stage does not wait for the
+    serialization, or in the calling thread when asynchronous is False. The values handed to
+    save must not be changed afterwards, the next stages only read them.
+    """
+    def __init__(self, asynchronous: bool = True, workers: int = TRAINING_ARTIFACT_PERSIST_WORKERS):
+        self.asynchronous = asynchronous
+        self._executor = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="artifact-persist") if asynchronous else None
+        )
+        #file path -> future of its latest save
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _save(file_path: str, save_fn: Callable, args: tuple, kwargs: dict) -> float:
+        start = time.perf_counter()
+        save_fn(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        logger.info(f"Persisted {file_path} in {seconds:.3f}s")
+        return seconds
+
+    def save(self, file_path: str, save_fn: Callable, *args, **kwargs) -> None:
+        '''
+        calls save_fn(*args, **kwargs), which writes file_path
+        '''
+        try:
+            if not self.asynchronous:
+                self._save(file_path, save_fn, args, kwargs)
+                return
+            future = self._executor.submit(self._save, file_path, save_fn, args, kwargs)
+            with self._lock:
+                self._futures[file_path] = future
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def wait(self, file_paths: Iterable[str] = None) -> None:
+        '''
+        blocks until the given files, or every file saved so far, are written and raises
+        the error of the first save that failed
+        '''
+        try:
+            with self._lock:
+                if file_paths is None:
+                    futures = list(self._futures.values())
+                else:
+                    futures = [self._futures[file_path] for file_path in file_paths if file_path in self._futures]
+            for future in futures:
+                future.result()
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(not future.done() for future in self._futures.values())
+
+    def close(self) -> None:
+        '''
+        waits for every save and stops the background threads
+        '''
+        try:
+            self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
@@ -1,12 +1,19 @@
 import os
-import path
+import shutil
 import sys
 import dill
 import numpy as np
+import pandas as pd
 import yaml
 import json
+from pandas.api.types import is_numeric_dtype
+from toxicpred.constant.training_pipeline import (ARTIFACT_FILE_EXTENSIONS, ARTIFACT_ROW_GROUP_SIZE,
+                                                  MODEL_MANIFEST_FORMAT, MODEL_MANIFEST_VERSION, SCHEMA_FILE_PATH)
 from toxicpred.exception import ToxicityException
-from toxicpred.logger import logging
+from toxicpred.logger import get_logger
+
+logger = get_logger(__name__)
+
 
 def read_json_file(file_path: str) -> dict:
     try:
@@ -48,33 +55,164 @@ def write_yaml_file(file_path: str, content: object, replace: bool = False) -> N
         raise ToxicityException(e, sys) from e
 
 def save_object(file_path: str, obj: object) -> None:
-    logging.info("Entered the save_object method of MainUtils class")
+    logger.info("Entered the save_object method of MainUtils class")
 
     try:
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         with open(file_path, "wb") as file_obj:
             dill.dump(obj, file_obj)
 
-        logging.info("Exited the save_object method of MainUtils class")
+        logger.info("Exited the save_object method of MainUtils class")
 
     except Exception as e:
         raise ToxicityException(e, sys) from e
 
 def load_object(file_path: str) -> object:
-    logging.info("Entered the load_object method of MainUtils class")
+    logger.info("Entered the load_object method of MainUtils class")
 
     try:
 
         with open(file_path, "rb") as file_obj:
             obj = dill.load(file_obj)
 
-        logging.info("Exited the load_object method of MainUtils class")
+        logger.info("Exited the load_object method of MainUtils class")
 
         return obj
 
     except Exception as e:
         raise ToxicityException(e, sys) from e
 
+class _ArrayExternalizingPickler(dill.Pickler):
+    '''
+    pickles an object with every numeric numpy array written to its own .npy file
+    '''
+    def __init__(self, file, arrays_dir: str):
+        super().__init__(file)
+        self.arrays_dir = arrays_dir
+        self.arrays = {}
+        self._array_names = {}
+        #keeps the saved arrays alive so that their ids are not reused while pickling
+        self._saved = []
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, np.ndarray) or obj.dtype.hasobject:
+            return None
+        #the same array can be referenced twice, e.g. by a KNN model and its tree
+        name = self._array_names.get(id(obj))
+        if name is None:
+            name = str(len(self.arrays))
+            file_name = f"{name}.npy"
+            np.save(os.path.join(self.arrays_dir, file_name), obj)
+            self.arrays[name] = {"file": file_name, "shape": list(obj.shape)}
+            self._array_names[id(obj)] = name
+            self._saved.append(obj)
+        return name
+
+
+class _ArrayMappingUnpickler(dill.Unpickler):
+    def __init__(self, file, arrays_dir: str, arrays: dict, mmap_mode: str):
+        super().__init__(file)
+        self.arrays_dir = arrays_dir
+        self.arrays = arrays
+        self.mmap_mode = mmap_mode
+
+    def persistent_load(self, name):
+        entry = self.arrays[name]
+        array = np.load(os.path.join(self.arrays_dir, entry["file"]), mmap_mode=self.mmap_mode, allow_pickle=False)
+        if list(array.shape) != entry["shape"]:
+            raise ValueError(f"Array file {entry['file']} has shape {array.shape}, the manifest says {entry['shape']}")
+        #a plain ndarray view of the mapping, so that results of indexing it are plain arrays too
+        return array.view(np.ndarray)
+
+
+def _model_arrays_dir(manifest_path: str) -> str:
+    return f"{os.path.splitext(manifest_path)[0]}_arrays"
+
+
+def is_model_manifest(file_path: str) -> bool:
+    return file_path.endswith(".json")
+
+
+def save_model(file_path: str, model: object) -> None:
+    """
+    Save a model in the format given by the file name
+    file_path: a .json manifest path stores the model arrays as .npy files in a
+    <name>_arrays directory next to it and the rest of the model as a small pickle,
+    any other path stores a single dill pickle
+    """
+    if not is_model_manifest(file_path):
+        save_object(file_path, model)
+        return
+    logger.info("Entered the save_model method of MainUtils class")
+
+    try:
+        arrays_dir = _model_arrays_dir(file_path)
+        shutil.rmtree(arrays_dir, ignore_errors=True)
+        os.makedirs(arrays_dir)
+        skeleton_file_name = "model.pkl"
+        with open(os.path.join(arrays_dir, skeleton_file_name), "wb") as skeleton_file:
+            pickler = _ArrayExternalizingPickler(skeleton_file, arrays_dir)
+            pickler.dump(model)
+        manifest = {
+            "format": MODEL_MANIFEST_FORMAT,
+            "format_version": MODEL_MANIFEST_VERSION,
+            "model_class": f"{type(model).__module__}.{type(model).__qualname__}",
+            "skeleton": skeleton_file_name,
+            "arrays": pickler.arrays,
+        }
+        #the manifest is written last and renamed into place, a model is complete once it exists
+        write_json_file(f"{file_path}.tmp", manifest)
+        os.replace(f"{file_path}.tmp", file_path)
+
+        logger.info("Exited the save_model method of MainUtils class")
+
+    except Exception as e:
+        raise ToxicityException(e, sys) from e
+
+
+def load_model(file_path: str, mmap_mode: str = "r") -> object:
+    """
+    Load a model saved by save_model, legacy model.pkl files included
+    mmap_mode: how the .npy arrays of a manifest are opened, the default read only
+    mapping lets every process that loads the model share the same page cache pages
+    """
+    if not is_model_manifest(file_path):
+        return load_object(file_path)
+    logger.info("Entered the load_model method of MainUtils class")
+
+    try:
+        manifest = read_json_file(file_path)
+        if manifest.get("format") != MODEL_MANIFEST_FORMAT:
+            raise ValueError(f"{file_path} is not a {MODEL_MANIFEST_FORMAT} manifest")
+        if manifest["format_version"] > MODEL_MANIFEST_VERSION:
+            raise ValueError(
+                f"{file_path} has format version {manifest['format_version']}, "
+                f"this code reads up to version {MODEL_MANIFEST_VERSION}"
+            )
+        arrays_dir = _model_arrays_dir(file_path)
+        with open(os.path.join(arrays_dir, manifest["skeleton"]), "rb") as skeleton_file:
+            model = _ArrayMappingUnpickler(skeleton_file, arrays_dir, manifest["arrays"], mmap_mode).load()
+
+        logger.info("Exited the load_model method of MainUtils class")
+        return model
+
+    except Exception as e:
+        raise ToxicityException(e, sys) from e
+
+
+def copy_model(src: str, dst: str) -> None:
+    """
+    Copy a model saved by save_model, the destination only becomes visible once it is complete
+    """
+    try:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if is_model_manifest(src):
+            shutil.copytree(_model_arrays_dir(src), _model_arrays_dir(dst), dirs_exist_ok=True)
+        shutil.copy(src=src, dst=f"{dst}.tmp")
+        os.replace(f"{dst}.tmp", dst)
+    except Exception as e:
+        raise ToxicityException(e, sys) from e
+
 def save_numpy_array_data(file_path: str, array: np.array):
     """
     Save numpy array data to file
@@ -99,4 +237,198 @@ def load_numpy_array_data(file_path: str) -> np.array:
         with open(file_path, "rb") as file_obj:
             return np.load(file_obj)
     except Exception as e:
-        raise ToxicityException(e, sys) from e
\ No newline at end of file
+        raise ToxicityException(e, sys) from e
+
+def get_schema_column_dtypes(schema_config: dict, columns: list = None) -> dict:
+    """
+    Map the columns declared in schema.yaml to pandas dtypes
+    schema_config: dict loaded from schema.yaml
+    columns: only return these columns, all declared columns when None
+    return: dict of column name to dtype, int columns are nullable so missing values survive
+    """
+    try:
+        schema_dtypes = {"int": "Int64", "float": "float64", "category": "category"}
+        column_dtypes = {}
+        for column in schema_config["columns"]:
+            for name, column_type in column.items():
+                if columns is None or name in columns:
+                    column_dtypes[name] = schema_dtypes[column_type]
+        return column_dtypes
+    except Exception as e:
+        raise ToxicityException(e, sys) from e
+
+def apply_schema_column_dtypes(df: pd.DataFrame, column_dtypes: dict) -> pd.DataFrame:
+    """
+    Cast the declared columns of a dataframe to their schema dtypes
+    column_dtypes: dict from get_schema_column_dtypes, columns missing from df are skipped
+    return: dataframe where values of numeric columns that are not numbers, e.g. "na", are missing
+    """
+    try:
+        declared = {column: dtype for column, dtype in column_dtypes.items() if column in df.columns}
+        parsed = {
+            column: pd.to_numeric(df[column], errors="coerce") for column, dtype in declared.items()
+            if dtype != "category" and not is_numeric_dtype(df[column])
+        }
+        return df.assign(**parsed).astype(declared)
+    except Exception as e:
+        raise ToxicityException(e, sys) from e
+
+def get_artifact_format(file_path: str) -> str:
+    extension = os.path.splitext(file_path)[1]
+    for artifact_format, format_extension in ARTIFACT_FILE_EXTENSIONS.items():
+        if extension == format_extension:
+            return artifact_format
+    raise ValueError(f"No artifact format has the extension of {file_path}")
+
+
+#field metadata marking the string columns that are read back as pandas categories
+CATEGORY_FIELD_METADATA = {b"pandas_dtype": b"category"}
+
+
+class DataFrameWriter:
+    """
+    Write dataframes one after the other into one artifact file, in the format of its extension
+    parquet and feather files are typed with the dtypes declared in schema.yaml, the other columns
+    with the types of their values in the first dataframe, so that they can be appended page by
+    page. Category columns are written as strings, their categories differ from page to page
+    """
+    def __init__(self, file_path: str, schema_file_path: str = SCHEMA_FILE_PATH,
+                 row_group_size: int = ARTIFACT_ROW_GROUP_SIZE):
+        try:
+            self.file_path = file_path
+            self.artifact_format = get_artifact_format(file_path)
+            self.row_group_size = row_group_size
+            self.declared_column_dtypes = get_schema_column_dtypes(read_yaml_file(schema_file_path))
+            self.column_dtypes = {} if self.artifact_format == "csv" else self.declared_column_dtypes
+            self.rows = 0
+            self._columns = None
+            self._header_written = False
+            self._schema = None
+            self._writer = None
+            self._pending = []
+            self._pending_rows = 0
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def _open(self, df: pd.DataFrame) -> None:
+        self._columns = list(df.columns)
+        if self.artifact_format == "csv":
+            self._writer = open(self.file_path, "w", newline="")
+            #the header is written once, even when the first dataframes are empty
+            pd.DataFrame(columns=self._columns).to_csv(self._writer, index=False)
+            self._header_written = True
+            return
+        self._schema = self._arrow_schema(df)
+        if self.artifact_format == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self.file_path, self._schema)
+        else:
+            import pyarrow.ipc as ipc
+            self._writer = ipc.new_file(self.file_path, self._schema, options=ipc.IpcWriteOptions(compression="lz4"))
+
+    def _arrow_schema(self, df: pd.DataFrame):
+        import pyarrow as pa
+        declared_types = {"Int64": pa.int64(), "float64": pa.float64(), "category": pa.large_string()}
+        inferred = pa.Schema.from_pandas(df, preserve_index=False)
+        fields = []
+        for column in df.columns:
+            dtype = self.column_dtypes.get(column)
+            if dtype is not None:
+                metadata = CATEGORY_FIELD_METADATA if dtype == "category" else None
+                fields.append(pa.field(column, declared_types[dtype], metadata=metadata))
+                continue
+            arrow_type = inferred.field(column).type
+            #a column without values in the first dataframe gets strings, see _to_arrow_values
+            fields.append(pa.field(column, pa.large_string() if pa.types.is_null(arrow_type) else arrow_type))
+        return pa.schema(fields)
+
+    def _to_arrow_values(self, df: pd.DataFrame) -> pd.DataFrame:
+        import pyarrow as pa
+        string_columns = [
+            field.name for field in self._schema
+            if pa.types.is_large_string(field.type) and not isinstance(df[field.name].dtype, pd.StringDtype)
+        ]
+        #categories and values of columns typed as strings, missing values stay missing
+        return df.assign(**{column: df[column].astype("string") for column in string_columns})
+
+    def write(self, df: pd.DataFrame) -> None:
+        try:
+            df = apply_schema_column_dtypes(df, self.column_dtypes)
+            if self._writer is None:
+                self._open(df)
+            if self.artifact_format == "csv":
+                #every dataframe is written with the column order of the first one
+                df.to_csv(self._writer, index=False, header=not self._header_written, columns=self._columns)
+            else:
+                import pyarrow as pa
+                self._pending.append(pa.Table.from_pandas(
+                    self._to_arrow_values(df[self._columns]), schema=self._schema, preserve_index=False
+                ))
+                self._pending_rows += len(df)
+                if self._pending_rows >= self.row_group_size:
+                    self._flush()
+            self.rows += len(df)
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        import pyarrow as pa
+        table = pa.concat_tables(self._pending)
+        self._pending, self._pending_rows = [], 0
+        if self.artifact_format == "parquet":
+            self._writer.write_table(table, row_group_size=self.row_group_size)
+        else:
+            self._writer.write_table(table, max_chunksize=self.row_group_size)
+
+    def close(self) -> None:
+        try:
+            if self._writer is None:
+                if self._columns is not None:
+                    return
+                #nothing was written, the file still has the declared columns so that it can be read
+                self._open(apply_schema_column_dtypes(
+                    pd.DataFrame(columns=list(self.declared_column_dtypes)), self.column_dtypes
+                ))
+            if self.artifact_format != "csv":
+                self._flush()
+            self._writer.close()
+            self._writer = None
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def __enter__(self) -> "DataFrameWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def write_dataframe(file_path: str, df: pd.DataFrame, schema_file_path: str = SCHEMA_FILE_PATH) -> None:
+    """
+    Save a dataframe to an artifact file in the format of its extension
+    """
+    with DataFrameWriter(file_path, schema_file_path=schema_file_path) as writer:
+        writer.write(df)
+
+def read_dataframe(file_path: str, columns: list = None) -> pd.DataFrame:
+    """
+    Load a dataframe saved by write_dataframe, or any csv, parquet or feather file
+    columns: only read these columns, all of them when None
+    """
+    try:
+        artifact_format = get_artifact_format(file_path)
+        if artifact_format == "csv":
+            return pd.read_csv(file_path, usecols=columns)
+        if artifact_format == "parquet":
+            import pyarrow.parquet as pq
+            table = pq.read_table(file_path, columns=columns)
+        else:
+            import pyarrow.feather as feather
+            table = feather.read_table(file_path, columns=columns, memory_map=True)
+        categories = [field.name for field in table.schema if field.metadata == CATEGORY_FIELD_METADATA]
+        return table.to_pandas(categories=categories)
+    except Exception as e:
+        raise ToxicityException(e, sys) from e
@@ -0,0 +1,198 @@
+import dataclasses
+import errno
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import typing
+from functools import lru_cache
+
+from toxicpred.constant.training_pipeline import (SCHEMA_FILE_PATH, TRAINING_STAGE_CACHE_DIR,
+                                                  TRAINING_STAGE_CACHE_ENABLED, TRAINING_STAGE_CACHE_MANIFEST_FILE_NAME,
+                                                  TRAINING_STAGE_CACHE_MAX_ENTRIES, VALID_SCHEMA_FILE_PATH)
+from toxicpred.entity.artifact_entity import without_payloads
+from toxicpred.exception import ToxicityException
+from toxicpred.logger import get_logger
+
+logger = get_logger(__name__)
+
+#stands for the artifact directory of the run in cached artifacts and fingerprinted configs
+ARTIFACT_DIR_PLACEHOLDER = "<artifact_dir>"
+
+
+def file_digest(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        for block in iter(lambda: file_obj.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def code_version() -> str:
+    '''
+    digest of every module of the toxicpred package, any change to the code invalidates the cache
+    '''
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha256()
+    for dir_path, dir_names, file_names in os.walk(package_dir):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.endswith(".py"):
+                file_path = os.path.join(dir_path, file_name)
+                digest.update(os.path.relpath(file_path, package_dir).encode())
+                digest.update(file_digest(file_path).encode())
+    return digest.hexdigest()
+
+
+def _replace_strings(value, old: str, new: str):
+    if isinstance(value, str):
+        return value.replace(old, new)
+    if isinstance(value, dict):
+        return {key: _replace_strings(item, old, new) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_strings(item, old, new) for item in value]
+    return value
+
+
+def _artifact_from_dict(artifact_class, content: dict):
+    type_hints = typing.get_type_hints(artifact_class)
+    values = {}
+    for artifact_field in dataclasses.fields(artifact_class):
+        if artifact_field.name not in content:
+            continue
+        value = content[artifact_field.name]
+        field_type = type_hints[artifact_field.name]
+        if isinstance(value, dict) and dataclasses.is_dataclass(field_type):
+            value = _artifact_from_dict(field_type, value)
+        values[artifact_field.name] = value
+    return artifact_class(**values)
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        #another file system, or one without hard links
+        shutil.copy2(src, dst)
+
+
+class StageCache:
+    """
+    Content addressed cache of the artifacts of the training stages.
+
+    A stage is fingerprinted from its inputs: the fingerprints of the stages or the digest of
+    the data it consumes, its config, schema.yaml, validate.json and the code version. The
+    files of a stage that ran are hard linked under <cache_dir>/<stage>/<fingerprint>/ with a
+    manifest holding its artifact, a later run with the same fingerprint hard links them into
+    its own artifact directory instead of running the stage. Artifact files are never changed
+    in place, so sharing their inodes is safe.
+    """
+    def __init__(self, cache_dir: str = TRAINING_STAGE_CACHE_DIR, enabled: bool = TRAINING_STAGE_CACHE_ENABLED,
+                 max_entries: int = TRAINING_STAGE_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.max_entries = max_entries
+
+    def fingerprint(self, stage_name: str, config, artifact_dir: str, *inputs) -> str:
+        '''
+        config: the stage config, paths under artifact_dir do not change the fingerprint
+        inputs: fingerprints of the upstream stages or digests of the data the stage reads
+        '''
+        try:
+            config_content = _replace_strings(vars(config), artifact_dir, ARTIFACT_DIR_PLACEHOLDER)
+            content = {
+                "stage": stage_name,
+                "config": json.dumps(config_content, sort_keys=True, default=str),
+                "schema": file_digest(SCHEMA_FILE_PATH),
+                "valid_schema": file_digest(VALID_SCHEMA_FILE_PATH),
+                "code_version": code_version(),
+                "inputs": [str(stage_input) for stage_input in inputs],
+            }
+            return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def _entry_dir(self, stage_name: str, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, stage_name, fingerprint)
+
+    def load(self, stage_name: str, fingerprint: str, artifact_class, stage_dir: str, artifact_dir: str):
+        '''
+        hard links the cached files of the stage into stage_dir and returns its artifact with the
+        paths of this run, None when the stage has not run with this fingerprint
+        '''
+        if not self.enabled:
+            return None
+        try:
+            entry_dir = self._entry_dir(stage_name, fingerprint)
+            manifest_path = os.path.join(entry_dir, TRAINING_STAGE_CACHE_MANIFEST_FILE_NAME)
+            if not os.path.exists(manifest_path):
+                return None
+            with open(manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+            files_dir = os.path.join(entry_dir, "files")
+            for relative_path in manifest["files"]:
+                dst = os.path.join(stage_dir, relative_path)
+                if not os.path.exists(dst):
+                    _link_or_copy(os.path.join(files_dir, relative_path), dst)
+            artifact = _replace_strings(manifest["artifact"], ARTIFACT_DIR_PLACEHOLDER, artifact_dir)
+            logger.info(f"Stage [{stage_name}] reused the artifacts of fingerprint {fingerprint[:12]}")
+            return _artifact_from_dict(artifact_class, artifact)
+        except Exception as e:
+            #a broken entry only costs running the stage again
+            logger.exception(f"Could not reuse the cached artifacts of stage [{stage_name}]: {e}")
+            return None
+
+    def save(self, stage_name: str, fingerprint: str, artifact, stage_dir: str, artifact_dir: str) -> None:
+        '''
+        hard links every file under stage_dir into the cache, the entry is only visible once its
+        manifest is written
+        '''
+        if not self.enabled:
+            return
+        try:
+            entry_dir = self._entry_dir(stage_name, fingerprint)
+            if os.path.exists(os.path.join(entry_dir, TRAINING_STAGE_CACHE_MANIFEST_FILE_NAME)):
+                return
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            files = []
+            for dir_path, _, file_names in os.walk(stage_dir):
+                for file_name in file_names:
+                    relative_path = os.path.relpath(os.path.join(dir_path, file_name), stage_dir)
+                    _link_or_copy(os.path.join(stage_dir, relative_path), os.path.join(entry_dir, "files", relative_path))
+                    files.append(relative_path)
+            manifest = {
+                "stage": stage_name,
+                "fingerprint": fingerprint,
+                "created_at": time.time(),
+                "files": sorted(files),
+                "artifact": _replace_strings(
+                    dataclasses.asdict(without_payloads(artifact)), artifact_dir, ARTIFACT_DIR_PLACEHOLDER
+                ),
+            }
+            manifest_path = os.path.join(entry_dir, TRAINING_STAGE_CACHE_MANIFEST_FILE_NAME)
+            with open(f"{manifest_path}.tmp", "w") as manifest_file:
+                json.dump(manifest, manifest_file)
+            os.replace(f"{manifest_path}.tmp", manifest_path)
+            logger.info(f"Stage [{stage_name}] cached as fingerprint {fingerprint[:12]}")
+            self.evict(stage_name)
+        except Exception as e:
+            logger.exception(f"Could not cache the artifacts of stage [{stage_name}]: {e}")
+
+    def evict(self, stage_name: str) -> None:
+        '''
+        removes the oldest entries of the stage beyond max_entries
+        '''
+        stage_cache_dir = os.path.join(self.cache_dir, stage_name)
+        entries = []
+        for fingerprint in os.listdir(stage_cache_dir):
+            manifest_path = os.path.join(stage_cache_dir, fingerprint, TRAINING_STAGE_CACHE_MANIFEST_FILE_NAME)
+            if os.path.exists(manifest_path):
+                entries.append((os.path.getmtime(manifest_path), fingerprint))
+        for _, fingerprint in sorted(entries, reverse=True)[self.max_entries:]:
+            shutil.rmtree(os.path.join(stage_cache_dir, fingerprint), ignore_errors=True)
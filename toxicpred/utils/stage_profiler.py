@@ -0,0 +1,222 @@
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from toxicpred.exception import ToxicityException
+from toxicpred.logger import get_logger
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+
+
+def _reset_peak_rss() -> bool:
+    #linux only, resets VmHWM of the process so that each stage gets its own peak
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/status") as status_file:
+            for line in status_file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def describe_file(file_path: str) -> dict:
+    '''
+    returns the path, size in bytes and number of data rows of a csv, parquet, feather or
+    npy file, rows is None for other files
+    '''
+    file_info = {"path": file_path, "bytes": None, "rows": None}
+    if not file_path or not os.path.isfile(file_path):
+        return file_info
+    file_info["bytes"] = os.path.getsize(file_path)
+    if file_path.endswith(".npy"):
+        #memory mapping only reads the header
+        shape = np.load(file_path, mmap_mode="r").shape
+        file_info["rows"] = shape[0] if shape else 1
+    elif file_path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        #the row count is in the footer
+        file_info["rows"] = pq.ParquetFile(file_path).metadata.num_rows
+    elif file_path.endswith(".feather"):
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        with pa.memory_map(file_path) as source:
+            reader = ipc.open_file(source)
+            file_info["rows"] = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    elif file_path.endswith(".csv"):
+        newlines = 0
+        last_byte = b"\n"
+        with open(file_path, "rb") as file_obj:
+            for block in iter(lambda: file_obj.read(MB), b""):
+                newlines += block.count(b"\n")
+                last_byte = block[-1:]
+        #do not count the header, count a last line without a trailing newline
+        file_info["rows"] = max(newlines - 1 + (last_byte != b"\n"), 0)
+    return file_info
+
+
+class StageProfile:
+    def __init__(self, stage_name: str):
+        self.stage_name = stage_name
+        self.status = "running"
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_rss_mb = None
+        #"stage" when the high water mark was reset at the start of the stage, "process" otherwise
+        self.peak_rss_scope = None
+        self.tracemalloc_peak_mb = None
+        self.cprofile_path = None
+        #True when the stage reused the artifacts of an earlier run, None when it is not cached
+        self.cache_hit = None
+        #paths are only described when the report is built, files may still be written in the background
+        self.paths_read: List[str] = []
+        self.paths_written: List[str] = []
+
+    def record_files(self, read: List[str] = (), written: List[str] = ()) -> None:
+        self.paths_read.extend(read)
+        self.paths_written.extend(written)
+
+    @property
+    def files_read(self) -> List[dict]:
+        return [describe_file(file_path) for file_path in self.paths_read]
+
+    @property
+    def files_written(self) -> List[dict]:
+        return [describe_file(file_path) for file_path in self.paths_written]
+
+    @staticmethod
+    def _total(files: List[dict], key: str) -> Optional[int]:
+        values = [file_info[key] for file_info in files if file_info[key] is not None]
+        return sum(values) if values else None
+
+    def to_dict(self) -> dict:
+        files_read, files_written = self.files_read, self.files_written
+        return {
+            "stage": self.stage_name,
+            "status": self.status,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "peak_rss_mb": self.peak_rss_mb,
+            "peak_rss_scope": self.peak_rss_scope,
+            "tracemalloc_peak_mb": self.tracemalloc_peak_mb,
+            "cache_hit": self.cache_hit,
+            "rows_read": self._total(files_read, "rows"),
+            "bytes_read": self._total(files_read, "bytes"),
+            "rows_written": self._total(files_written, "rows"),
+            "bytes_written": self._total(files_written, "bytes"),
+            "files_read": files_read,
+            "files_written": files_written,
+            "cprofile_path": self.cprofile_path,
+        }
+
+
+class StageProfiler:
+    """
+    Records wall time, cpu time, peak memory and the files read and written by
+    each stage of the training pipeline and writes them to a json report.
+
+    Peak RSS is per stage where the kernel allows resetting the high water mark
+    (linux), otherwise it is the peak of the process so far. tracemalloc only
+    sees allocations made through the Python allocator, which includes NumPy
+    and pandas buffers. With enable_cprofile every stage is also run under
+    cProfile and its stats are dumped to <cprofile_dir>/<stage>.prof for
+    snakeviz or pstats.
+    """
+    def __init__(self, enable_tracemalloc: bool = True, enable_cprofile: bool = False,
+                 cprofile_dir: Optional[str] = None):
+        self.enable_tracemalloc = enable_tracemalloc
+        self.enable_cprofile = enable_cprofile
+        self.cprofile_dir = cprofile_dir
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.stages: List[StageProfile] = []
+        self._start_time = time.perf_counter()
+
+    @contextmanager
+    def profile(self, stage_name: str):
+        stage_profile = StageProfile(stage_name)
+        self.stages.append(stage_profile)
+
+        started_tracemalloc = False
+        if self.enable_tracemalloc:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracemalloc = True
+            tracemalloc.reset_peak()
+        peak_rss_reset = _reset_peak_rss()
+        profiler = cProfile.Profile() if self.enable_cprofile else None
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield stage_profile
+            stage_profile.status = "succeeded"
+        except BaseException:
+            stage_profile.status = "failed"
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            stage_profile.wall_seconds = round(time.perf_counter() - wall_start, 6)
+            stage_profile.cpu_seconds = round(time.process_time() - cpu_start, 6)
+
+            peak_rss = _peak_rss_bytes()
+            if peak_rss is not None:
+                stage_profile.peak_rss_mb = round(peak_rss / MB, 3)
+            stage_profile.peak_rss_scope = "stage" if peak_rss_reset else "process"
+            if self.enable_tracemalloc:
+                stage_profile.tracemalloc_peak_mb = round(tracemalloc.get_traced_memory()[1] / MB, 3)
+                if started_tracemalloc:
+                    tracemalloc.stop()
+            if profiler is not None and self.cprofile_dir:
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                stage_profile.cprofile_path = os.path.join(self.cprofile_dir, f"{stage_name}.prof")
+                profiler.dump_stats(stage_profile.cprofile_path)
+
+            logger.info(
+                f"Stage [{stage_name}] {stage_profile.status} in {stage_profile.wall_seconds}s wall, "
+                f"{stage_profile.cpu_seconds}s cpu, peak rss {stage_profile.peak_rss_mb} MB"
+            )
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": self.started_at,
+            "total_wall_seconds": round(time.perf_counter() - self._start_time, 6),
+            "stages": [stage_profile.to_dict() for stage_profile in self.stages],
+        }
+
+    def write_report(self, file_path: str, **extra) -> None:
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            report = dict(extra, **self.to_dict())
+            with open(file_path, "w") as report_file:
+                json.dump(report, report_file, indent=2)
+            logger.info(f"Stage profile report written to {file_path}")
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
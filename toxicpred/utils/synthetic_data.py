@@ -0,0 +1,107 @@
+import os
+import sys
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from toxicpred.constant.training_pipeline import TARGET_COLUMN, VALID_SCHEMA_FILE_PATH
+from toxicpred.exception import ToxicityException
+from toxicpred.utils.main_utils import read_json_file
+
+#linear response used for the synthetic target, roughly the LC50 range of the real dataset
+TARGET_COEFFICIENTS = {"CIC0": 0.4, "SM1_DzZ": 1.0, "GATS1i": -0.3, "NdsCH": 0.2, "NdssC": 0.1, "MLOGP": 0.9}
+TARGET_INTERCEPT = 1.5
+
+
+class SyntheticDescriptorGenerator:
+    """
+    Samples the QSAR descriptors uniformly within the ranges and categories of
+    validate.json, for benchmarks and load tests that cannot reach the database.
+
+    The same seed, row count and chunk size always give the same rows. Row
+    counts in the millions are produced chunk by chunk so that a csv far larger
+    than memory can be written with write_training_csv.
+    """
+    def __init__(self, valid_schema: Optional[dict] = None, seed: int = 0):
+        try:
+            self.valid_schema = valid_schema if valid_schema is not None else read_json_file(VALID_SCHEMA_FILE_PATH)
+            self.range_columns = {
+                column: (float(bounds["min"]), float(bounds["max"]))
+                for column, bounds in self.valid_schema.items() if isinstance(bounds, dict)
+            }
+            self.category_columns = {
+                column: np.asarray(values)
+                for column, values in self.valid_schema.items() if isinstance(values, list)
+            }
+            self.columns = list(self.valid_schema)
+            self.seed = seed
+            self._rng = np.random.default_rng(seed)
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def descriptors(self, n_rows: int, invalid_fraction: float = 0.0, missing_fraction: float = 0.0) -> pd.DataFrame:
+        '''
+        returns n_rows of descriptors, invalid_fraction of the rows get one value
+        outside its range or categories and missing_fraction of the range values are NaN
+        '''
+        try:
+            rng = self._rng
+            data = {}
+            for column in self.columns:
+                if column in self.range_columns:
+                    low, high = self.range_columns[column]
+                    data[column] = rng.uniform(low, high, n_rows)
+                else:
+                    data[column] = rng.choice(self.category_columns[column], n_rows)
+            df = pd.DataFrame(data, columns=self.columns)
+
+            if invalid_fraction > 0:
+                invalid_rows = np.flatnonzero(rng.random(n_rows) < invalid_fraction)
+                invalid_columns = rng.integers(0, len(self.columns), len(invalid_rows))
+                for column_index, column in enumerate(self.columns):
+                    rows = invalid_rows[invalid_columns == column_index]
+                    if column in self.range_columns:
+                        low, high = self.range_columns[column]
+                        df.loc[rows, column] = high + (high - low)
+                    else:
+                        df.loc[rows, column] = self.category_columns[column].max() + 1
+            if missing_fraction > 0:
+                for column in self.range_columns:
+                    df.loc[rng.random(n_rows) < missing_fraction, column] = np.nan
+            return df
+
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def training_frame(self, n_rows: int, first_index: int = 0, noise: float = 0.1) -> pd.DataFrame:
+        '''
+        returns descriptors with an Index column and the target column, laid out
+        like the rows exported from the database
+        '''
+        try:
+            df = self.descriptors(n_rows)
+            target = np.full(n_rows, TARGET_INTERCEPT)
+            for column, coefficient in TARGET_COEFFICIENTS.items():
+                if column in df:
+                    target += coefficient * df[column].to_numpy(dtype=np.float64)
+            df[TARGET_COLUMN] = target + self._rng.normal(0.0, noise, n_rows)
+            df.insert(0, "Index", np.arange(first_index, first_index + n_rows))
+            return df
+
+        except Exception as e:
+            raise ToxicityException(e, sys) from e
+
+    def iter_training_chunks(self, n_rows: int, chunk_size: int = 1_000_000) -> Iterator[pd.DataFrame]:
+        for first_index in range(0, n_rows, chunk_size):
+            yield self.training_frame(min(chunk_size, n_rows - first_index), first_index=first_index)
+
+    def write_training_csv(self, file_path: str, n_rows: int, chunk_size: int = 1_000_000) -> str:
+        try:
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            for i, chunk in enumerate(self.iter_training_chunks(n_rows, chunk_size)):
+                chunk.to_csv(file_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            return file_path
+
+        except Exception as e:
+            raise ToxicityException(e, sys) from e